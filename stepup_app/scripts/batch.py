@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 构建打包脚本的批处理（无人值守）模式
+
+使用 --yes 或标准输入不是终端（CI、计划任务、被其他程序调用）时进入批处理模式：
+不再等待按键，失败时按失败类型返回不同的退出码。
+使用 --summary-json=路径 时，结束时写出 JSON 格式的结果摘要（各平台结果、各步骤耗时、产物路径）；
+路径为 - 时摘要写到标准输出，其余日志改为输出到标准错误。
+"""
+
+import sys
+import json
+from datetime import datetime
+
+import release_timing
+
+
+# 退出码
+EXIT_OK = 0
+EXIT_USAGE = 2      # 参数错误（与 argparse 一致）
+EXIT_PREPARE = 3    # 更新版本号、清理、获取依赖失败
+EXIT_BUILD = 4      # 平台构建失败
+EXIT_PACKAGE = 5    # 打包、生成校验文件失败
+EXIT_PUBLISH = 6    # 同步网页失败
+EXIT_BUDGET = 7     # 产物超出体积预算
+
+FAILURE_NAMES = {
+    EXIT_USAGE: "usage",
+    EXIT_PREPARE: "prepare",
+    EXIT_BUILD: "build",
+    EXIT_PACKAGE: "package",
+    EXIT_PUBLISH: "publish",
+    EXIT_BUDGET: "budget",
+}
+
+_settings = {"interactive": True, "summary": None, "stdout": None}
+
+# 结果摘要，各脚本在运行过程中补充 results、artifacts 等字段
+SUMMARY = {}
+
+
+def add_arguments(parser):
+    """添加批处理模式相关的命令行参数"""
+    parser.add_argument(
+        "--yes", "-y",
+        help="批处理模式：不等待按键确认（标准输入不是终端时自动启用）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--summary-json",
+        help="结束时写出 JSON 结果摘要到指定文件，- 表示标准输出",
+        default=None
+    )
+
+
+def configure(args, script, version):
+    """根据命令行参数和运行环境设置批处理模式"""
+    _settings["interactive"] = not args.yes and sys.stdin is not None and sys.stdin.isatty()
+    _settings["summary"] = args.summary_json
+    if args.summary_json == "-":
+        # 标准输出只留给摘要，日志改为输出到标准错误
+        _settings["stdout"] = sys.stdout
+        sys.stdout = sys.stderr
+    SUMMARY.clear()
+    SUMMARY.update(script=script, version=version, started_at=datetime.now().isoformat(timespec="seconds"))
+
+
+def is_interactive():
+    return _settings["interactive"]
+
+
+def pause(prompt):
+    """交互模式下等待按键，批处理模式下直接返回"""
+    if _settings["interactive"]:
+        try:
+            input(prompt)
+        except EOFError:
+            pass
+
+
+def write_summary(exit_code):
+    """写出结果摘要"""
+    if not _settings["summary"]:
+        return
+    summary = dict(SUMMARY)
+    summary.update(
+        status="success" if exit_code == EXIT_OK else "failed",
+        exit_code=exit_code,
+        failure=FAILURE_NAMES.get(exit_code),
+        finished_at=datetime.now().isoformat(timespec="seconds"),
+        timings=list(release_timing.TIMINGS),
+    )
+    text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+    if _settings["summary"] == "-":
+        _settings["stdout"].write(text + "\n")
+        _settings["stdout"].flush()
+    else:
+        with open(_settings["summary"], "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def finish(exit_code=EXIT_OK, prompt=None):
+    """写出摘要并结束；交互模式下先等待按键"""
+    write_summary(exit_code)
+    if prompt:
+        pause(prompt)
+    sys.exit(exit_code)
+
+
+def fail(exit_code):
+    """失败退出"""
+    finish(exit_code, "\n按回车键退出...")
@@ -8,14 +8,108 @@ StepUp 构建脚本
        python build.py 1.2.5 --platforms=windows,android,macos
 """
 
-import sys
 import os
 import re
+import json
+import shutil
+import time
+import hashlib
+import socket
+import threading
 import subprocess
+import urllib.parse
 import platform as sys_platform
+from collections import deque
 from pathlib import Path
 import argparse
 
+import batch
+import font_subset
+import release_timing
+from pipeline import Task, run_pipeline
+from release_timing import timed, format_timing
+
+
+# 构建缓存目录（位于项目根目录，flutter clean 不会清理）
+BUILD_CACHE_DIR = ".build_cache"
+# 每个平台保留的缓存条目数量
+BUILD_CACHE_KEEP = 3
+
+# 各平台构建产物所在目录
+PLATFORM_OUTPUTS = {
+    "windows": Path("build/windows/x64/runner/Release"),
+    "android": Path("build/app/outputs"),
+    "macos": Path("build/macos/Build/Products/Release"),
+    "linux": Path("build/linux/x64/release/bundle"),
+    "web": Path("build/web"),
+}
+
+# 各平台的构建命令，同时作为缓存键的一部分
+PLATFORM_BUILD_COMMANDS = {
+    "windows": "flutter build windows --release --no-pub",
+    "android": "flutter build apk --release --no-pub",
+    "macos": "flutter build macos --release --no-pub",
+    "linux": "flutter build linux --release --no-pub",
+    "web": "flutter build web --release --no-pub",
+}
+
+# Android 可选的构建产物及对应的构建命令：
+# universal 为包含所有 ABI 的 APK，split 为按 ABI 拆分的 APK，aab 为上架应用商店用的 App Bundle
+ANDROID_BUILD_COMMANDS = {
+    "universal": PLATFORM_BUILD_COMMANDS["android"],
+    "split": "flutter build apk --release --split-per-abi --no-pub",
+    "aab": "flutter build appbundle --release --no-pub",
+}
+
+# 镜像缓存代理地址（环境变量，如 http://127.0.0.1:8771），见 mirror_proxy.py
+MIRROR_PROXY_ENV = "STEPUP_MIRROR_PROXY"
+# 检查镜像缓存代理是否可以连接的超时（秒）
+MIRROR_PROXY_TIMEOUT = 1
+
+# 常驻构建服务传入的 Flutter SDK 版本信息（环境变量）
+FLUTTER_VERSION_ENV = "STEPUP_FLUTTER_VERSION"
+
+# 增量清理状态文件（位于构建缓存目录中）
+CLEAN_STATE_FILE = "clean_state.json"
+
+# 依赖解析状态文件（位于构建缓存目录中）
+PUB_STATE_FILE = "pub_state.json"
+
+# 各平台的构建中间产物，平台目录配置变化时删除
+PLATFORM_INTERMEDIATES = {
+    "windows": ["build/windows", "windows/flutter/ephemeral"],
+    "android": ["build/app", "android/.gradle"],
+    "macos": ["build/macos", "macos/Flutter/ephemeral"],
+    "ios": ["build/ios", "ios/Flutter/ephemeral"],
+    "linux": ["build/linux", "linux/flutter/ephemeral"],
+    "web": ["build/web"],
+}
+
+# flutter build 时独占使用的资源，占用相同资源的平台不会同时构建。
+# flutter build 即使使用 --no-pub，也会重新生成 .flutter-plugins-dependencies 和
+# .dart_tool/flutter_build/dart_plugin_registrant.dart，其他平台的构建（如 Gradle 配置阶段）同时会读取这些文件，
+# 因此所有平台共用 flutter 资源；缓存恢复、保存是单独的任务，不占用资源，可以与其他平台的构建同时进行
+PLATFORM_BUILD_RESOURCES = {
+    "windows": {"flutter", "cmake"},
+    "android": {"flutter", "gradle"},
+    "macos": {"flutter", "xcode"},
+    "ios": {"flutter", "xcode"},
+    "linux": {"flutter", "cmake"},
+    "web": {"flutter"},
+}
+
+# 命令失败时输出的末尾日志行数
+COMMAND_TAIL_LINES = 200
+
+# 所有平台共同依赖的输入
+CACHE_COMMON_INPUTS = ["lib", "assets", "pubspec.yaml", "pubspec.lock", "build.yaml"]
+
+# 计算缓存键时忽略的目录和文件（工具生成的中间产物）
+CACHE_IGNORED_NAMES = {
+    ".gradle", ".cxx", ".dart_tool", "build", "ephemeral",
+    "Pods", ".symlinks", "local.properties", ".DS_Store",
+}
+
 
 def print_header(title):
     print("=" * 50)
@@ -28,26 +122,227 @@ def print_step(step, total, message):
     print(f"[{step}/{total}] {message}...")
 
 
-def run_command(cmd, cwd=None, env=None):
-    """运行命令并返回结果"""
-    result = subprocess.run(
-        cmd, shell=True, cwd=cwd,
-        capture_output=True, text=True,
-        encoding='utf-8', errors='ignore',
-        env=env
-    )
-    if result.returncode != 0:
+def create_build_tasks(get_context, platforms, deps=(), fingerprint=None):
+    """创建各平台的构建任务
+
+    每个平台两个任务：「build 平台」执行 flutter build（命中缓存时直接完成），
+    占用 PLATFORM_BUILD_RESOURCES 中的资源；「cache 平台」随后从构建缓存恢复或保存到构建缓存，不占用资源。
+    get_context 返回构建上下文（一键构建打包时，上下文在准备任务执行后才生成）；
+    fingerprint 为 fingerprint(平台)，返回构建任务的指纹函数。
+    """
+    tasks = []
+    for platform in PLATFORM_BUILDERS:
+        if platform not in platforms:
+            continue
+        tasks.append(Task(
+            f"build {platform}",
+            lambda platform=platform: run_platform_build(get_context(), platform),
+            deps=deps,
+            resources=PLATFORM_BUILD_RESOURCES.get(platform, ()),
+            fingerprint=fingerprint(platform) if fingerprint else None
+        ))
+        tasks.append(Task(
+            f"cache {platform}",
+            lambda platform=platform: update_platform_cache(get_context(), platform),
+            deps=[f"build {platform}"]
+        ))
+    return tasks
+
+
+def run_build_tasks(context, platforms, jobs):
+    """调度执行各平台的构建任务，最多同时运行 jobs 个任务，返回 {平台: 是否成功}"""
+    results = run_pipeline(create_build_tasks(lambda: context, platforms), jobs)
+    return {
+        platform: bool(results.get(f"cache {platform}"))
+        for platform in PLATFORM_BUILDERS if platform in platforms
+    }
+
+
+class _WindowsCpuJob:
+    """Windows 作业对象，统计子进程及其所有后代进程占用的 CPU 时间
+
+    shell=True 时子进程是 cmd.exe，实际的构建在 flutter.bat 启动的 dart 等后代进程中进行，
+    GetProcessTimes 只能得到 cmd.exe 自身的 CPU 时间。子进程以挂起状态创建，加入作业对象后再恢复运行，
+    之后启动的后代进程都属于该作业对象。
+    """
+
+    CREATE_SUSPENDED = 0x00000004
+    JOB_OBJECT_BASIC_ACCOUNTING_INFORMATION = 1
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self.ntdll = ctypes.WinDLL("ntdll")
+        self.kernel32.CreateJobObjectW.argtypes = [ctypes.c_void_p, wintypes.LPCWSTR]
+        self.kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        self.kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+        self.kernel32.AssignProcessToJobObject.restype = wintypes.BOOL
+        self.kernel32.QueryInformationJobObject.argtypes = [
+            wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD)
+        ]
+        self.kernel32.QueryInformationJobObject.restype = wintypes.BOOL
+        self.kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self.ntdll.NtResumeProcess.argtypes = [wintypes.HANDLE]
+        self.handle = self.kernel32.CreateJobObjectW(None, None)
+        if not self.handle:
+            raise OSError(ctypes.get_last_error(), "CreateJobObject 失败")
+
+    def attach(self, process):
+        """将以挂起状态创建的子进程加入作业对象并恢复运行，返回是否加入成功"""
+        handle = int(process._handle)
+        try:
+            return bool(self.kernel32.AssignProcessToJobObject(self.handle, handle))
+        finally:
+            self.ntdll.NtResumeProcess(handle)
+
+    def cpu_time(self):
+        """作业对象中所有进程（包括已退出的）的用户态和内核态 CPU 时间（秒），无法获取时返回 None"""
+        ctypes = self.ctypes
+
+        class BasicAccountingInformation(ctypes.Structure):
+            _fields_ = [
+                ("TotalUserTime", ctypes.c_int64),
+                ("TotalKernelTime", ctypes.c_int64),
+                ("ThisPeriodTotalUserTime", ctypes.c_int64),
+                ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+                ("TotalPageFaultCount", ctypes.c_uint32),
+                ("TotalProcesses", ctypes.c_uint32),
+                ("ActiveProcesses", ctypes.c_uint32),
+                ("TotalTerminatedProcesses", ctypes.c_uint32),
+            ]
+
+        info = BasicAccountingInformation()
+        if not self.kernel32.QueryInformationJobObject(
+            self.handle, self.JOB_OBJECT_BASIC_ACCOUNTING_INFORMATION,
+            ctypes.byref(info), ctypes.sizeof(info), None
+        ):
+            return None
+        return (info.TotalUserTime + info.TotalKernelTime) / 10_000_000
+
+    def close(self):
+        if self.handle:
+            self.kernel32.CloseHandle(self.handle)
+            self.handle = None
+
+
+def _create_cpu_job():
+    """Windows 上创建统计 CPU 时间的作业对象，其他系统或创建失败时返回 None"""
+    if os.name != "nt":
+        return None
+    try:
+        return _WindowsCpuJob()
+    except (ImportError, AttributeError, OSError):
+        return None
+
+
+def _get_child_cpu_time(process, job=None):
+    """等待子进程结束，返回其及后代进程占用的 CPU 时间（秒），无法获取时返回 None
+
+    Windows 上只统计作业对象 job 中的进程，没有作业对象时不报告 CPU 时间
+    （cmd.exe 自身的 CPU 时间与实际构建无关，记录下来反而会误导耗时对比）。
+    """
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage.ru_utime + usage.ru_stime
+
+    process.wait()
+    if job is None:
+        return None
+    try:
+        return job.cpu_time()
+    finally:
+        job.close()
+
+
+def run_command(cmd, cwd=None, env=None, label=None, phase=None):
+    """运行命令并实时输出日志
+
+    子进程的 stdout/stderr 由读取线程逐行读取并立即打印（带 [label] 前缀），
+    只保留最后 COMMAND_TAIL_LINES 行用于失败时的错误报告。
+    同时以 phase（默认为 label）为阶段名记录墙钟时间和 CPU 时间。
+    """
+    prefix = f"[{label}] " if label else "      "
+    tail = deque(maxlen=COMMAND_TAIL_LINES)
+    tail_lock = threading.Lock()
+
+    def pump(pipe):
+        for line in pipe:
+            line = line.rstrip("\r\n")
+            with tail_lock:
+                tail.append(line)
+            print(f"{prefix}{line}")
+        pipe.close()
+
+    start = time.perf_counter()
+    job = _create_cpu_job()
+    try:
+        process = subprocess.Popen(
+            cmd, shell=True, cwd=cwd, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='ignore',
+            creationflags=job.CREATE_SUSPENDED if job else 0
+        )
+    except OSError:
+        if job:
+            job.close()
+        raise
+    if job and not job.attach(process):
+        job.close()
+        job = None
+    readers = [
+        threading.Thread(target=pump, args=(pipe,), daemon=True)
+        for pipe in (process.stdout, process.stderr)
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    cpu = _get_child_cpu_time(process, job)
+    wall = time.perf_counter() - start
+
+    release_timing.record(phase or label or cmd, wall, cpu)
+    print(f"{prefix}{format_timing(wall, cpu)}")
+
+    if process.returncode != 0:
         print(f"[错误] 命令执行失败: {cmd}")
-        if result.stderr:
-            print(result.stderr)
+        if tail:
+            print(f"[错误] 最后 {len(tail)} 行输出:")
+            print("\n".join(tail))
         return False
     return True
 
 
+def get_mirror_proxy():
+    """获取已配置且可以连接的镜像缓存代理地址（见 mirror_proxy.py），未配置或无法连接时返回 None"""
+    proxy = os.environ.get(MIRROR_PROXY_ENV, "").rstrip("/")
+    if not proxy:
+        return None
+    url = urllib.parse.urlsplit(proxy)
+    try:
+        with socket.create_connection((url.hostname, url.port or 80), timeout=MIRROR_PROXY_TIMEOUT):
+            pass
+    except (OSError, ValueError):
+        print(f"[警告] 无法连接镜像缓存代理 {proxy}，直接使用国内镜像")
+        return None
+    return proxy
+
+
 def get_mirror_env():
-    """获取包含镜像设置的环境变量"""
+    """获取包含镜像设置的环境变量
+
+    设置了 STEPUP_MIRROR_PROXY 时经由本地的镜像缓存代理访问，否则直接使用国内镜像。
+    """
     env = os.environ.copy()
 
+    proxy = get_mirror_proxy()
+    if proxy is not None:
+        env["FLUTTER_STORAGE_BASE_URL"] = f"{proxy}/storage"
+        env["PUB_HOSTED_URL"] = f"{proxy}/pub"
+        return env
+
     # Flutter 国内镜像
     env["FLUTTER_STORAGE_BASE_URL"] = "https://storage.flutter-io.cn"
     env["PUB_HOSTED_URL"] = "https://pub.flutter-io.cn"
@@ -55,6 +350,227 @@ def get_mirror_env():
     return env
 
 
+def get_flutter_version(env=None):
+    """获取 Flutter SDK 版本信息，用于构建缓存键
+
+    由常驻构建服务（build_daemon.py）启动时，直接使用服务缓存的版本信息，不再启动 flutter 查询。
+    """
+    version = (env or os.environ).get(FLUTTER_VERSION_ENV)
+    if version:
+        return version
+    result = subprocess.run(
+        "flutter --version --machine", shell=True,
+        capture_output=True, text=True,
+        encoding='utf-8', errors='ignore',
+        env=env
+    )
+    if result.returncode != 0:
+        return "unknown"
+    try:
+        info = json.loads(result.stdout[result.stdout.index("{"):])
+    except ValueError:
+        return result.stdout.strip() or "unknown"
+    return "/".join(
+        str(info.get(key, "")) for key in ("frameworkRevision", "engineRevision", "dartSdkVersion")
+    )
+
+
+def hash_path(hasher, path, project_root):
+    """将文件或目录的相对路径和内容写入哈希"""
+    if not path.exists():
+        return
+    if path.is_file():
+        files = [path]
+    else:
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in CACHE_IGNORED_NAMES)
+            files.extend(Path(root) / name for name in sorted(names) if name not in CACHE_IGNORED_NAMES)
+    for file in files:
+        hasher.update(file.relative_to(project_root).as_posix().encode("utf-8") + b"\0")
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        hasher.update(b"\0")
+
+
+def get_build_commands(platform, android_outputs=None):
+    """平台的构建命令列表"""
+    if platform == "android":
+        return [ANDROID_BUILD_COMMANDS[output] for output in android_outputs or ["universal"]]
+    return [PLATFORM_BUILD_COMMANDS[platform]]
+
+
+def compute_cache_key(project_root, platform, flutter_version, android_outputs=None):
+    """根据平台的构建输入计算缓存键"""
+    hasher = hashlib.sha256()
+    commands = "\0".join(get_build_commands(platform, android_outputs))
+    hasher.update(f"{platform}\0{commands}\0{flutter_version}\0".encode("utf-8"))
+    for name in CACHE_COMMON_INPUTS + [platform]:
+        hash_path(hasher, project_root / name, project_root)
+    return hasher.hexdigest()
+
+
+def get_cache_entry(project_root, platform, key):
+    """获取缓存条目目录"""
+    return project_root / BUILD_CACHE_DIR / platform / key
+
+
+def restore_from_cache(project_root, platform, key):
+    """从缓存恢复构建产物，命中时返回 True"""
+    entry = get_cache_entry(project_root, platform, key)
+    if not entry.is_dir():
+        return False
+    output_dir = project_root / PLATFORM_OUTPUTS[platform]
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copytree(entry, output_dir, symlinks=True)
+    os.utime(entry)
+    return True
+
+
+def save_to_cache(project_root, platform, key):
+    """将构建产物保存到缓存，并清理过旧的缓存条目"""
+    output_dir = project_root / PLATFORM_OUTPUTS[platform]
+    if not output_dir.is_dir():
+        return False
+    entry = get_cache_entry(project_root, platform, key)
+    temp_entry = entry.with_name(entry.name + ".tmp")
+    if temp_entry.exists():
+        shutil.rmtree(temp_entry)
+    shutil.copytree(output_dir, temp_entry, symlinks=True)
+    if entry.exists():
+        shutil.rmtree(entry)
+    temp_entry.rename(entry)
+    # copytree 会复制构建目录的修改时间，这里改为当前时间，按最近使用的顺序清理
+    os.utime(entry)
+
+    entries = sorted(
+        (e for e in entry.parent.iterdir() if e.is_dir() and not e.name.endswith(".tmp")),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True
+    )
+    for old_entry in entries[BUILD_CACHE_KEEP:]:
+        shutil.rmtree(old_entry, ignore_errors=True)
+    return True
+
+
+def fingerprint_path(project_root, name):
+    """计算项目中某个文件或目录的指纹"""
+    hasher = hashlib.sha256()
+    hash_path(hasher, project_root / name, project_root)
+    return hasher.hexdigest()
+
+
+def load_clean_state(project_root):
+    """读取上次构建时记录的清理状态"""
+    state_path = project_root / BUILD_CACHE_DIR / CLEAN_STATE_FILE
+    try:
+        return json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_clean_state(project_root, flutter_version, built_platforms):
+    """记录本次构建的 SDK 版本、pubspec.lock 和各平台目录指纹"""
+    state = load_clean_state(project_root) or {"native": {}}
+    state["sdk"] = flutter_version
+    state["pubspec_lock"] = fingerprint_path(project_root, "pubspec.lock")
+    for platform in built_platforms:
+        state["native"][platform] = fingerprint_path(project_root, platform)
+    state_path = project_root / BUILD_CACHE_DIR / CLEAN_STATE_FILE
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+
+def remove_paths(project_root, names):
+    """删除项目中的文件或目录，返回实际删除的路径"""
+    removed = []
+    for name in names:
+        path = project_root / name
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+        else:
+            continue
+        removed.append(name)
+    return removed
+
+
+def smart_clean(project_root, platforms, flutter_version, force=False):
+    """按需清理构建缓存
+
+    - 首次构建、指定 force 或 Flutter SDK 版本变化时执行完整的 flutter clean
+    - pubspec.lock 变化时删除 .dart_tool
+    - 平台目录（原生配置）变化时只删除该平台的中间产物
+    """
+    state = load_clean_state(project_root)
+    if force or state is None or state.get("sdk") != flutter_version:
+        if force:
+            print("      强制完整清理")
+        elif state is None:
+            print("      未找到上次构建记录，执行完整清理")
+        else:
+            print("      Flutter SDK 版本已变化，执行完整清理")
+        return run_command("flutter clean", label="clean")
+
+    removed = []
+    if state.get("pubspec_lock") != fingerprint_path(project_root, "pubspec.lock"):
+        removed += remove_paths(project_root, [".dart_tool"])
+    for platform in platforms:
+        if platform not in PLATFORM_INTERMEDIATES:
+            continue
+        if state.get("native", {}).get(platform) != fingerprint_path(project_root, platform):
+            removed += remove_paths(project_root, PLATFORM_INTERMEDIATES[platform])
+
+    if removed:
+        print(f"      已删除过期内容: {', '.join(removed)}")
+    else:
+        print("      构建缓存均为最新，无需清理")
+    return True
+
+
+def compute_pub_fingerprint(project_root, flutter_version):
+    """计算依赖解析的指纹：pubspec.yaml（不含版本号行）、pubspec.lock 和 SDK 版本"""
+    hasher = hashlib.sha256()
+    hasher.update(f"{flutter_version}\0".encode("utf-8"))
+    pubspec = (project_root / "pubspec.yaml").read_text(encoding="utf-8")
+    pubspec = re.sub(r"^version: .*$", "", pubspec, flags=re.MULTILINE)
+    hasher.update(pubspec.encode("utf-8") + b"\0")
+    hash_path(hasher, project_root / "pubspec.lock", project_root)
+    return hasher.hexdigest()
+
+
+def resolve_dependencies(project_root, env, flutter_version):
+    """获取依赖
+
+    指纹与上次成功解析时一致且 .dart_tool/package_config.json 存在时直接跳过；
+    否则先以离线模式解析（只使用本地 pub 缓存），失败后再通过镜像联网获取。
+    """
+    state_path = project_root / BUILD_CACHE_DIR / PUB_STATE_FILE
+    fingerprint = compute_pub_fingerprint(project_root, flutter_version)
+    package_config = project_root / ".dart_tool" / "package_config.json"
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+
+    if state.get("fingerprint") == fingerprint and package_config.exists():
+        print("      依赖未变化，跳过 pub get")
+        return True
+
+    if not run_command("flutter pub get --offline", env=env, label="pub get", phase="pub get offline"):
+        print("      离线解析失败，从镜像获取依赖")
+        if not run_command("flutter pub get", env=env, label="pub get"):
+            return False
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps({"fingerprint": fingerprint}, indent=2), encoding="utf-8")
+    return True
+
+
 def validate_version(version):
     """验证版本号格式"""
     pattern = r"^\d+\.\d+\.\d+$"
@@ -69,8 +585,10 @@ def update_pubspec_version(project_root, version):
         return False
 
     content = pubspec_path.read_text(encoding="utf-8")
-    content = re.sub(r"^version: .*$", f"version: {version}", content, flags=re.MULTILINE)
-    pubspec_path.write_text(content, encoding="utf-8")
+    updated = re.sub(r"^version: .*$", f"version: {version}", content, flags=re.MULTILINE)
+    # 版本号没有变化时不改写文件，避免触发监视模式和编辑器的文件变化
+    if updated != content:
+        pubspec_path.write_text(updated, encoding="utf-8")
     return True
 
 
@@ -87,6 +605,23 @@ def get_platforms_to_build():
         return ["android"]
 
 
+def add_android_arguments(parser):
+    """添加 Android 构建产物相关的命令行参数"""
+    parser.add_argument(
+        "--android-outputs",
+        help="Android 构建产物，逗号分隔 (universal,split,aab，默认: universal)",
+        default="universal"
+    )
+
+
+def parse_android_outputs(value):
+    """解析 --android-outputs，包含未知产物类型时返回 None"""
+    outputs = [o.strip().lower() for o in value.split(",") if o.strip()]
+    if not outputs or any(o not in ANDROID_BUILD_COMMANDS for o in outputs):
+        return None
+    return list(dict.fromkeys(outputs))
+
+
 def parse_arguments():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(
@@ -98,6 +633,12 @@ def parse_arguments():
   python build.py 1.2.5 --platforms=macos
   python build.py 1.2.5 --platforms=windows,android,macos
   python build.py 1.2.5 --all-platforms
+  python build.py 1.2.5 --no-cache
+  python build.py 1.2.5 --platforms=android,web --jobs=2
+  python build.py 1.2.5 --force-clean
+  python build.py 1.2.5 --platforms=android --android-outputs=universal,split,aab
+  python build.py 1.2.5 --subset-fonts --font-fallback=gb2312
+  python build.py 1.2.5 --platforms=linux,web --watch
         """
     )
     parser.add_argument("version", help="版本号 (格式: x.x.x)")
@@ -111,36 +652,64 @@ def parse_arguments():
         help="构建所有支持的平台",
         action="store_true"
     )
+    parser.add_argument(
+        "--no-cache",
+        help="不使用构建缓存，强制重新构建所有平台",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--force-clean",
+        help="构建前执行完整的 flutter clean，而不是按需清理",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--jobs",
+        help="同时构建的平台数量 (默认: 1，即依次构建)",
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        "--watch",
+        help="监视模式：构建后监视源码和平台目录，文件变化时只重新构建受影响的平台（默认平台: 本机桌面平台和 web）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--watch-debounce",
+        help="监视模式下最后一次修改后等待的秒数 (默认: 0.5)",
+        type=float,
+        default=0.5
+    )
+    add_android_arguments(parser)
+    font_subset.add_arguments(parser)
+    batch.add_arguments(parser)
     return parser.parse_args()
 
 
 def build_windows(project_root, env):
     """构建 Windows 应用"""
     print_step(4, 6, "构建 Windows 应用")
-    if not run_command("flutter build windows --release", env=env):
+    if not run_command(PLATFORM_BUILD_COMMANDS["windows"], env=env, label="windows", phase="build windows"):
         return False
     print("      Windows 构建完成")
     return True
 
 
-def build_android(project_root, env):
-    """构建 Android 应用"""
+def build_android(project_root, env, outputs=None):
+    """构建 Android 应用
+
+    outputs 为要生成的产物（见 ANDROID_BUILD_COMMANDS），默认只生成包含所有 ABI 的 APK。
+    Gradle 不能在同一项目中同时运行，各产物依次构建，后面的构建复用 Gradle 的增量结果。
+    """
     print_step(5, 6, "构建 Android 应用")
-    result = subprocess.run(
-        "flutter build apk --release",
-        shell=True,
-        env=env,
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='ignore'
-    )
-    if result.returncode != 0:
-        print("[错误] Android 构建失败！")
-        if result.stderr:
-            print(result.stderr)
-        return False
-    print("      Android 构建完成")
+    outputs = outputs or ["universal"]
+    # 删除之前构建的产物，避免其他构建模式留下的 APK 被一起打包
+    shutil.rmtree(project_root / PLATFORM_OUTPUTS["android"], ignore_errors=True)
+    for output in outputs:
+        phase = "build android" if output == "universal" else f"build android {output}"
+        if not run_command(ANDROID_BUILD_COMMANDS[output], env=env, label="android", phase=phase):
+            print(f"[错误] Android 构建失败！({output})")
+            return False
+    print(f"      Android 构建完成: {', '.join(outputs)}")
     return True
 
 
@@ -153,7 +722,7 @@ def build_macos(project_root, env):
         print("      [跳过] macOS 构建需要在 macOS 系统上运行")
         return True  # 返回 True 表示不是错误，只是跳过
 
-    if not run_command("flutter build macos --release", env=env):
+    if not run_command(PLATFORM_BUILD_COMMANDS["macos"], env=env, label="macos", phase="build macos"):
         return False
     print("      macOS 构建完成")
     return True
@@ -168,7 +737,7 @@ def build_linux(project_root, env):
         print("      [跳过] Linux 构建需要在 Linux 系统上运行")
         return True
 
-    if not run_command("flutter build linux --release", env=env):
+    if not run_command(PLATFORM_BUILD_COMMANDS["linux"], env=env, label="linux", phase="build linux"):
         return False
     print("      Linux 构建完成")
     return True
@@ -177,24 +746,147 @@ def build_linux(project_root, env):
 def build_web(project_root, env):
     """构建 Web 应用"""
     print_step(6, 6, "构建 Web 应用")
-    if not run_command("flutter build web --release", env=env):
+    if not run_command(PLATFORM_BUILD_COMMANDS["web"], env=env, label="web", phase="build web"):
         return False
     print("      Web 构建完成")
     return True
 
 
-def main():
-    print_header("StepUp 构建脚本")
+# 各平台的构建函数
+PLATFORM_BUILDERS = {
+    "windows": build_windows,
+    "android": build_android,
+    "macos": build_macos,
+    "linux": build_linux,
+    "web": build_web,
+}
+
+
+def prepare_build(project_root, version, platforms, no_cache=False, force_clean=False, android_outputs=None):
+    """构建前的准备：更新版本号、检查构建缓存、按需清理、获取依赖
+
+    返回构建上下文，供 build_platform() 和 finish_build() 使用；失败时返回 None。
+    """
+    context = check_build_cache(project_root, version, platforms, no_cache, android_outputs=android_outputs)
+    if context is None or not prepare_workspace(context, force_clean):
+        return None
+    return context
+
+
+def check_build_cache(project_root, version, platforms, no_cache=False, flutter_version=None, android_outputs=None):
+    """更新版本号并检查构建缓存，返回构建上下文，失败时返回 None"""
+    # 步骤 1: 更新版本号
+    print_step(1, 4, "更新 pubspec.yaml 版本号")
+    with timed("pubspec update"):
+        updated = update_pubspec_version(project_root, version)
+    if not updated:
+        return None
+    print("      版本号已更新")
+    print()
+
+    # 步骤 2: 检查构建缓存
+    print_step(2, 4, "检查构建缓存")
+    env = get_mirror_env()
+    cache_keys = {}
+    cached_platforms = []
+    flutter_version = flutter_version or get_flutter_version(env)
+    if no_cache:
+        print("      已禁用构建缓存")
+    else:
+        with timed("cache check"):
+            for platform in platforms:
+                if platform not in PLATFORM_OUTPUTS:
+                    continue
+                cache_keys[platform] = compute_cache_key(project_root, platform, flutter_version, android_outputs)
+                if get_cache_entry(project_root, platform, cache_keys[platform]).is_dir():
+                    cached_platforms.append(platform)
+        if cached_platforms:
+            print(f"      缓存命中: {', '.join(cached_platforms)}")
+        else:
+            print("      未命中缓存")
+    print()
+
+    return {
+        "project_root": project_root,
+        "env": env,
+        "flutter_version": flutter_version,
+        "cache_keys": cache_keys,
+        "cached_platforms": cached_platforms,
+        "pending_platforms": [p for p in platforms if p not in cached_platforms],
+        "android_outputs": android_outputs or ["universal"],
+    }
+
+
+def prepare_workspace(context, force_clean=False):
+    """为需要重新构建的平台按需清理并获取依赖"""
+    project_root = context["project_root"]
+    pending_platforms = context["pending_platforms"]
+    if not pending_platforms:
+        print("[信息] 所有平台均命中缓存，跳过清理和依赖获取")
+        print()
+        return True
+
+    # 步骤 3: 清理构建缓存
+    print_step(3, 4, "清理构建缓存")
+    with timed("smart clean"):
+        cleaned = smart_clean(project_root, pending_platforms, context["flutter_version"], force_clean)
+    if not cleaned:
+        return False
+    print("      清理完成")
+    print()
+
+    # 步骤 4: 获取依赖
+    print_step(4, 4, "获取依赖")
+    if not resolve_dependencies(project_root, context["env"], context["flutter_version"]):
+        return False
+    print("      依赖获取完成")
+    print()
+    return True
+
+
+def run_platform_build(context, platform):
+    """执行单个平台的 flutter build，命中构建缓存时不构建（由 update_platform_cache 恢复）"""
+    if platform in context["cached_platforms"]:
+        return True
+    if platform == "android":
+        return build_android(context["project_root"], context["env"], context["android_outputs"])
+    return PLATFORM_BUILDERS[platform](context["project_root"], context["env"])
+
+
+def update_platform_cache(context, platform):
+    """命中缓存时从缓存恢复构建产物，否则将刚构建的产物保存到缓存"""
+    project_root = context["project_root"]
+    cache_key = context["cache_keys"].get(platform)
+    if platform in context["cached_platforms"]:
+        with timed(f"cache restore {platform}", platform):
+            restored = restore_from_cache(project_root, platform, cache_key)
+        print(f"[缓存] {platform} 已从构建缓存恢复")
+        return restored
+    if cache_key is not None:
+        with timed(f"cache save {platform}", platform):
+            save_to_cache(project_root, platform, cache_key)
+    return True
+
+
+def finish_build(context, build_results):
+    """记录清理状态，供下次构建判断哪些内容已过期"""
+    built_platforms = [p for p in context["pending_platforms"] if build_results.get(p)]
+    if built_platforms:
+        save_clean_state(context["project_root"], context["flutter_version"], built_platforms)
 
+
+def main():
     # 解析参数
     args = parse_arguments()
     version = args.version
+    batch.configure(args, "build", version)
+
+    print_header("StepUp 构建脚本")
 
     # 验证版本号
     if not validate_version(version):
         print("[错误] 版本号格式不正确，请使用 x.x.x 格式，例如: 1.2.5")
-        input("\n按回车键退出...")
-        sys.exit(1)
+        batch.fail(batch.EXIT_USAGE)
 
     # 设置路径
     script_dir = Path(__file__).parent.resolve()
@@ -206,69 +898,56 @@ def main():
         platforms = ["windows", "android", "macos", "linux", "web"]
     elif args.platforms:
         platforms = [p.strip().lower() for p in args.platforms.split(",")]
+    elif args.watch:
+        platforms = [p for p in get_platforms_to_build() if p not in ("android", "ios")] + ["web"]
     else:
         platforms = get_platforms_to_build()
 
+    android_outputs = parse_android_outputs(args.android_outputs)
+    if android_outputs is None:
+        print(f"[错误] 未知的 Android 构建产物: {args.android_outputs}，可选: {', '.join(ANDROID_BUILD_COMMANDS)}")
+        batch.fail(batch.EXIT_USAGE)
+
     print(f"[信息] 版本号: {version}")
     print(f"[信息] 项目路径: {project_root}")
     print(f"[信息] 构建平台: {', '.join(platforms)}")
+    if "android" in platforms:
+        print(f"[信息] Android 产物: {', '.join(android_outputs)}")
     print(f"[信息] 当前系统: {sys_platform.system()}")
     print()
 
-    # 步骤 1: 更新版本号
-    print_step(1, 3, "更新 pubspec.yaml 版本号")
-    if not update_pubspec_version(project_root, version):
-        input("\n按回车键退出...")
-        sys.exit(1)
-    print("      版本号已更新")
-    print()
-
-    # 步骤 2: 清理构建缓存
-    print_step(2, 3, "清理构建缓存")
-    if not run_command("flutter clean"):
-        input("\n按回车键退出...")
-        sys.exit(1)
-    print("      清理完成")
-    print()
-
-    # 步骤 3: 获取依赖
-    print_step(3, 3, "获取依赖")
-    env = get_mirror_env()
-    if not run_command("flutter pub get", env=env):
-        input("\n按回车键退出...")
-        sys.exit(1)
-    print("      依赖获取完成")
-    print()
-
-    # 构建各平台
-    build_results = {}
-    
-    if "windows" in platforms:
-        build_results["windows"] = build_windows(project_root, env)
-        print()
-    
-    if "android" in platforms:
-        build_results["android"] = build_android(project_root, env)
-        print()
-    
-    if "macos" in platforms:
-        build_results["macos"] = build_macos(project_root, env)
-        print()
-    
-    if "linux" in platforms:
-        build_results["linux"] = build_linux(project_root, env)
-        print()
-    
-    if "web" in platforms:
-        build_results["web"] = build_web(project_root, env)
-        print()
+    if args.watch:
+        import build_watch
+
+        build_watch.watch(project_root, version, platforms, {
+            "no_cache": args.no_cache,
+            "jobs": args.jobs,
+            "android_outputs": android_outputs,
+            "subset_fonts": args.subset_fonts,
+            "font_fallback": args.font_fallback,
+        }, args.watch_debounce)
+        batch.finish()
+
+    # 构建期间使用字体子集，结束后恢复原字体（子集化在检查构建缓存之前，缓存键按子集计算）
+    with font_subset.font_subsets(project_root, args.subset_fonts, args.font_fallback):
+        context = prepare_build(project_root, version, platforms, args.no_cache, args.force_clean, android_outputs)
+        if context is None:
+            batch.fail(batch.EXIT_PREPARE)
+
+        # 构建各平台
+        build_results = run_build_tasks(context, platforms, args.jobs)
+        finish_build(context, build_results)
+    batch.SUMMARY["results"] = build_results
+    batch.SUMMARY["artifacts"] = [
+        str(project_root / PLATFORM_OUTPUTS[p]) for p, success in build_results.items()
+        if success and p in PLATFORM_OUTPUTS and (project_root / PLATFORM_OUTPUTS[p]).exists()
+    ]
 
     # 检查是否有构建失败
     failed_platforms = [p for p, success in build_results.items() if not success]
     if failed_platforms:
         print(f"[错误] 以下平台构建失败: {', '.join(failed_platforms)}")
-        input("\n按回车键退出...")
-        sys.exit(1)
+        batch.fail(batch.EXIT_BUILD)
 
     # 完成
     print_header("构建完成！")
@@ -278,7 +957,7 @@ def main():
     if "windows" in platforms:
         print("  Windows: build\\windows\\x64\\runner\\Release\\")
     if "android" in platforms:
-        print("  Android: build\\app\\outputs\\flutter-apk\\app-release.apk")
+        print("  Android: build\\app\\outputs\\")
     if "macos" in platforms:
         print("  macOS:   build\\macos\\Build\\Products\\Release\\")
     if "linux" in platforms:
@@ -286,6 +965,9 @@ def main():
     if "web" in platforms:
         print("  Web:     build\\web\\")
     print()
+    release_timing.print_summary()
+    release_timing.save_history(project_root, version, "build")
+    batch.finish()
 
 
 if __name__ == "__main__":
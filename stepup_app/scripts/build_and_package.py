@@ -7,19 +7,46 @@ StepUp 一键构建打包脚本
        python build_and_package.py 1.2.5 --platforms=macos
        python build_and_package.py 1.2.5 --platforms=windows,android,macos
        python build_and_package.py 1.2.5 --all-platforms
+       python build_and_package.py 1.2.5 --jobs=3
 
 功能:
 1. 构建应用（更新版本号、编译各平台）
 2. 打包应用（生成安装包）
 3. 同步版本号到网页
+
+构建和打包在同一进程中以流水线方式执行：准备 -> 各平台构建 -> 各平台打包 -> 校验文件 -> 体积预算检查 -> 网页同步，
+每个平台构建完成后立即开始打包，不必等待其他平台构建完成。
+
+各步骤的完成状态和输入指纹记录在 releases/v{版本号}/.pipeline-state.json 中，
+使用 --resume 重新运行时，已完成且输入未变化的步骤会被跳过，从失败的步骤继续。
+
+使用 --workers=节点地址 时，各平台分发到对应的构建节点（见 build_worker.py）上构建打包，
+日志实时转发到本机，产物下载到本机的 releases/v{版本号}/ 后统一生成校验文件。
 """
 
 import sys
+import os
 import re
+import json
+import hashlib
 import subprocess
 import argparse
+import urllib.parse
 from pathlib import Path
 
+import batch
+import build
+import build_worker
+import font_subset
+import package
+import release_timing
+from pipeline import Task, Checkpoint, run_pipeline
+from release_timing import timed
+
+
+# 流水线检查点文件（位于发行目录中）
+PIPELINE_STATE_FILE = ".pipeline-state.json"
+
 
 def print_header(title):
     print("=" * 50)
@@ -34,24 +61,6 @@ def validate_version(version):
     return re.match(pattern, version) is not None
 
 
-def run_script(script_name, version, platforms=None, all_platforms=False):
-    """运行子脚本"""
-    script_dir = Path(__file__).parent.resolve()
-    script_path = script_dir / script_name
-
-    cmd = [sys.executable, str(script_path), version]
-    if all_platforms:
-        cmd.append("--all-platforms")
-    elif platforms:
-        cmd.append(f"--platforms={platforms}")
-
-    result = subprocess.run(
-        cmd,
-        cwd=script_dir.parent
-    )
-    return result.returncode == 0
-
-
 def sync_website_version(version):
     """同步版本号到网页"""
     script_dir = Path(__file__).parent.resolve()
@@ -63,12 +72,13 @@ def sync_website_version(version):
         return False
 
     print("正在同步版本号到网页...")
-    result = subprocess.run(
-        [sys.executable, str(website_script)],
-        cwd=website_script.parent,
-        capture_output=True,
-        text=True
-    )
+    with timed("website sync"):
+        result = subprocess.run(
+            [sys.executable, str(website_script)],
+            cwd=website_script.parent,
+            capture_output=True,
+            text=True
+        )
 
     if result.returncode == 0:
         print("[成功] 网页版本号已同步")
@@ -79,6 +89,191 @@ def sync_website_version(version):
         return False
 
 
+def hash_values(*values):
+    """计算一组值的指纹"""
+    hasher = hashlib.sha256()
+    for value in values:
+        hasher.update(f"{value}\0".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def file_states(paths):
+    """文件名、大小和修改时间，用于判断产物是否被改动或删除"""
+    return sorted((f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in paths if f.is_file())
+
+
+def check_size_budgets(project_root, version, check_budgets=True):
+    """打印产物体积组成，check_budgets 为真时检查体积预算，超出预算时返回 False"""
+    return not package.report_sizes(project_root, version, check_budgets=check_budgets)
+
+
+def create_pipeline(project_root, version, build_platforms, package_platforms, archive_options,
+                    context, flutter_version, android_outputs=None, check_budgets=True):
+    """创建构建打包流水线的任务列表
+
+    context 用于在准备任务和各平台构建任务之间传递构建上下文。
+    各任务的指纹函数在任务完成后和恢复运行前各计算一次，两者一致时跳过该任务。
+    """
+    version_dir = project_root / "releases" / f"v{version}"
+
+    def prepare():
+        prepared = build.check_build_cache(
+            project_root, version, build_platforms, flutter_version=flutter_version, android_outputs=android_outputs
+        )
+        if prepared is None:
+            return False
+        context.update(prepared)
+        return True
+
+    def dependencies_fingerprint():
+        if not (project_root / ".dart_tool" / "package_config.json").exists():
+            return None
+        return hash_values(build.compute_pub_fingerprint(project_root, flutter_version), *build_platforms)
+
+    def build_fingerprint(platform):
+        if platform not in build.PLATFORM_OUTPUTS or not (project_root / build.PLATFORM_OUTPUTS[platform]).exists():
+            return None
+        return build.compute_cache_key(project_root, platform, flutter_version, android_outputs)
+
+    def package_fingerprint(platform):
+        pattern = package.PLATFORM_ARTIFACT_PATTERNS[platform].format(version=version)
+        artifacts = file_states(version_dir.glob(pattern))
+        if not artifacts:
+            return None
+        source = "windows" if platform == "installer" else platform
+        return hash_values(
+            build_fingerprint(source), json.dumps(archive_options, default=str, sort_keys=True), artifacts
+        )
+
+    def manifest_fingerprint():
+        if not (version_dir / package.MANIFEST_FILE).exists():
+            return None
+        return hash_values(
+            file_states(package.list_release_artifacts(version_dir)),
+            file_states([version_dir / package.MANIFEST_FILE, version_dir / package.CHECKSUMS_FILE])
+        )
+
+    tasks = [
+        # 更新版本号和检查缓存都很快，且后续任务需要其中的构建上下文，因此总是执行
+        Task("prepare", prepare),
+        Task(
+            "dependencies",
+            lambda: build.prepare_workspace(context),
+            deps=["prepare"],
+            fingerprint=dependencies_fingerprint
+        ),
+    ]
+    # 各平台的 flutter build 依次执行（共用 flutter 资源），缓存恢复、保存和打包可以与其他平台的构建同时进行
+    tasks += build.create_build_tasks(
+        lambda: context, build_platforms, deps=["dependencies"],
+        fingerprint=lambda platform: lambda: build_fingerprint(platform)
+    )
+
+    packagers = {
+        "windows": lambda: package.package_windows(project_root, version_dir, version, archive_options),
+        "android": lambda: package.package_android(project_root, version_dir, version),
+        "macos": lambda: package.package_macos(project_root, version_dir, version, archive_options),
+        "linux": lambda: package.package_linux(project_root, version_dir, version, archive_options),
+        "web": lambda: package.package_web(project_root, version_dir, version, archive_options),
+        "installer": lambda: package.package_installer(project_root, version_dir, version),
+    }
+    package_tasks = []
+    for platform, packager in packagers.items():
+        if platform not in package_platforms:
+            continue
+        # 安装程序由 Windows 构建产物编译而成
+        source = "windows" if platform == "installer" else platform
+        deps = [f"cache {source}"] if source in build_platforms else ["prepare"]
+        package_tasks.append(f"package {platform}")
+        tasks.append(Task(
+            f"package {platform}",
+            packager,
+            deps=deps,
+            fingerprint=lambda platform=platform: package_fingerprint(platform)
+        ))
+
+    tasks.append(Task(
+        "manifest",
+        lambda: package.summarize_release(version_dir, version, archive_options["jobs"]) is not None,
+        deps=package_tasks,
+        fingerprint=manifest_fingerprint
+    ))
+    tasks.append(Task(
+        "size budget", lambda: check_size_budgets(project_root, version, check_budgets), deps=["manifest"]
+    ))
+    tasks.append(Task("website sync", lambda: sync_website_version(version), deps=["size budget"]))
+    return tasks
+
+
+def create_remote_pipeline(project_root, version, assignments, android_outputs=None, check_budgets=True):
+    """创建分发到构建节点的流水线任务列表：每个节点一个任务，完成后汇总生成校验文件"""
+    version_dir = project_root / "releases" / f"v{version}"
+    # 网页同步从本机的 pubspec.yaml 读取版本号
+    tasks = [Task("prepare", lambda: build.update_pubspec_version(project_root, version))]
+    remote_tasks = []
+    for url, worker_platforms in assignments.items():
+        name = f"remote {urllib.parse.urlsplit(url).netloc}"
+        remote_tasks.append(name)
+        tasks.append(Task(
+            name,
+            lambda url=url, worker_platforms=worker_platforms: build_worker.run_remote_job(
+                url, version, worker_platforms, version_dir, android_outputs
+            ),
+            deps=["prepare"]
+        ))
+    tasks.append(Task(
+        "manifest",
+        lambda: package.summarize_release(version_dir, version) is not None,
+        deps=remote_tasks
+    ))
+    tasks.append(Task(
+        "size budget", lambda: check_size_budgets(project_root, version, check_budgets), deps=["manifest"]
+    ))
+    tasks.append(Task("website sync", lambda: sync_website_version(version), deps=["size budget"]))
+    return tasks
+
+
+def connect_workers(project_root, workers, platforms):
+    """查询各构建节点并分配平台，返回 {节点地址: [平台]}，失败时返回 None"""
+    infos = {}
+    revision = build_worker.get_source_revision(project_root)
+    for url in workers:
+        info = build_worker.get_worker_info(url)
+        if info is None:
+            print(f"[错误] 无法连接构建节点: {url}")
+            return None
+        print(f"[信息] 构建节点 {url}: {info['system']}，平台 {', '.join(info['platforms'])}")
+        if revision and info.get("revision") and info["revision"] != revision:
+            print(f"[警告] {url} 的源码版本 ({info['revision'][:10]}) 与本机 ({revision[:10]}) 不一致")
+        infos[url] = info
+
+    assignments, unassigned = build_worker.assign_platforms(platforms, infos)
+    if unassigned:
+        print(f"[错误] 没有构建节点支持以下平台: {', '.join(unassigned)}")
+        return None
+    for url, worker_platforms in assignments.items():
+        print(f"[信息] {url} 负责: {', '.join(worker_platforms)}")
+    print()
+    return assignments
+
+
+def get_exit_code(failed_tasks):
+    """根据最早失败的步骤类型确定退出码"""
+    for prefix, exit_code in [
+        ("prepare", batch.EXIT_PREPARE),
+        ("dependencies", batch.EXIT_PREPARE),
+        ("build ", batch.EXIT_BUILD),
+        ("cache ", batch.EXIT_BUILD),
+        ("remote ", batch.EXIT_BUILD),
+        ("package ", batch.EXIT_PACKAGE),
+        ("manifest", batch.EXIT_PACKAGE),
+        ("size budget", batch.EXIT_BUDGET),
+    ]:
+        if any(name.startswith(prefix) for name in failed_tasks):
+            return exit_code
+    return batch.EXIT_PUBLISH
+
+
 def parse_arguments():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(
@@ -90,6 +285,12 @@ def parse_arguments():
   python build_and_package.py 1.2.5 --platforms=macos
   python build_and_package.py 1.2.5 --platforms=windows,android,macos
   python build_and_package.py 1.2.5 --all-platforms
+  python build_and_package.py 1.2.5 --jobs=3
+  python build_and_package.py 1.2.5 --resume
+  python build_and_package.py 1.2.5 --platforms=android --android-outputs=universal,split
+  python build_and_package.py 1.2.5 --reproducible
+  python build_and_package.py 1.2.5 --no-check-budgets
+  python build_and_package.py 1.2.5 --all-platforms --workers=http://win-builder:8765,http://mac-mini:8765
         """
     )
     parser.add_argument("version", help="版本号 (格式: x.x.x)")
@@ -103,62 +304,163 @@ def parse_arguments():
         help="构建打包所有支持的平台",
         action="store_true"
     )
+    parser.add_argument(
+        "--jobs",
+        help="同时执行的构建打包任务数 (默认: 2)",
+        type=int,
+        default=2
+    )
+    parser.add_argument(
+        "--resume",
+        help="从上次中断的地方继续：跳过已完成且输入未变化的步骤",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--workers",
+        help="构建节点地址，逗号分隔；指定后各平台在支持该平台的节点上构建打包",
+        default=None
+    )
+    parser.add_argument(
+        "--web-postprocess",
+        help="Web 版本打包前做内容指纹、预压缩和缓存头处理（见 package.py）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--reproducible",
+        help="可复现模式打包：相同的构建产物生成逐字节相同的压缩包（设置 SOURCE_DATE_EPOCH 时自动启用）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--no-check-budgets",
+        help="不检查 scripts/size_budgets.json 中的体积预算（仍然打印体积组成），超出预算时照常同步网页",
+        action="store_true"
+    )
+    build.add_android_arguments(parser)
+    font_subset.add_arguments(parser)
+    batch.add_arguments(parser)
     return parser.parse_args()
 
 
 def main():
-    print_header("StepUp 一键构建打包脚本")
-
     # 解析参数
     args = parse_arguments()
     version = args.version
+    batch.configure(args, "pipeline", version)
+
+    print_header("StepUp 一键构建打包脚本")
 
     # 验证版本号
     if not validate_version(version):
         print("[错误] 版本号格式不正确，请使用 x.x.x 格式，例如: 1.2.5")
-        input("\n按回车键退出...")
-        sys.exit(1)
+        batch.fail(batch.EXIT_USAGE)
 
     # 设置路径
     script_dir = Path(__file__).parent.resolve()
     project_root = script_dir.parent
+    os.chdir(project_root)
+
+    # 确定要构建和打包的平台
+    if args.all_platforms:
+        build_platforms = ["windows", "android", "macos", "linux", "web"]
+        package_platforms = build_platforms + ["installer"]
+    elif args.platforms:
+        build_platforms = package_platforms = [p.strip().lower() for p in args.platforms.split(",")]
+    else:
+        build_platforms = build.get_platforms_to_build()
+        package_platforms = package.get_platforms_to_package()
+
+    android_outputs = build.parse_android_outputs(args.android_outputs)
+    if android_outputs is None:
+        print(f"[错误] 未知的 Android 构建产物: {args.android_outputs}，可选: {', '.join(build.ANDROID_BUILD_COMMANDS)}")
+        batch.fail(batch.EXIT_USAGE)
+
+    version_dir = project_root / "releases" / f"v{version}"
+    version_dir.mkdir(parents=True, exist_ok=True)
+    archive_options = {
+        "jobs": os.cpu_count() or 1,
+        "compression": "default",
+        "linux_format": "zip",
+        "store": None,
+        "web_postprocess": args.web_postprocess,
+        "source_date_epoch": package.get_source_date_epoch(project_root, args.reproducible),
+    }
 
     print_header("开始一键构建打包")
     print(f"版本号: {version}")
-    if args.platforms:
-        print(f"指定平台: {args.platforms}")
-    elif args.all_platforms:
-        print("构建所有平台")
+    print(f"构建平台: {', '.join(build_platforms)}")
+    print(f"打包平台: {', '.join(package_platforms)}")
+    if "android" in build_platforms:
+        print(f"Android 产物: {', '.join(android_outputs)}")
+    print(f"并行任务: {args.jobs}")
+    if archive_options["source_date_epoch"] is not None:
+        print(f"可复现打包: SOURCE_DATE_EPOCH={archive_options['source_date_epoch']}")
+    if args.no_check_budgets:
+        print("体积预算: 不检查")
+    if args.resume:
+        print("恢复模式: 跳过已完成且输入未变化的步骤")
     print()
-    input("按任意键开始...")
+    batch.pause("按任意键开始...")
     print()
 
-    # 步骤 1: 构建
-    print_header("步骤 1/2: 构建")
-    if not run_script("build.py", version, args.platforms, args.all_platforms):
-        print()
-        print("[错误] 构建失败！")
-        input("\n按回车键退出...")
-        sys.exit(1)
-
-    # 步骤 2: 打包
-    print_header("步骤 2/3: 打包")
-    if not run_script("package.py", version, args.platforms, args.all_platforms):
-        print()
-        print("[错误] 打包失败！")
-        input("\n按回车键退出...")
-        sys.exit(1)
-
-    # 步骤 3: 同步版本号到网页
-    print_header("步骤 3/3: 同步网页版本号")
-    sync_website_version(version)
+    context = {}
+    jobs = args.jobs
+    if args.workers:
+        workers = [url.strip().rstrip("/") for url in args.workers.split(",") if url.strip()]
+        platforms = list(dict.fromkeys(
+            p for p in build_platforms + package_platforms
+            if p in build.PLATFORM_BUILDERS or p in package.PLATFORM_ARTIFACT_PATTERNS
+        ))
+        assignments = connect_workers(project_root, workers, platforms)
+        if assignments is None:
+            batch.fail(batch.EXIT_PREPARE)
+        tasks = create_remote_pipeline(
+            project_root, version, assignments, android_outputs, check_budgets=not args.no_check_budgets
+        )
+        # 各节点的任务同时进行
+        jobs = max(jobs, len(assignments))
+    else:
+        flutter_version = build.get_flutter_version(build.get_mirror_env())
+        tasks = create_pipeline(
+            project_root, version, build_platforms, package_platforms, archive_options, context, flutter_version,
+            android_outputs, check_budgets=not args.no_check_budgets
+        )
+    checkpoint = Checkpoint(version_dir / PIPELINE_STATE_FILE, resume=args.resume)
+    # 字体子集只用于本机构建
+    with font_subset.font_subsets(project_root, args.subset_fonts and not args.workers, args.font_fallback):
+        with timed("pipeline total"):
+            results = run_pipeline(tasks, jobs, checkpoint)
+    if context:
+        build.finish_build(context, {
+            platform: results.get(f"build {platform}") for platform in build_platforms
+        })
+    release_timing.save_history(project_root, version, "pipeline")
+
+    manifest_path = version_dir / package.MANIFEST_FILE
+    batch.SUMMARY["results"] = results
+    if results.get("manifest") and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        batch.SUMMARY["artifacts"] = [
+            dict(artifact, path=str(version_dir / artifact["file"])) for artifact in manifest["artifacts"]
+        ]
+
+    failed = [name for name, result in results.items() if result is False]
+    skipped = [name for name, result in results.items() if result is None]
+    if failed:
+        print(f"[错误] 以下步骤失败: {', '.join(failed)}")
+        if skipped:
+            print(f"[错误] 以下步骤因此被跳过: {', '.join(skipped)}")
+        print(f"       修复后可使用 --resume 从失败的步骤继续: python build_and_package.py {version} --resume")
+        batch.fail(get_exit_code(failed))
 
     # 完成
     print_header("一键构建打包完成！")
     print(f"版本号: {version}")
     print(f"输出目录: {project_root / 'releases' / f'v{version}'}")
     print()
-    input("按回车键退出...")
+    release_timing.print_summary()
+    print_header("耗时对比")
+    release_timing.compare_releases(project_root, version)
+    batch.finish(prompt="按回车键退出...")
 
 
 if __name__ == "__main__":
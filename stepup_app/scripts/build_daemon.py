@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 常驻构建服务
+用法: python build_daemon.py serve [--port=端口] [--home=目录] [--allow-project=目录] [--warm]
+       python build_daemon.py submit [build.py 的参数...] [--project=目录]
+       python build_daemon.py status
+示例: python build_daemon.py serve --warm
+       python build_daemon.py serve --allow-project=/work/stepup-hotfix
+       python build_daemon.py submit 1.2.5 --platforms=android,web
+       python build_daemon.py submit 1.2.5 --platforms=android --project=/work/stepup-hotfix
+
+常驻构建服务保持的状态：
+- 服务启动时查询一次 Flutter SDK 版本并缓存（SDK 更新后自动重新查询），通过环境变量传给 build.py，
+  每次构建省去一次 flutter --version
+- 所有构建使用相同的环境依次执行，Gradle 守护进程（Gradle 默认启用）在构建之间保持运行；
+  --warm 时启动后立即在后台启动 Gradle 守护进程
+服务不保持常驻的 Flutter 工具进程：每次构建仍然启动新的 build.py 和 flutter build，
+Flutter 工具的启动和 Dart 编译照常进行，省下的只有上面两项。
+build.py 的 --watch 不能通过服务提交（监视模式不会结束，会一直占用构建队列）。
+
+Gradle 和 pub 缓存默认沿用当前用户已有的位置（GRADLE_USER_HOME、PUB_CACHE 或各自的默认目录），
+已下载的依赖可以直接使用；指定 --home 时改为使用该目录中独立的缓存，并在其中启用 Gradle 构建缓存。
+
+服务只监听本机地址，依次执行提交的构建请求（Flutter SDK 和 Gradle 守护进程不能安全地并行使用），
+提交端实时收到日志和排队位置。构建以服务运行者的身份执行项目中的 build.py，
+因此只接受允许的项目目录（默认只有服务所在的项目，其他分支的目录用 --allow-project 添加）。
+
+通信协议（TCP，每行一个 JSON 对象）:
+  请求 {"command": "build", "project": 项目目录, "args": [build.py 的参数]}
+       {"command": "status"}
+  响应 {"event": "queued", "id", "position"}、{"event": "started"}、{"event": "log", "line"}、
+       {"event": "done", "exit_code", "wait", "duration"}；status 返回 {"event": "status", "running", "queued"}
+"""
+
+import sys
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import socket
+import threading
+import subprocess
+import socketserver
+import argparse
+from pathlib import Path
+
+import build
+
+
+DEFAULT_PORT = 8770
+
+# 指定 --home 时写入其中 gradle.properties 的设置（已有的设置不覆盖）
+GRADLE_PROPERTIES = {
+    "org.gradle.daemon": "true",
+    "org.gradle.daemon.idletimeout": str(3 * 60 * 60 * 1000),
+    "org.gradle.caching": "true",
+}
+
+# 不能通过服务提交的 build.py 参数：监视模式不会结束，会一直占用构建队列
+WATCH_ARGUMENT = "--watch"
+
+# 判断 Flutter SDK 是否更新过的文件（相对 flutter 命令所在的 bin 目录）
+FLUTTER_STAMP_FILES = ["cache/flutter.version.json", "cache/engine.stamp", "../version"]
+
+
+def get_project_root():
+    return Path(__file__).parent.resolve().parent
+
+
+def get_flutter_stamp():
+    """Flutter SDK 的版本标记：flutter 命令路径和 SDK 版本文件的修改时间"""
+    flutter = shutil.which("flutter")
+    if flutter is None:
+        return None
+    bin_dir = Path(flutter).resolve().parent
+    stamps = [
+        (name, (bin_dir / name).stat().st_mtime_ns)
+        for name in FLUTTER_STAMP_FILES if (bin_dir / name).exists()
+    ]
+    return str(bin_dir), tuple(stamps) or Path(flutter).stat().st_mtime_ns
+
+
+def write_gradle_properties(gradle_home):
+    """在服务独立的 GRADLE_USER_HOME 中启用守护进程和构建缓存，保留已有的设置"""
+    path = gradle_home / "gradle.properties"
+    content = path.read_text(encoding="utf-8") if path.exists() else ""
+    existing = {line.split("=", 1)[0].strip() for line in content.splitlines() if "=" in line}
+    missing = [f"{key}={value}" for key, value in GRADLE_PROPERTIES.items() if key not in existing]
+    if missing:
+        if content and not content.endswith("\n"):
+            content += "\n"
+        path.write_text(content + "\n".join(missing) + "\n", encoding="utf-8")
+
+
+class BuildJob:
+    """一个构建请求，事件通过队列传给提交端的连接"""
+
+    def __init__(self, project, args):
+        self.id = uuid.uuid4().hex[:12]
+        self.project = project
+        self.args = args
+        self.events = queue.Queue()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+
+    def emit(self, event, **fields):
+        self.events.put(dict(fields, event=event, id=self.id))
+
+    def describe(self):
+        return {"id": self.id, "project": str(self.project), "args": self.args}
+
+
+class BuildDaemon:
+    """常驻构建服务：缓存 Flutter SDK 版本、共用 Gradle 守护进程，依次执行提交的构建"""
+
+    def __init__(self, home, allowed_projects):
+        self.home = home
+        self.allowed_projects = allowed_projects
+        self.pending = queue.Queue()
+        self.queued = []
+        self.running = None
+        self.lock = threading.Lock()
+        self.toolchain = {"stamp": None, "version": None}
+        self.toolchain_lock = threading.Lock()
+        self.env = self.create_env()
+
+    def create_env(self):
+        """构建使用的环境变量：默认沿用用户的 Gradle、pub 缓存，指定服务目录时使用其中独立的缓存"""
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        if self.home is None:
+            return env
+        gradle_home = self.home / "gradle"
+        pub_cache = self.home / "pub-cache"
+        gradle_home.mkdir(parents=True, exist_ok=True)
+        pub_cache.mkdir(parents=True, exist_ok=True)
+        write_gradle_properties(gradle_home)
+        env.update(GRADLE_USER_HOME=str(gradle_home), PUB_CACHE=str(pub_cache))
+        return env
+
+    def is_allowed(self, project):
+        return project in self.allowed_projects
+
+    def get_flutter_version(self):
+        """缓存的 Flutter SDK 版本信息，SDK 更新后重新查询"""
+        with self.toolchain_lock:
+            stamp = get_flutter_stamp()
+            if stamp is None or stamp != self.toolchain["stamp"]:
+                start = time.perf_counter()
+                version = build.get_flutter_version(self.env)
+                self.toolchain.update(stamp=stamp, version=version)
+                print(f"[信息] Flutter SDK: {version}（查询耗时 {time.perf_counter() - start:.1f} 秒）")
+            return self.toolchain["version"]
+
+    def warm(self, project_root):
+        """查询 Flutter SDK 版本并启动 Gradle 守护进程"""
+        self.get_flutter_version()
+        android_dir = project_root / "android"
+        gradlew = android_dir / ("gradlew.bat" if sys.platform == "win32" else "gradlew")
+        if not gradlew.exists():
+            print("[跳过] 项目中没有 android/gradlew（首次 Android 构建后生成），不预热 Gradle")
+            return
+        start = time.perf_counter()
+        result = subprocess.run(
+            [str(gradlew), "--daemon", "--quiet", "help"], cwd=android_dir, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL
+        )
+        if result.returncode == 0:
+            print(f"[信息] Gradle 守护进程已预热（{time.perf_counter() - start:.1f} 秒）")
+        else:
+            print(f"[警告] Gradle 预热失败 (退出码 {result.returncode})")
+
+    def submit(self, project, args):
+        job = BuildJob(project, args)
+        with self.lock:
+            self.queued.append(job)
+            position = len(self.queued) + (1 if self.running else 0)
+        job.emit("queued", position=position)
+        self.pending.put(job)
+        return job
+
+    def status(self):
+        with self.lock:
+            return {
+                "running": self.running.describe() if self.running else None,
+                "queued": [job.describe() for job in self.queued],
+            }
+
+    def serve_jobs(self):
+        """依次执行排队的构建"""
+        while True:
+            job = self.pending.get()
+            with self.lock:
+                self.queued.remove(job)
+                self.running = job
+            try:
+                self.execute(job)
+            except Exception as e:
+                job.emit("log", line=f"[错误] 构建服务执行异常: {e}")
+                job.emit("done", exit_code=1, wait=0, duration=0)
+            finally:
+                with self.lock:
+                    self.running = None
+
+    def execute(self, job):
+        """在提交的项目目录中运行该项目自己的 build.py"""
+        job.started_at = time.monotonic()
+        job.emit("started")
+        env = dict(self.env)
+        env[build.FLUTTER_VERSION_ENV] = self.get_flutter_version()
+        cmd = [sys.executable, str(job.project / "scripts" / "build.py"), *job.args, "--yes"]
+        print(f"[任务] {job.id}: {job.project} {' '.join(job.args)}")
+        process = subprocess.Popen(
+            cmd, cwd=job.project, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL
+        )
+        for raw in process.stdout:
+            job.emit("log", line=raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+        exit_code = process.wait()
+        duration = time.monotonic() - job.started_at
+        print(f"[任务] {job.id}: 退出码 {exit_code}，用时 {duration:.1f} 秒")
+        job.emit("done", exit_code=exit_code, wait=job.started_at - job.submitted_at, duration=duration)
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """处理一个连接：读取一行请求，按行写回事件"""
+
+    daemon = None
+
+    def send(self, data):
+        self.wfile.write(json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            command = request["command"]
+        except (ValueError, KeyError, TypeError):
+            return self.send({"event": "error", "error": "bad request"})
+        if command == "status":
+            return self.send(dict(self.daemon.status(), event="status"))
+        if command != "build":
+            return self.send({"event": "error", "error": f"unknown command: {command}"})
+
+        project = Path(str(request.get("project", ""))).resolve()
+        args = request.get("args", [])
+        if not self.daemon.is_allowed(project):
+            return self.send({"event": "error", "error": f"project not allowed: {project}"})
+        if not (project / "scripts" / "build.py").is_file():
+            return self.send({"event": "error", "error": f"not a StepUp project: {project}"})
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            return self.send({"event": "error", "error": "bad arguments"})
+        if WATCH_ARGUMENT in args:
+            return self.send({"event": "error", "error": f"{WATCH_ARGUMENT} is not supported, run build.py directly"})
+
+        job = self.daemon.submit(project, args)
+        while True:
+            event = job.events.get()
+            try:
+                self.send(event)
+            except OSError:
+                # 提交端断开后构建继续执行，日志不再转发
+                pass
+            if event["event"] == "done":
+                return None
+
+
+class DaemonServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def connect(port):
+    """连接本机的构建服务，未启动时返回 None"""
+    try:
+        return socket.create_connection(("127.0.0.1", port), timeout=5)
+    except OSError:
+        return None
+
+
+def submit_build(port, project, args):
+    """提交构建并转发日志，返回 build.py 的退出码"""
+    sock = connect(port)
+    if sock is None:
+        print(f"[错误] 无法连接构建服务 127.0.0.1:{port}，请先运行: python build_daemon.py serve")
+        return 1
+    with sock:
+        sock.settimeout(None)
+        sock.sendall(json.dumps({"command": "build", "project": str(project), "args": args}).encode("utf-8") + b"\n")
+        for raw in sock.makefile("rb"):
+            event = json.loads(raw)
+            if event["event"] == "error":
+                print(f"[错误] 构建服务拒绝了请求: {event['error']}")
+                return 1
+            if event["event"] == "queued" and event["position"] > 1:
+                print(f"[信息] 已排队，前面还有 {event['position'] - 1} 个构建")
+            elif event["event"] == "log":
+                print(event["line"])
+            elif event["event"] == "done":
+                print(f"[信息] 构建服务: 排队 {event['wait']:.1f} 秒，构建 {event['duration']:.1f} 秒")
+                return event["exit_code"]
+    print("[错误] 构建服务中途断开连接")
+    return 1
+
+
+def show_status(port):
+    sock = connect(port)
+    if sock is None:
+        print(f"[信息] 构建服务未启动 (127.0.0.1:{port})")
+        return 1
+    with sock:
+        sock.sendall(b'{"command": "status"}\n')
+        status = json.loads(sock.makefile("rb").readline())
+    running = status["running"]
+    print(f"正在构建: {running['project']} {' '.join(running['args'])}" if running else "正在构建: 无")
+    print(f"排队: {len(status['queued'])} 个")
+    for job in status["queued"]:
+        print(f"  {job['id']}: {job['project']} {' '.join(job['args'])}")
+    return 0
+
+
+def serve(port, home=None, allowed_projects=(), warm=False):
+    allowed = [get_project_root(), *allowed_projects]
+    daemon = BuildDaemon(home, set(allowed))
+    DaemonHandler.daemon = daemon
+    server = DaemonServer(("127.0.0.1", port), DaemonHandler)
+    print(f"[信息] 构建服务已启动: 127.0.0.1:{port}")
+    print(f"[信息] GRADLE_USER_HOME: {daemon.env.get('GRADLE_USER_HOME', '默认 (~/.gradle)')}")
+    print(f"[信息] PUB_CACHE: {daemon.env.get('PUB_CACHE', '默认')}")
+    print(f"[信息] 允许的项目: {', '.join(str(p) for p in dict.fromkeys(allowed))}")
+    threading.Thread(target=daemon.serve_jobs, daemon=True).start()
+    if warm:
+        threading.Thread(target=daemon.warm, args=(get_project_root(),), daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 常驻构建服务",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python build_daemon.py serve --warm
+  python build_daemon.py serve --allow-project=/work/stepup-hotfix
+  python build_daemon.py submit 1.2.5 --platforms=android,web
+  python build_daemon.py submit 1.2.5 --platforms=android --project=/work/stepup-hotfix
+  python build_daemon.py status
+        """
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--port", help=f"服务端口 (默认: {DEFAULT_PORT})", type=int, default=DEFAULT_PORT)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="启动构建服务", parents=[common])
+    serve_parser.add_argument(
+        "--home",
+        help="服务目录，使用其中独立的 Gradle、pub 缓存 (默认: 沿用用户已有的缓存)",
+        default=None
+    )
+    serve_parser.add_argument(
+        "--allow-project",
+        help="允许提交构建的其他项目目录，可多次指定 (默认只允许本脚本所在的项目)",
+        action="append",
+        default=[]
+    )
+    serve_parser.add_argument(
+        "--warm",
+        help="启动后立即查询 Flutter SDK 版本并启动 Gradle 守护进程",
+        action="store_true"
+    )
+
+    submit_parser = subparsers.add_parser("submit", help="提交构建，参数与 build.py 相同", parents=[common])
+    submit_parser.add_argument(
+        "--project",
+        help="要构建的项目目录 (默认: 本脚本所在的项目)",
+        default=None
+    )
+    subparsers.add_parser("status", help="查看正在执行和排队的构建", parents=[common])
+    args, build_args = parser.parse_known_args()
+    if build_args and args.command != "submit":
+        parser.error(f"无法识别的参数: {' '.join(build_args)}")
+    if WATCH_ARGUMENT in build_args:
+        parser.error(f"submit 不支持 {WATCH_ARGUMENT}（监视模式不会结束，会一直占用构建队列），请直接运行 build.py {WATCH_ARGUMENT}")
+    return args, build_args
+
+
+def main():
+    args, build_args = parse_arguments()
+    if args.command == "serve":
+        home = Path(args.home).resolve() if args.home else None
+        allowed = [Path(p).resolve() for p in args.allow_project]
+        sys.exit(serve(args.port, home, allowed, args.warm))
+    if args.command == "status":
+        sys.exit(show_status(args.port))
+    project = Path(args.project).resolve() if args.project else get_project_root()
+    sys.exit(submit_build(args.port, project, build_args))
+
+
+if __name__ == "__main__":
+    main()
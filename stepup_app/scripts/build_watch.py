@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 监视模式构建（build.py --watch）
+
+监视 lib/、assets/、pubspec.yaml 等共同输入和各平台目录，文件变化后等待一段时间不再变化（去抖），
+按变化的路径确定受影响的平台（与构建缓存键的输入一致：共同输入影响所有平台，平台目录只影响该平台），
+只重新构建缓存键确实变化了的平台，并输出每次重新构建的耗时和距首次修改的延迟。
+重新构建沿用 build.py 的增量流程：构建缓存命中时直接恢复、按需清理、依赖未变化时跳过 pub get。
+
+Linux 上通过 ctypes 调用 inotify，其他系统或 inotify 不可用（如监视数量达到上限）时改为定时轮询。
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+import build
+import font_subset
+from release_timing import format_timing
+
+
+# 默认的去抖时间（秒）：最后一次修改后等待这么久没有新的修改才开始构建
+DEFAULT_DEBOUNCE = 0.5
+# 轮询模式下的检查间隔（秒）
+POLL_INTERVAL = 1.0
+
+# 编辑器、版本控制产生的临时文件，变化时不触发构建
+IGNORED_SUFFIXES = ("~", ".swp", ".swx", ".tmp", ".part")
+IGNORED_PREFIXES = (".#", "#")
+
+# inotify 常量（linux/inotify.h）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+INOTIFY_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def get_watch_roots(platforms):
+    """需要监视的顶层路径：构建缓存键的共同输入和各平台目录"""
+    return list(dict.fromkeys(build.CACHE_COMMON_INPUTS + list(platforms)))
+
+
+def is_ignored(relative_path):
+    """工具生成的中间产物和编辑器临时文件不触发构建"""
+    if any(part in build.CACHE_IGNORED_NAMES for part in relative_path.parts):
+        return True
+    name = relative_path.name
+    return name.endswith(IGNORED_SUFFIXES) or name.startswith(IGNORED_PREFIXES)
+
+
+def get_affected_platforms(paths, platforms):
+    """变化的路径影响的平台"""
+    affected = set()
+    for path in paths:
+        top = path.parts[0] if path.parts else ""
+        if top in build.CACHE_COMMON_INPUTS:
+            return list(platforms)
+        if top in platforms:
+            affected.add(top)
+    return [p for p in platforms if p in affected]
+
+
+class PollingWatcher:
+    """定时比较监视路径下各文件的修改时间和大小"""
+
+    description = "轮询"
+
+    def __init__(self, project_root, roots):
+        self.project_root = project_root
+        self.roots = roots
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for name in self.roots:
+            root = self.project_root / name
+            if root.is_file():
+                paths = [root]
+            elif root.is_dir():
+                paths = []
+                for current, dirs, files in os.walk(root):
+                    dirs[:] = [d for d in dirs if d not in build.CACHE_IGNORED_NAMES]
+                    paths.extend(Path(current) / f for f in files)
+            else:
+                continue
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path.relative_to(self.project_root)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read(self, timeout):
+        """等待最多 timeout 秒（None 表示一直等待），返回变化的相对路径集合"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            snapshot = self.scan()
+            changed = {
+                path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """通过 ctypes 调用 Linux inotify 监视目录树"""
+
+    description = "inotify"
+
+    def __init__(self, project_root, roots):
+        self.project_root = project_root
+        self.roots = set(roots)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.add_watch_func = libc.inotify_add_watch
+        self.add_watch_func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.watches = {}
+        try:
+            # 项目根目录只关心顶层的输入文件（pubspec.yaml 等）和新建的输入目录
+            self.add_watch(project_root)
+            for name in self.roots:
+                if (project_root / name).is_dir():
+                    self.add_tree(project_root / name)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, path):
+        wd = self.add_watch_func(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"无法监视 {path}: {os.strerror(error)}")
+        self.watches[wd] = path
+
+    def add_tree(self, root):
+        """监视目录及其所有子目录（跳过构建中间产物目录），返回其中已有的文件"""
+        files = []
+        for current, dirs, names in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in build.CACHE_IGNORED_NAMES]
+            self.add_watch(Path(current))
+            files.extend(Path(current) / n for n in names)
+        return files
+
+    def read(self, timeout):
+        """等待最多 timeout 秒（None 表示一直等待），返回变化的相对路径集合"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0"))
+            offset += INOTIFY_EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，无法知道具体变化了什么，按所有输入都变化处理
+                changed.update(Path(name) for name in self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            path = directory / name if name else directory
+            relative = path.relative_to(self.project_root)
+            if not relative.parts or relative.parts[0] not in self.roots:
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and path.name not in build.CACHE_IGNORED_NAMES:
+                # 新建或移入的目录：补充监视，其中已有的文件视为变化
+                try:
+                    changed.update(f.relative_to(self.project_root) for f in self.add_tree(path))
+                except OSError:
+                    pass
+            changed.add(relative)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(project_root, roots):
+    """创建文件监视器：优先使用 inotify，不可用时改为轮询"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(project_root, roots)
+        except (OSError, AttributeError) as e:
+            if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                print("[警告] inotify 监视数量达到上限 (fs.inotify.max_user_watches)，改为轮询")
+            else:
+                print(f"[警告] 无法使用 inotify ({e})，改为轮询")
+    return PollingWatcher(project_root, roots)
+
+
+def wait_for_changes(watcher, debounce):
+    """等待文件变化，直到连续 debounce 秒没有新的变化，返回 (变化的路径, 首次变化的时间)"""
+    changed = set()
+    first_change = None
+    while True:
+        paths = {p for p in watcher.read(None if first_change is None else debounce) if not is_ignored(p)}
+        if paths:
+            changed |= paths
+            first_change = first_change or time.monotonic()
+        elif first_change is not None:
+            return changed, first_change
+
+
+def rebuild(project_root, version, platforms, options):
+    """按 build.py 的增量流程构建指定平台，返回 {平台: 是否成功}"""
+    with font_subset.font_subsets(project_root, options["subset_fonts"], options["font_fallback"]):
+        context = build.check_build_cache(
+            project_root, version, platforms, options["no_cache"],
+            options["flutter_version"], options["android_outputs"]
+        )
+        if context is None or not build.prepare_workspace(context):
+            return {platform: False for platform in platforms}
+        results = build.run_build_tasks(context, platforms, options["jobs"])
+        build.finish_build(context, results)
+    return results
+
+
+def watch(project_root, version, platforms, options, debounce=DEFAULT_DEBOUNCE):
+    """先构建一次，之后监视文件变化并重新构建受影响的平台，直到按 Ctrl+C"""
+    platforms = [p for p in platforms if p in build.PLATFORM_BUILDERS]
+    options = dict(options, flutter_version=build.get_flutter_version(build.get_mirror_env()))
+
+    def cache_keys(targets):
+        return {
+            p: build.compute_cache_key(project_root, p, options["flutter_version"], options["android_outputs"])
+            for p in targets
+        }
+
+    watcher = create_watcher(project_root, get_watch_roots(platforms))
+    print(f"[监视] 监视方式: {watcher.description}，去抖 {debounce:.1f} 秒，平台: {', '.join(platforms)}")
+    print()
+
+    built_keys = cache_keys(platforms)
+    results = rebuild(project_root, version, platforms, options)
+    built_keys = {p: key for p, key in built_keys.items() if results.get(p)}
+    try:
+        while True:
+            print("[监视] 等待文件变化...（按 Ctrl+C 退出）")
+            changed, first_change = wait_for_changes(watcher, debounce)
+            affected = get_affected_platforms(changed, platforms)
+            keys = cache_keys(affected)
+            # 文件内容实际没有变化（如保存了相同内容、构建过程中被临时替换又恢复的字体）时不重新构建
+            targets = [p for p in affected if built_keys.get(p) != keys[p]]
+            sample = ", ".join(sorted(p.as_posix() for p in changed)[:3])
+            more = f" 等 {len(changed)} 个文件" if len(changed) > 3 else ""
+            if not targets:
+                print(f"[监视] {sample}{more} 变化，构建输入未变化，无需重新构建")
+                continue
+
+            print(f"[监视] {sample}{more} 变化，重新构建: {', '.join(targets)}")
+            print()
+            start = time.monotonic()
+            results = rebuild(project_root, version, targets, options)
+            finished = time.monotonic()
+            for platform in targets:
+                if results.get(platform):
+                    built_keys[platform] = keys[platform]
+                else:
+                    built_keys.pop(platform, None)
+            failed = [p for p in targets if not results.get(p)]
+            status = f"失败: {', '.join(failed)}" if failed else "完成"
+            print(
+                f"[监视] 重新构建{status}，{format_timing(finished - start)}，"
+                f"距首次修改 {finished - first_change:.1f}s"
+            )
+            print()
+    except KeyboardInterrupt:
+        print("\n[监视] 已退出监视模式")
+    finally:
+        watcher.close()
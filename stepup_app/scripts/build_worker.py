@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 构建节点
+用法: python build_worker.py [--host=地址] [--port=端口] [--platforms=平台] [--project=目录]
+示例: python build_worker.py
+       python build_worker.py --host=0.0.0.0 --port=8765
+       python build_worker.py --port=8766 --platforms=web --project=/tmp/stepup_worker
+
+构建节点在本机的项目目录中执行 build.py 和 package.py，由 build_and_package.py --workers=... 调度，
+一次发行可以同时使用 Windows、macOS、Linux 等多台机器，产物汇总到调度端的 releases/v{版本号}/。
+同一节点上的任务依次执行（共用一个项目目录）。
+
+HTTP 接口:
+  GET  /info                               节点信息：支持的平台、系统、源码版本、是否忙碌
+  POST /jobs {"version", "platforms", "android_outputs"}
+                                           提交构建打包任务，返回任务编号
+  GET  /jobs/<编号>?offset=N               任务状态、第 N 行之后的日志、产物列表
+  GET  /jobs/<编号>/artifacts/<文件名>      下载产物
+"""
+
+import sys
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+import subprocess
+import argparse
+import urllib.request
+import urllib.parse
+import platform as sys_platform
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import build
+import package
+
+
+DEFAULT_PORT = 8765
+# 调度端查询任务日志的间隔（秒）
+POLL_INTERVAL = 1.0
+# 请求超时（秒）
+REQUEST_TIMEOUT = 30
+
+
+def get_source_revision(project_root):
+    """获取项目的 git 提交，用于检查各节点的源码是否一致"""
+    result = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=project_root,
+        capture_output=True, text=True
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def get_default_platforms():
+    """本机可以构建打包的平台"""
+    platforms = build.get_platforms_to_build() + package.get_platforms_to_package() + ["web"]
+    return list(dict.fromkeys(platforms))
+
+
+class Job:
+    """构建节点上的一个任务"""
+
+    def __init__(self, version, platforms, android_outputs=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.version = version
+        self.platforms = platforms
+        self.android_outputs = android_outputs or ["universal"]
+        self.status = "queued"
+        self.exit_code = None
+        self.lines = []
+        self.artifacts = []
+        self.lock = threading.Lock()
+
+    def log(self, line):
+        with self.lock:
+            self.lines.append(line)
+
+    def to_dict(self, offset=0):
+        with self.lock:
+            return {
+                "id": self.id,
+                "version": self.version,
+                "platforms": self.platforms,
+                "status": self.status,
+                "exit_code": self.exit_code,
+                "log": self.lines[offset:],
+                "offset": len(self.lines),
+                "artifacts": self.artifacts,
+            }
+
+
+class Worker:
+    """构建节点：在项目目录中依次执行提交的任务"""
+
+    def __init__(self, project_root, platforms):
+        self.project_root = project_root
+        self.platforms = platforms
+        self.jobs = {}
+        self.run_lock = threading.Lock()
+
+    def info(self):
+        return {
+            "platforms": self.platforms,
+            "system": sys_platform.system(),
+            "revision": get_source_revision(self.project_root),
+            "busy": self.run_lock.locked(),
+        }
+
+    def submit(self, version, platforms, android_outputs=None):
+        job = Job(version, platforms, android_outputs)
+        self.jobs[job.id] = job
+        threading.Thread(target=self.run_job, args=(job,), daemon=True).start()
+        return job
+
+    def run_job(self, job):
+        with self.run_lock:
+            job.status = "running"
+            try:
+                self.execute(job)
+            except Exception as e:
+                job.log(f"[错误] 任务执行异常: {e}")
+                job.status = "failed"
+
+    def execute(self, job):
+        """依次运行 build.py 和 package.py，成功后记录本任务平台的产物"""
+        scripts_dir = self.project_root / "scripts"
+        summary_path = self.project_root / "releases" / f".worker-{job.id}.json"
+        summary_path.parent.mkdir(parents=True, exist_ok=True)
+        platforms = ",".join(job.platforms)
+        commands = [
+            [
+                sys.executable, str(scripts_dir / "build.py"), job.version, f"--platforms={platforms}",
+                f"--android-outputs={','.join(job.android_outputs)}", "--yes",
+            ],
+            [
+                sys.executable, str(scripts_dir / "package.py"), job.version, f"--platforms={platforms}",
+                "--yes", f"--summary-json={summary_path}",
+            ],
+        ]
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        for cmd in commands:
+            job.log(f"$ {Path(cmd[1]).name} {' '.join(cmd[2:])}")
+            process = subprocess.Popen(
+                cmd, cwd=self.project_root, env=env,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL
+            )
+            for raw in process.stdout:
+                job.log(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+            if process.wait() != 0:
+                job.exit_code = process.returncode
+                job.status = "failed"
+                return
+
+        try:
+            summary = json.loads(summary_path.read_text(encoding="utf-8"))
+        finally:
+            summary_path.unlink(missing_ok=True)
+        patterns = [
+            package.PLATFORM_ARTIFACT_PATTERNS[p].format(version=job.version)
+            for p in job.platforms if p in package.PLATFORM_ARTIFACT_PATTERNS
+        ]
+        with job.lock:
+            job.artifacts = [
+                {"file": a["file"], "size": a["size"], "sha256": a["sha256"]}
+                for a in summary.get("artifacts", [])
+                if any(Path(a["file"]).match(pattern) for pattern in patterns)
+            ]
+            job.exit_code = 0
+            job.status = "success"
+
+    def artifact_path(self, job, name):
+        """产物路径，只允许下载任务产物列表中的文件"""
+        if not any(a["file"] == name for a in job.artifacts):
+            return None
+        return self.project_root / "releases" / f"v{job.version}" / name
+
+
+class WorkerHandler(BaseHTTPRequestHandler):
+    """构建节点 HTTP 接口"""
+
+    worker = None
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in url.path.strip("/").split("/")]
+        if parts == ["info"]:
+            return self.send_json(self.worker.info())
+        if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in self.worker.jobs:
+            return self.send_json({"error": "not found"}, 404)
+
+        job = self.worker.jobs[parts[1]]
+        if len(parts) == 2:
+            query = urllib.parse.parse_qs(url.query)
+            return self.send_json(job.to_dict(int(query.get("offset", ["0"])[0])))
+        if len(parts) == 4 and parts[2] == "artifacts":
+            path = self.worker.artifact_path(job, parts[3])
+            if path is None or not path.is_file():
+                return self.send_json({"error": "not found"}, 404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(path.stat().st_size))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+            return None
+        return self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self.send_json({"error": "not found"}, 404)
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            version = request["version"]
+            platforms = list(request["platforms"])
+            android_outputs = build.parse_android_outputs(",".join(request.get("android_outputs", ["universal"])))
+        except (ValueError, KeyError, TypeError):
+            return self.send_json({"error": "bad request"}, 400)
+        if android_outputs is None:
+            return self.send_json({"error": "invalid android outputs"}, 400)
+        if not package.validate_version(version):
+            return self.send_json({"error": "invalid version"}, 400)
+        unsupported = [p for p in platforms if p not in self.worker.platforms]
+        if unsupported:
+            return self.send_json({"error": f"unsupported platforms: {', '.join(unsupported)}"}, 400)
+        job = self.worker.submit(version, platforms, android_outputs)
+        print(f"[任务] {job.id}: v{version} {', '.join(platforms)}")
+        return self.send_json({"id": job.id}, 201)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def request_json(url, data=None):
+    """发送请求并解析 JSON 响应"""
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+        return json.loads(response.read())
+
+
+def get_worker_info(url):
+    """查询构建节点信息，无法连接时返回 None"""
+    try:
+        return request_json(f"{url}/info")
+    except (OSError, ValueError):
+        return None
+
+
+def assign_platforms(platforms, infos):
+    """将各平台分配给支持该平台、已分配任务最少的节点
+
+    安装程序由 Windows 构建产物生成，只能分配给负责 Windows 的节点（该节点也需支持 installer），
+    没有节点负责 Windows 时视为无法分配。
+    返回 ({节点地址: [平台]}, [无节点支持的平台])。
+    """
+    assignments = {url: [] for url in infos}
+    unassigned = []
+    for platform in platforms:
+        if platform == "installer":
+            continue
+        candidates = [url for url, info in infos.items() if platform in info["platforms"]]
+        if not candidates:
+            unassigned.append(platform)
+            continue
+        url = min(candidates, key=lambda u: len(assignments[u]))
+        assignments[url].append(platform)
+
+    if "installer" in platforms:
+        windows_url = next((url for url, p in assignments.items() if "windows" in p), None)
+        if windows_url is not None and "installer" in infos[windows_url]["platforms"]:
+            assignments[windows_url].append("installer")
+        else:
+            unassigned.append("installer")
+    return {url: p for url, p in assignments.items() if p}, unassigned
+
+
+def download_artifact(url, job_id, artifact, version_dir):
+    """下载产物到发行目录，并校验 SHA-256"""
+    target = version_dir / artifact["file"]
+    temp_path = target.with_name(f".{target.name}.part")
+    name = urllib.parse.quote(artifact["file"])
+    with urllib.request.urlopen(f"{url}/jobs/{job_id}/artifacts/{name}", timeout=REQUEST_TIMEOUT) as response:
+        with open(temp_path, "wb") as raw:
+            fp = package.HashingWriter(raw)
+            shutil.copyfileobj(response, fp, 1024 * 1024)
+    if fp.hexdigest() != artifact["sha256"]:
+        temp_path.unlink()
+        return False
+    package.unlink_existing(target)
+    os.replace(temp_path, target)
+    package.record_digest(target, artifact["sha256"])
+    return True
+
+
+def run_remote_job(url, version, platforms, version_dir, android_outputs=None):
+    """在构建节点上构建打包指定平台，转发日志并下载产物"""
+    label = urllib.parse.urlsplit(url).netloc
+    try:
+        job_id = request_json(f"{url}/jobs", {
+            "version": version,
+            "platforms": platforms,
+            "android_outputs": android_outputs or ["universal"],
+        })["id"]
+        print(f"[{label}] 任务 {job_id}: {', '.join(platforms)}")
+
+        offset = 0
+        while True:
+            state = request_json(f"{url}/jobs/{job_id}?offset={offset}")
+            for line in state["log"]:
+                print(f"[{label}] {line}")
+            offset = state["offset"]
+            if state["status"] in ("success", "failed"):
+                break
+            time.sleep(POLL_INTERVAL)
+
+        if state["status"] != "success":
+            print(f"[错误] {label} 上的任务失败 (退出码 {state['exit_code']})")
+            return False
+
+        for artifact in state["artifacts"]:
+            if not download_artifact(url, job_id, artifact, version_dir):
+                print(f"[错误] {artifact['file']} 下载后校验失败")
+                return False
+            print(f"[{label}] 已下载 {artifact['file']} ({artifact['size'] / (1024 * 1024):.1f} MB)")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[错误] 与构建节点 {label} 通信失败: {e}")
+        return False
+    return True
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 构建节点",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python build_worker.py
+  python build_worker.py --host=0.0.0.0 --port=8765
+  python build_worker.py --port=8766 --platforms=web --project=/tmp/stepup_worker
+        """
+    )
+    parser.add_argument("--host", help="监听地址 (默认: 127.0.0.1)", default="127.0.0.1")
+    parser.add_argument("--port", help=f"监听端口 (默认: {DEFAULT_PORT})", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--platforms",
+        help="本节点负责的平台，逗号分隔 (默认: 本机系统支持的平台)",
+        default=None
+    )
+    parser.add_argument(
+        "--project",
+        help="执行构建的项目目录 (默认: 本脚本所在的项目)",
+        default=None
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    project_root = Path(args.project).resolve() if args.project else Path(__file__).parent.resolve().parent
+    if not (project_root / "scripts" / "build.py").exists():
+        print(f"[错误] 项目目录中没有构建脚本: {project_root}")
+        sys.exit(1)
+
+    platforms = (
+        [p.strip().lower() for p in args.platforms.split(",")] if args.platforms
+        else get_default_platforms()
+    )
+    WorkerHandler.worker = Worker(project_root, platforms)
+    server = ThreadingHTTPServer((args.host, args.port), WorkerHandler)
+    print(f"[信息] 构建节点已启动: http://{args.host}:{args.port}")
+    print(f"[信息] 项目目录: {project_root}")
+    print(f"[信息] 负责平台: {', '.join(platforms)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 增量更新包工具
+用法: python delta.py create [旧压缩包] [新压缩包] [增量包]
+       python delta.py apply [旧版本目录或压缩包] [增量包] [输出目录]
+示例: python delta.py create releases/v1.2.4/StepUp_v1.2.4_windows_portable.zip
+                             releases/v1.2.5/StepUp_v1.2.5_windows_portable.zip
+                             releases/v1.2.5/StepUp_v1.2.4_to_v1.2.5_windows_portable_delta.zip
+       python delta.py apply StepUp_v1.2.4_windows_portable StepUp_v1.2.4_to_v1.2.5_windows_portable_delta.zip StepUp_v1.2.5
+
+增量包本身是一个 ZIP 文件，包含:
+  delta.json      文件清单：每个文件的处理方式（保留/新增/补丁）、大小、SHA-256 和权限位
+  add/<路径>      新增或变化较大的文件的完整内容
+  patch/<路径>    变化文件相对旧文件的二进制差异
+
+二进制差异优先使用 bsdiff4 模块（pip install bsdiff4），未安装时使用内置的块匹配算法
+（按内容在文件中选取种子位置，在旧文件中查找与新文件相同的数据，只保存复制指令和新增数据，再用 LZMA 压缩）。
+"""
+
+import os
+import sys
+import re
+import io
+import json
+import lzma
+import zlib
+import struct
+import hashlib
+from collections import Counter
+import zipfile
+import argparse
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+try:
+    import bsdiff4
+except ImportError:
+    bsdiff4 = None
+
+
+DELTA_FORMAT = 1
+DELTA_MANIFEST = "delta.json"
+PATCH_MAGIC = b"SUDELTA1"
+
+# 小于该大小的变化文件直接完整保存
+MIN_PATCH_SIZE = 64 * 1024
+# 内置差异算法的种子平均间隔和长度
+SEED_INTERVAL = 256
+SEED_LENGTH = 32
+# 选择种子锚点时的抽样数量
+ANCHOR_SAMPLES = 65536
+# 匹配中断后重新对齐时，至少相同的字节数和最多跳过的字节数
+MIN_COPY_LENGTH = 32
+REALIGN_DISTANCE = 64
+# ZIP 中央目录的创建系统：Unix（外部属性的高 16 位为文件权限）
+ZIP_SYSTEM_UNIX = 3
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _common_prefix_length(a, a_start, b, b_start):
+    """计算 a[a_start:] 与 b[b_start:] 的公共前缀长度"""
+    length = 0
+    step = 64 * 1024
+    limit = min(len(a) - a_start, len(b) - b_start)
+    # 先按大块比较（切片比较在 C 中完成），再在不相等的块内二分查找
+    while length < limit:
+        size = min(step, limit - length)
+        if a[a_start + length:a_start + length + size] == b[b_start + length:b_start + length + size]:
+            length += size
+            continue
+        low, high = 0, size
+        while low < high:
+            middle = (low + high + 1) // 2
+            if (a[a_start + length:a_start + length + middle]
+                    == b[b_start + length:b_start + length + middle]):
+                low = middle
+            else:
+                high = middle - 1
+        return length + low
+    return length
+
+
+def _common_suffix_length(a, a_end, b, b_end, limit):
+    """计算 a[:a_end] 与 b[:b_end] 的公共后缀长度（不超过 limit）"""
+    length = 0
+    step = 64 * 1024
+    while length < limit:
+        size = min(step, limit - length)
+        if a[a_end - length - size:a_end - length] == b[b_end - length - size:b_end - length]:
+            length += size
+            continue
+        low, high = 0, size
+        while low < high:
+            middle = (low + high + 1) // 2
+            if a[a_end - length - middle:a_end - length] == b[b_end - length - middle:b_end - length]:
+                low = middle
+            else:
+                high = middle - 1
+        return length + low
+    return length
+
+
+def choose_anchor(data):
+    """选择种子锚点：抽样统计各字节的出现次数，返回平均间隔最接近 SEED_INTERVAL 的字节"""
+    if not data:
+        return None
+    step = max(1, len(data) // ANCHOR_SAMPLES)
+    counts = Counter(data[::step])
+    target = sum(counts.values()) / SEED_INTERVAL
+    return bytes([min(counts, key=lambda value: (abs(counts[value] - target), value))])
+
+
+def find_seeds(data, anchor):
+    """返回锚点之后的种子位置（相邻种子至少间隔 SEED_LENGTH）
+
+    种子位置只取决于锚点附近的内容，数据中插入、删除或替换若干字节后，其余位置的种子保持不变。
+    """
+    seeds = []
+    if not anchor:
+        return seeds
+    last_end = len(data) - SEED_LENGTH
+    position = data.find(anchor)
+    while position != -1:
+        seed = position + len(anchor)
+        if seed > last_end:
+            break
+        seeds.append(seed)
+        position = data.find(anchor, seed + SEED_LENGTH - len(anchor))
+    return seeds
+
+
+def block_diff(old, new):
+    """内置的二进制差异算法，返回补丁数据
+
+    按内容在旧文件中选取种子位置（见 find_seeds），用字典索引种子处的 SEED_LENGTH 字节；
+    在新文件的种子位置查找相同的数据，找到后尽量向前、向后延长匹配，匹配中断后在旧文件中
+    紧接着的位置附近重新对齐（少量字节被替换的情况）。输出 COPY（从旧文件复制）和 INSERT（新数据）指令。
+    查找和比较都在 C 中完成，不逐字节扫描。未匹配的数据超过新文件的一半时放弃
+    （差异不会比完整文件小多少），返回 None。
+    """
+    anchor = choose_anchor(old)
+    index = {}
+    for seed in find_seeds(old, anchor):
+        index.setdefault(old[seed:seed + SEED_LENGTH], seed)
+
+    ops = io.BytesIO()
+    insert_start = 0
+    unmatched = 0
+    unmatched_limit = len(new) // 2
+
+    def copy(offset, position):
+        """从 old[offset:]、new[position:] 开始向前、向后延长匹配并输出指令，返回匹配结束的 (旧文件位置, 新文件位置)"""
+        nonlocal insert_start, unmatched
+        back = _common_suffix_length(old, offset, new, position, min(position - insert_start, offset))
+        offset, position = offset - back, position - back
+        length = _common_prefix_length(old, offset, new, position)
+        if position > insert_start:
+            ops.write(b"I" + struct.pack("<Q", position - insert_start))
+            ops.write(new[insert_start:position])
+            unmatched += position - insert_start
+        ops.write(b"C" + struct.pack("<QQ", offset, length))
+        insert_start = position + length
+        return offset + length, insert_start
+
+    def realign(old_position, position):
+        """在 old_position、position 之后不远处查找重新相同的位置，返回 (旧文件位置, 新文件位置) 或 None"""
+        for skip in range(1, REALIGN_DISTANCE + 1):
+            o, p = old_position + skip, position + skip
+            if o + MIN_COPY_LENGTH > len(old) or p + MIN_COPY_LENGTH > len(new):
+                break
+            if old[o:o + MIN_COPY_LENGTH] == new[p:p + MIN_COPY_LENGTH]:
+                return o, p
+        return None
+
+    for seed in find_seeds(new, anchor):
+        if seed < insert_start:
+            continue
+        offset = index.get(new[seed:seed + SEED_LENGTH])
+        if offset is None:
+            continue
+        found = copy(offset, seed)
+        while found is not None:
+            found = realign(*found)
+            if found is not None:
+                found = copy(*found)
+        if unmatched > unmatched_limit:
+            return None
+    if insert_start < len(new):
+        if unmatched + len(new) - insert_start > unmatched_limit:
+            return None
+        ops.write(b"I" + struct.pack("<Q", len(new) - insert_start))
+        ops.write(new[insert_start:])
+
+    return PATCH_MAGIC + lzma.compress(ops.getvalue(), preset=6)
+
+
+def block_patch(old, patch):
+    """应用内置算法生成的补丁"""
+    if not patch.startswith(PATCH_MAGIC):
+        raise ValueError("补丁格式不正确")
+    ops = lzma.decompress(patch[len(PATCH_MAGIC):])
+    output = io.BytesIO()
+    position = 0
+    while position < len(ops):
+        op = ops[position:position + 1]
+        if op == b"C":
+            offset, length = struct.unpack_from("<QQ", ops, position + 1)
+            output.write(old[offset:offset + length])
+            position += 17
+        elif op == b"I":
+            (length,) = struct.unpack_from("<Q", ops, position + 1)
+            output.write(ops[position + 9:position + 9 + length])
+            position += 9 + length
+        else:
+            raise ValueError("补丁数据损坏")
+    return output.getvalue()
+
+
+def make_patch(old, new):
+    """生成二进制差异，返回 (方法, 补丁数据)，无法生成有效差异时补丁数据为 None"""
+    if bsdiff4 is not None:
+        return "bsdiff4", bsdiff4.diff(old, new)
+    return "block", block_diff(old, new)
+
+
+def apply_patch(method, old, patch):
+    """应用二进制差异"""
+    if method == "bsdiff4":
+        if bsdiff4 is None:
+            raise RuntimeError("该增量包需要 bsdiff4 模块: pip install bsdiff4")
+        return bsdiff4.patch(old, patch)
+    if method == "block":
+        return block_patch(old, patch)
+    raise ValueError(f"不支持的补丁方法: {method}")
+
+
+def get_member_mode(info):
+    """ZIP 成员记录的 Unix 权限位，未记录（如 Windows 上生成的压缩包）时返回 None"""
+    mode = (info.external_attr >> 16) & 0o7777
+    if info.create_system != ZIP_SYSTEM_UNIX or not mode:
+        return None
+    return mode
+
+
+def read_bundle_archive(archive_path):
+    """读取发行压缩包，返回 (根目录名, {相对路径: 内容}, {相对路径: 权限位})"""
+    files = {}
+    modes = {}
+    roots = set()
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            root, _, relative = info.filename.partition("/")
+            roots.add(root)
+            files[relative] = archive.read(info)
+            mode = get_member_mode(info)
+            if mode is not None:
+                modes[relative] = mode
+    root = roots.pop() if len(roots) == 1 else ""
+    if not root:
+        raise ValueError(f"压缩包中应只有一个顶层目录: {archive_path}")
+    return root, files, modes
+
+
+def read_bundle(path):
+    """读取旧版本：可以是解压后的目录，也可以是发行压缩包"""
+    path = Path(path)
+    if path.is_dir():
+        return {
+            f.relative_to(path).as_posix(): f.read_bytes()
+            for f in sorted(path.rglob("*")) if f.is_file()
+        }
+    return read_bundle_archive(path)[1]
+
+
+def create_delta(old_archive, new_archive, output_path):
+    """根据新旧两个发行压缩包生成增量包，返回增量包清单"""
+    old_root, old_files, _ = read_bundle_archive(old_archive)
+    new_root, new_files, new_modes = read_bundle_archive(new_archive)
+
+    entries = []
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as delta:
+        for path in sorted(new_files):
+            data = new_files[path]
+            entry = {"path": path, "size": len(data), "sha256": sha256(data)}
+            if path in new_modes:
+                entry["mode"] = new_modes[path]
+            old_data = old_files.get(path)
+            if old_data == data:
+                entry["action"] = "keep"
+            elif old_data is not None and len(data) >= MIN_PATCH_SIZE:
+                method, patch = make_patch(old_data, data)
+                # 补丁不比完整压缩的文件小时，直接保存完整文件
+                if patch is not None and len(patch) < len(zlib.compress(data, 1)):
+                    entry.update(action="patch", method=method, base_sha256=sha256(old_data))
+                    delta.writestr(f"patch/{path}", patch, zipfile.ZIP_STORED)
+                else:
+                    entry["action"] = "add"
+            else:
+                entry["action"] = "add"
+            if entry["action"] == "add":
+                delta.writestr(f"add/{path}", data)
+            entries.append(entry)
+
+        manifest = {
+            "format": DELTA_FORMAT,
+            "from": {"archive": Path(old_archive).name, "root": old_root},
+            "to": {"archive": Path(new_archive).name, "root": new_root},
+            "files": entries,
+            "removed": sorted(set(old_files) - set(new_files)),
+        }
+        delta.writestr(DELTA_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def set_file_mode(path, mode):
+    """恢复文件权限位并确认可执行位已生效（Windows 上只能设置只读属性，不检查可执行位）"""
+    os.chmod(path, mode)
+    if os.name != "nt" and path.stat().st_mode & 0o111 != mode & 0o111:
+        raise ValueError(f"无法恢复文件权限 {oct(mode)}: {path}")
+
+
+def resolve_target(output_dir, path):
+    """返回清单中的文件在输出目录中的位置；拒绝绝对路径、.. 以及解析后位于输出目录之外的路径"""
+    if (not path or PurePosixPath(path).is_absolute() or PureWindowsPath(path).drive
+            or PureWindowsPath(path).root or ".." in PureWindowsPath(path).parts):
+        raise ValueError(f"增量包中的文件路径不安全: {path}")
+    root = output_dir.resolve()
+    target = (output_dir / path).resolve()
+    if target == root or root not in target.parents:
+        raise ValueError(f"增量包中的文件路径不安全: {path}")
+    return target
+
+
+def apply_delta(old_path, delta_path, output_dir):
+    """将增量包应用到旧版本，在 output_dir 中生成新版本并逐个校验 SHA-256"""
+    old_files = read_bundle(old_path)
+    output_dir = Path(output_dir)
+
+    with zipfile.ZipFile(delta_path) as delta:
+        manifest = json.loads(delta.read(DELTA_MANIFEST))
+        if manifest.get("format") != DELTA_FORMAT:
+            raise ValueError("不支持的增量包格式")
+        # 写入任何文件之前先检查全部路径
+        targets = [resolve_target(output_dir, entry["path"]) for entry in manifest["files"]]
+
+        for entry, target in zip(manifest["files"], targets):
+            path = entry["path"]
+            action = entry["action"]
+            if action == "keep":
+                data = old_files.get(path)
+                if data is None:
+                    raise ValueError(f"旧版本中缺少文件: {path}")
+            elif action == "add":
+                data = delta.read(f"add/{path}")
+            elif action == "patch":
+                base = old_files.get(path)
+                if base is None or sha256(base) != entry["base_sha256"]:
+                    raise ValueError(f"旧版本文件与增量包不匹配: {path}")
+                data = apply_patch(entry["method"], base, delta.read(f"patch/{path}"))
+            else:
+                raise ValueError(f"未知的处理方式: {action}")
+
+            if len(data) != entry["size"] or sha256(data) != entry["sha256"]:
+                raise ValueError(f"校验失败: {path}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            if "mode" in entry:
+                set_file_mode(target, entry["mode"])
+    return manifest
+
+
+def find_previous_release(releases_dir, version):
+    """查找早于指定版本的最新发行目录，返回版本号，不存在时返回 None"""
+    def version_key(v):
+        return tuple(int(part) for part in v.split("."))
+
+    versions = [
+        path.name[1:] for path in releases_dir.glob("v*")
+        if path.is_dir() and re.match(r"^v\d+\.\d+\.\d+$", path.name)
+    ]
+    previous = [v for v in versions if version_key(v) < version_key(version)]
+    return max(previous, key=version_key) if previous else None
+
+
+def summarize(manifest):
+    """统计增量包清单中各处理方式的文件数"""
+    counts = {}
+    for entry in manifest["files"]:
+        counts[entry["action"]] = counts.get(entry["action"], 0) + 1
+    return (
+        f"保留 {counts.get('keep', 0)}，新增 {counts.get('add', 0)}，"
+        f"补丁 {counts.get('patch', 0)}，删除 {len(manifest['removed'])}"
+    )
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 增量更新包工具",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python delta.py create old.zip new.zip delta.zip
+  python delta.py apply StepUp_v1.2.4_windows_portable delta.zip StepUp_v1.2.5
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="生成增量包")
+    create_parser.add_argument("old", help="旧版本发行压缩包")
+    create_parser.add_argument("new", help="新版本发行压缩包")
+    create_parser.add_argument("output", help="输出的增量包路径")
+
+    apply_parser = subparsers.add_parser("apply", help="应用增量包")
+    apply_parser.add_argument("old", help="旧版本目录（解压后的程序目录）或发行压缩包")
+    apply_parser.add_argument("delta", help="增量包路径")
+    apply_parser.add_argument("output", help="新版本输出目录")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    try:
+        if args.command == "create":
+            manifest = create_delta(args.old, args.new, args.output)
+            size = Path(args.output).stat().st_size / (1024 * 1024)
+            print(f"[成功] 增量包已生成: {args.output} ({size:.1f} MB)")
+        else:
+            manifest = apply_delta(args.old, args.delta, args.output)
+            print(f"[成功] 已生成新版本并通过校验: {args.output}")
+    except (OSError, ValueError, RuntimeError, zipfile.BadZipFile) as e:
+        print(f"[错误] {e}")
+        sys.exit(1)
+    print(f"       {summarize(manifest)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 构建前字体子集化
+
+pubspec.yaml 中打包的 HarmonyOS Sans SC 各字重都是完整的中文字体，每个数 MB。
+构建前扫描 Dart 源码、本地化字符串和资源中的 JSON 文本，收集实际用到的字符，
+加上常用字符集（默认 GB2312，保证用户输入的文字也能正常显示），为每个字重生成子集，
+在构建期间替换 assets/fonts/ 中的原字体，构建结束后恢复。
+
+子集按「原字体内容 + 字符集」的哈希缓存在 .build_cache/fonts/ 中，源码中的文字没有变化时直接复用。
+需要安装 fontTools 模块（pip install fonttools），未安装时跳过子集化。
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from release_timing import timed
+
+
+# 字体子集缓存目录（位于构建缓存目录中）
+FONT_CACHE_DIR = Path(".build_cache") / "fonts"
+# 构建期间被替换的原字体的保存目录（位于字体子集缓存目录中）
+ORIGINALS_DIR = "originals"
+# 每个字体保留的子集数量
+FONT_CACHE_KEEP = 3
+
+# 扫描文字的目录和文件类型
+GLYPH_SOURCES = [
+    ("lib", ["*.dart", "*.arb"]),
+    ("assets", ["*.json", "*.txt"]),
+]
+
+# 始终保留的字符：ASCII、Latin-1、常用标点、CJK 标点、全角字符
+BASE_RANGES = [
+    (0x20, 0x7E),
+    (0xA0, 0xFF),
+    (0x2000, 0x206F),
+    (0x3000, 0x303F),
+    (0xFF00, 0xFFEF),
+]
+
+
+def _gb2312_chars(first_row, last_row):
+    """GB2312 编码表中指定区的全部字符"""
+    chars = set()
+    for high in range(first_row, last_row + 1):
+        for low in range(0xA1, 0xFF):
+            try:
+                chars.add(bytes([high, low]).decode("gb2312"))
+            except UnicodeDecodeError:
+                pass
+    return chars
+
+
+# 可选的后备字符集：源码之外额外保留的字符（用户输入的文字）
+FALLBACK_CHARSETS = {
+    "gb2312": lambda: _gb2312_chars(0xA1, 0xF7),      # 符号、一级和二级汉字，共 7445 个字符
+    "gb2312-1": lambda: _gb2312_chars(0xA1, 0xD7),    # 符号和一级常用汉字
+    "none": set,
+}
+
+
+def add_arguments(parser):
+    """添加字体子集化相关的命令行参数"""
+    parser.add_argument(
+        "--subset-fonts",
+        help="构建前按源码中用到的字符和后备字符集对 assets/fonts/ 中的字体做子集化（需要 fontTools）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--font-fallback",
+        help="字体子集额外保留的字符集 (gb2312,gb2312-1,none，默认: gb2312)",
+        choices=list(FALLBACK_CHARSETS),
+        default="gb2312"
+    )
+
+
+def get_font_assets(project_root):
+    """读取 pubspec.yaml 中声明的字体文件"""
+    content = (project_root / "pubspec.yaml").read_text(encoding="utf-8")
+    names = re.findall(r"^\s*-\s*asset:\s*(\S+\.(?:ttf|otf))\s*$", content, re.MULTILINE)
+    return [project_root / name for name in dict.fromkeys(names) if (project_root / name).is_file()]
+
+
+def collect_glyphs(project_root, fallback="gb2312"):
+    """收集需要保留的字符"""
+    glyphs = set()
+    for start, end in BASE_RANGES:
+        glyphs.update(chr(code) for code in range(start, end + 1))
+    glyphs |= FALLBACK_CHARSETS[fallback]()
+    for directory, patterns in GLYPH_SOURCES:
+        for pattern in patterns:
+            for path in (project_root / directory).rglob(pattern):
+                glyphs.update(path.read_text(encoding="utf-8", errors="ignore"))
+    return {c for c in glyphs if c.isprintable() or c == " "}
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_subset_path(cache_dir, font_path, font_hash, glyph_hash):
+    """子集在缓存中的路径：由原字体内容和字符集共同决定"""
+    key = hashlib.sha256(f"{font_hash}\0{glyph_hash}".encode("utf-8")).hexdigest()[:24]
+    return cache_dir / f"{font_path.stem}-{key}{font_path.suffix}"
+
+
+def subset_font(source, output, text):
+    """生成字体子集（在子进程中运行）"""
+    from fontTools import subset
+
+    # 不输出无法处理的表（如 FFTM）的逐条提示
+    logging.getLogger("fontTools").setLevel(logging.ERROR)
+    options = subset.Options()
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.notdef_outline = True
+    options.glyph_names = False
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    temp_path = output.with_name(output.name + ".tmp")
+    subset.save_font(font, str(temp_path), options)
+    os.replace(temp_path, output)
+    return output
+
+
+def prune_cache(cache_dir, font_path):
+    """每个字体只保留最近使用的 FONT_CACHE_KEEP 个子集"""
+    entries = sorted(
+        cache_dir.glob(f"{font_path.stem}-*{font_path.suffix}"),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True
+    )
+    for entry in entries[FONT_CACHE_KEEP:]:
+        entry.unlink(missing_ok=True)
+
+
+def restore_fonts(project_root):
+    """将构建期间被替换的原字体放回 assets/fonts/，返回恢复的文件数"""
+    originals_dir = project_root / FONT_CACHE_DIR / ORIGINALS_DIR
+    if not originals_dir.is_dir():
+        return 0
+    count = 0
+    for backup in originals_dir.rglob("*"):
+        if backup.is_file():
+            target = project_root / backup.relative_to(originals_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(backup, target)
+            count += 1
+    shutil.rmtree(originals_dir, ignore_errors=True)
+    return count
+
+
+def apply_font_subsets(project_root, fallback="gb2312", jobs=None):
+    """生成（或从缓存取出）字体子集并替换原字体，返回替换的字体数"""
+    try:
+        import fontTools  # noqa: F401
+    except ImportError:
+        print("[警告] 未安装 fontTools (pip install fonttools)，跳过字体子集化")
+        return 0
+
+    fonts = get_font_assets(project_root)
+    if not fonts:
+        print("[信息] 没有找到 pubspec.yaml 中声明的字体文件，跳过字体子集化")
+        return 0
+
+    glyphs = collect_glyphs(project_root, fallback)
+    text = "".join(sorted(glyphs))
+    glyph_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cache_dir = project_root / FONT_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    subsets = {font: get_subset_path(cache_dir, font, hash_file(font), glyph_hash) for font in fonts}
+
+    missing = [font for font, path in subsets.items() if not path.exists()]
+    if missing:
+        # fontTools 是纯 Python 实现，各字重在多个进程中同时处理
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(missing), jobs or os.cpu_count() or 1)) as executor:
+                list(executor.map(subset_font, missing, [subsets[f] for f in missing], [text] * len(missing)))
+        except Exception as e:
+            print(f"[警告] 生成字体子集失败，使用原字体: {e}")
+            return 0
+
+    originals_dir = cache_dir / ORIGINALS_DIR
+    for font, subset_path in subsets.items():
+        original_size = font.stat().st_size
+        backup = originals_dir / font.relative_to(project_root)
+        backup.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(font, backup)
+        shutil.copy2(subset_path, font)
+        os.utime(subset_path)
+        prune_cache(cache_dir, font)
+        print(
+            f"      {font.name}: {original_size / (1024 * 1024):.1f} MB -> "
+            f"{subset_path.stat().st_size / (1024 * 1024):.1f} MB{'' if font in missing else '（缓存）'}"
+        )
+    print(f"      字体子集共 {len(glyphs)} 个字符（后备字符集: {fallback}）")
+    return len(subsets)
+
+
+@contextmanager
+def font_subsets(project_root, enabled=True, fallback="gb2312", jobs=None):
+    """构建期间使用字体子集，结束（包括出错）后恢复原字体
+
+    上次构建中途退出、原字体没有恢复时，先将其恢复。
+    """
+    restored = restore_fonts(project_root)
+    if restored:
+        print(f"[信息] 已恢复上次构建未恢复的 {restored} 个原字体文件")
+    if not enabled:
+        yield 0
+        return
+
+    print("[字体] 生成字体子集...")
+    try:
+        with timed("font subset"):
+            count = apply_font_subsets(project_root, fallback, jobs)
+        print()
+        yield count
+    finally:
+        restore_fonts(project_root)
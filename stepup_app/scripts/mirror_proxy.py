@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp pub / Flutter 资源镜像缓存代理
+用法: python mirror_proxy.py [--host=地址] [--port=端口] [--cache-dir=目录] [--max-size=GB] [--offline]
+示例: python mirror_proxy.py
+       python mirror_proxy.py --host=0.0.0.0 --max-size=50
+       python mirror_proxy.py --offline
+
+各构建机（build.py、build_worker.py、build_daemon.py）分别从国内镜像下载依赖包和引擎产物，
+镜像变慢时所有构建一起卡住。本代理在本机或局域网内转发这两个镜像并缓存响应:
+  /pub/...      -> https://pub.flutter-io.cn/...        (PUB_HOSTED_URL)
+  /storage/...  -> https://storage.flutter-io.cn/...    (FLUTTER_STORAGE_BASE_URL)
+
+- 响应内容按 SHA-256 存放（相同内容只保存一份），总大小超过上限时按最近使用时间淘汰
+- 依赖包、引擎产物等带版本的文件永久缓存；pub 的包元数据缓存 METADATA_TTL 秒，过期后重新获取，
+  镜像不可用（无法连接或返回 5xx）时继续使用过期的缓存
+- pub 元数据中的下载地址（archive_url）改写为经过本代理的地址
+- 同一地址的并发请求只向镜像请求一次，其余请求等待后直接使用缓存
+- --offline 时完全不访问镜像，只使用已有的缓存（可先联网构建一次，或复制其他机器的缓存目录预先填充）
+
+构建机设置环境变量 STEPUP_MIRROR_PROXY=http://代理地址:端口 后，build.py 的 get_mirror_env() 会改为使用本代理。
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import argparse
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+
+DEFAULT_PORT = 8771
+# 缓存目录（位于项目的构建缓存目录中）
+DEFAULT_CACHE_DIR = Path(__file__).parent.resolve().parent / ".build_cache" / "mirror"
+# 缓存大小上限（GB）
+DEFAULT_MAX_SIZE = 20
+
+# 路径前缀 -> 上游镜像
+UPSTREAMS = {
+    "pub": "https://pub.flutter-io.cn",
+    "storage": "https://storage.flutter-io.cn",
+}
+
+# 内容不会变化的文件（带版本号的依赖包、引擎产物），缓存后不再重新获取
+IMMUTABLE_PATTERNS = [
+    re.compile(r"\.(tar\.gz|tgz|zip|jar|pom|xz|bz2)$"),
+    re.compile(r"^/api/archives/"),
+    re.compile(r"^/flutter_infra_release/"),
+]
+
+# 其他响应（pub 包元数据等）的缓存有效期（秒）
+METADATA_TTL = 600
+
+# 需要改写其中上游地址的响应类型
+REWRITE_CONTENT_TYPES = ("application/json", "application/vnd.pub")
+
+# 转发给上游的请求头
+FORWARDED_HEADERS = ["Accept", "User-Agent"]
+
+# 请求上游的超时（秒）
+UPSTREAM_TIMEOUT = 60
+
+
+class MirrorCache:
+    """按内容寻址的磁盘缓存
+
+    objects/<摘要前两位>/<摘要>  响应内容
+    index/<地址哈希>.json        地址 -> 内容摘要、类型、获取时间
+    对象文件的修改时间即最近使用时间，总大小超过上限时从最久未使用的对象开始删除。
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.objects_dir = cache_dir / "objects"
+        self.index_dir = cache_dir / "index"
+        self.temp_dir = cache_dir / "tmp"
+        for directory in (self.objects_dir, self.index_dir, self.temp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.size_lock = threading.Lock()
+        self.size = sum(f.stat().st_size for f in self.objects_dir.rglob("*") if f.is_file())
+
+    def object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest
+
+    def index_path(self, key):
+        return self.index_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def lookup(self, key):
+        """查找索引中的缓存条目（内容可能已被淘汰，使用前需调用 open）"""
+        try:
+            return json.loads(self.index_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def open(self, entry):
+        """打开缓存条目的内容并更新最近使用时间，内容已被淘汰时返回 None
+
+        在 size_lock 下打开，淘汰不会删除到一半；文件打开后即使随后被淘汰，也能读完。
+        """
+        path = self.object_path(entry["sha256"])
+        with self.size_lock:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                return None
+            os.utime(path)
+        return f
+
+    def store(self, key, response, content_type):
+        """将上游响应写入缓存，返回缓存条目"""
+        hasher = hashlib.sha256()
+        fd, temp_name = tempfile.mkstemp(dir=self.temp_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            path = self.object_path(digest)
+            with self.size_lock:
+                if path.exists():
+                    os.unlink(temp_name)
+                    os.utime(path)
+                else:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(temp_name, path)
+                    self.size += size
+                f = open(path, "rb")
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+            raise
+
+        entry = {"key": key, "sha256": digest, "size": size, "content_type": content_type, "fetched_at": time.time()}
+        index_path = self.index_path(key)
+        temp_index = index_path.with_name(index_path.name + ".tmp")
+        temp_index.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_index, index_path)
+        self.evict(keep=digest)
+        return dict(entry, file=f)
+
+    def evict(self, keep=None):
+        """总大小超过上限时，删除最久未使用的对象（索引中指向已删除对象的条目视为未缓存）"""
+        with self.size_lock:
+            if self.size <= self.max_size:
+                return 0
+            objects = sorted(
+                (f for f in self.objects_dir.rglob("*") if f.is_file() and f.name != keep),
+                key=lambda f: f.stat().st_mtime
+            )
+            removed = 0
+            for path in objects:
+                if self.size <= self.max_size:
+                    break
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except OSError:
+                    # 已被删除，或在 Windows 上正被读取
+                    continue
+                self.size -= size
+                removed += 1
+            return removed
+
+    def count(self):
+        return sum(1 for _ in self.index_dir.glob("*.json"))
+
+
+class MirrorProxy:
+    """镜像代理：转发请求、读写缓存、同一地址的并发请求只获取一次"""
+
+    def __init__(self, cache, upstreams, offline=False):
+        self.cache = cache
+        self.upstreams = upstreams
+        self.offline = offline
+        # 地址 -> (锁, 正在使用的请求数)
+        self.key_locks = {}
+        self.key_locks_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "errors": 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    @contextmanager
+    def key_lock(self, key):
+        """同一地址的请求依次执行；没有请求使用时删除该地址的锁"""
+        with self.key_locks_lock:
+            lock, users = self.key_locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self.key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self.key_locks_lock:
+                lock, users = self.key_locks[key]
+                if users == 1:
+                    del self.key_locks[key]
+                else:
+                    self.key_locks[key] = (lock, users - 1)
+
+    def is_fresh(self, path, entry):
+        if any(pattern.search(path) for pattern in IMMUTABLE_PATTERNS):
+            return True
+        return time.time() - entry["fetched_at"] < METADATA_TTL
+
+    def fetch(self, prefix, path, headers):
+        """返回 (状态码, 缓存条目或错误说明)；缓存条目中的 file 为已打开的内容，由调用方关闭"""
+        key = f"{prefix}{path}\0{headers.get('Accept', '')}"
+        with self.key_lock(key):
+            entry = self.cache.lookup(key)
+            upstream_path = urllib.parse.urlsplit(path).path
+            if entry is not None and (self.offline or self.is_fresh(upstream_path, entry)):
+                f = self.cache.open(entry)
+                if f is not None:
+                    self.count("hits")
+                    return 200, dict(entry, file=f)
+                # 内容已被淘汰，按未缓存处理
+                entry = None
+            if self.offline:
+                self.count("errors")
+                return 504, "离线模式下缓存中没有该文件"
+
+            request = urllib.request.Request(
+                self.upstreams[prefix] + path,
+                headers={name: headers[name] for name in FORWARDED_HEADERS if headers.get(name)}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+                    content_type = response.headers.get("Content-Type", "application/octet-stream")
+                    result = self.cache.store(key, response, content_type)
+                self.count("misses")
+                return 200, result
+            except urllib.error.HTTPError as e:
+                # 4xx 是上游的明确答复；5xx 与无法连接一样视为镜像不可用
+                if e.code < 500 or entry is None:
+                    self.count("errors")
+                    return e.code, f"上游返回 {e.code}"
+                error = f"上游返回 {e.code}"
+            except OSError as e:
+                if entry is None:
+                    self.count("errors")
+                    return 502, f"无法连接上游: {e}"
+                error = f"无法连接上游: {e}"
+
+            # 镜像不可用时继续使用过期的元数据
+            f = self.cache.open(entry)
+            if f is None:
+                self.count("errors")
+                return 502, error
+            self.count("stale")
+            return 200, dict(entry, file=f)
+
+    def rewrite(self, data, base_url):
+        """将响应中的上游地址改写为经过代理的地址"""
+        text = data.decode("utf-8")
+        for prefix, upstream in self.upstreams.items():
+            text = text.replace(upstream, f"{base_url}/{prefix}")
+        return text.encode("utf-8")
+
+    def info(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return dict(
+            stats,
+            offline=self.offline,
+            upstreams=self.upstreams,
+            entries=self.cache.count(),
+            size=self.cache.size,
+            max_size=self.cache.max_size,
+        )
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """镜像代理 HTTP 接口"""
+
+    proxy = None
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_error_text(self, status, message):
+        self.send_body(status, message.encode("utf-8"), "text/plain; charset=utf-8")
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            body = json.dumps(self.proxy.info(), ensure_ascii=False).encode("utf-8")
+            return self.send_body(200, body, "application/json; charset=utf-8")
+
+        prefix, _, rest = self.path.lstrip("/").partition("/")
+        if prefix not in self.proxy.upstreams:
+            return self.send_error_text(404, f"未知的镜像: {prefix}")
+        status, result = self.proxy.fetch(prefix, "/" + rest, self.headers)
+        if status != 200:
+            return self.send_error_text(status, result)
+
+        content_type = result["content_type"]
+        with result["file"] as f:
+            if content_type.startswith(REWRITE_CONTENT_TYPES):
+                base_url = f"http://{self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]}"
+                return self.send_body(200, self.proxy.rewrite(f.read(), base_url), content_type)
+
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(result["size"]))
+            self.end_headers()
+            if self.command != "HEAD":
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+        return None
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp pub / Flutter 资源镜像缓存代理",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python mirror_proxy.py
+  python mirror_proxy.py --host=0.0.0.0 --max-size=50
+  python mirror_proxy.py --offline
+  python mirror_proxy.py --pub-upstream=http://127.0.0.1:9000 --storage-upstream=http://127.0.0.1:9001
+        """
+    )
+    parser.add_argument("--host", help="监听地址 (默认: 127.0.0.1)", default="127.0.0.1")
+    parser.add_argument("--port", help=f"监听端口 (默认: {DEFAULT_PORT})", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--cache-dir",
+        help="缓存目录 (默认: 项目的 .build_cache/mirror/)",
+        default=None
+    )
+    parser.add_argument(
+        "--max-size",
+        help=f"缓存大小上限，单位 GB (默认: {DEFAULT_MAX_SIZE})",
+        type=float,
+        default=DEFAULT_MAX_SIZE
+    )
+    parser.add_argument(
+        "--offline",
+        help="离线模式：不访问上游镜像，只使用已有的缓存",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--pub-upstream",
+        help=f"pub 上游地址 (默认: {UPSTREAMS['pub']})",
+        default=UPSTREAMS["pub"]
+    )
+    parser.add_argument(
+        "--storage-upstream",
+        help=f"Flutter 资源上游地址 (默认: {UPSTREAMS['storage']})",
+        default=UPSTREAMS["storage"]
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    cache_dir = Path(args.cache_dir).resolve() if args.cache_dir else DEFAULT_CACHE_DIR
+    cache = MirrorCache(cache_dir, int(args.max_size * 1024 ** 3))
+    upstreams = {"pub": args.pub_upstream.rstrip("/"), "storage": args.storage_upstream.rstrip("/")}
+    MirrorHandler.proxy = MirrorProxy(cache, upstreams, args.offline)
+    server = ThreadingHTTPServer((args.host, args.port), MirrorHandler)
+
+    print(f"[信息] 镜像代理已启动: http://{args.host}:{args.port}")
+    print(f"[信息] 缓存目录: {cache_dir}（{cache.count()} 个条目，{cache.size / 1024 ** 2:.1f} MB，上限 {args.max_size:g} GB）")
+    if args.offline:
+        print("[信息] 离线模式：只使用已有的缓存")
+    else:
+        for prefix, upstream in upstreams.items():
+            print(f"[信息] /{prefix}/ -> {upstream}")
+    print(f"[信息] 构建机设置: STEPUP_MIRROR_PROXY=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
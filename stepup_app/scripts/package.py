@@ -11,13 +11,110 @@ StepUp 打包脚本
 import sys
 import os
 import re
+import time
 import shutil
+import stat
+import json
+import struct
+import hashlib
+import threading
+import zlib
+import bz2
+import lzma
+import tarfile
+import tempfile
 import subprocess
 import zipfile
 import platform as sys_platform
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+import batch
+import delta
+import release_store
+import release_timing
+import web_assets
+from release_timing import timed
+
+
+# ZIP 结构常量（APPNOTE.TXT）
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+ZIP_VERSION_DEFLATE = 20
+ZIP_VERSION_ZIP64 = 45
+ZIP_VERSION_BZIP2 = 46
+ZIP_VERSION_LZMA = 63
+ZIP_FLAG_LZMA_EOS = 0x02
+ZIP_FLAG_UTF8 = 0x800
+ZIP_CREATE_SYSTEM = 0 if sys.platform == "win32" else 3
+ZIP_CREATE_SYSTEM_UNIX = 3
+
+# 可复现模式下未设置 SOURCE_DATE_EPOCH、也无法读取 git 提交时间时使用的时间戳（1980-01-01 UTC，ZIP 能表示的最早时间）
+DEFAULT_SOURCE_DATE_EPOCH = 315532800
+
+# 压缩配置: 名称 -> (ZIP 压缩方法, 压缩级别)
+COMPRESSION_PROFILES = {
+    "store": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "default": (zipfile.ZIP_DEFLATED, 6),
+    "max": (zipfile.ZIP_DEFLATED, 9),
+    "lzma": (zipfile.ZIP_LZMA, 6),
+    "bzip2": (zipfile.ZIP_BZIP2, 9),
+}
+
+# 本身已经压缩过的文件类型，直接存储不再压缩
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".br", ".gz", ".zst", ".xz", ".bz2", ".7z", ".zip", ".jar", ".apk", ".aab",
+    ".mp3", ".mp4", ".m4a", ".ogg", ".woff", ".woff2",
+}
+
+# 压缩后仍不小于原始大小的该比例时，改为直接存储
+STORE_RATIO = 0.97
+
+# Linux 版本可选的压缩包格式
+LINUX_ARCHIVE_FORMATS = ["zip", "tar.zst", "tar.xz"]
+
+# 发行目录中的元数据文件（不属于发行产物）
+MANIFEST_FILE = "manifest.json"
+CHECKSUMS_FILE = "SHA256SUMS"
+SIZE_REPORT_FILE = "size_report.json"
+RELEASE_METADATA_FILES = {MANIFEST_FILE, CHECKSUMS_FILE, SIZE_REPORT_FILE, release_timing.TIMINGS_FILE}
+
+# 写入发行产物时顺带计算出的 SHA-256: 路径 -> 摘要
+ARTIFACT_DIGESTS = {}
+_digests_lock = threading.Lock()
+
+# 可生成增量包的便携版压缩包: 平台 -> 文件名后缀
+DELTA_ARCHIVES = {
+    "windows": "windows_portable",
+    "linux": "linux",
+}
+
+# 各平台的发行产物文件名
+PLATFORM_ARTIFACT_PATTERNS = {
+    "windows": "StepUp_v{version}_windows_portable.zip",
+    "android": "StepUp_v{version}_android*",
+    "macos": "StepUp_v{version}_macos.*",
+    "linux": "StepUp_v{version}_linux.*",
+    "web": "StepUp_v{version}_web.zip",
+    "installer": "StepUp_v{version}_windows_installer.exe",
+}
+
+# 各平台用于生成压缩包的构建目录
+BUNDLE_SOURCES = {
+    "windows": Path("build/windows/x64/runner/Release"),
+    "macos": Path("build/macos/Build/Products/Release/StepUp.app"),
+    "linux": Path("build/linux/x64/release/bundle"),
+    "web": Path("build/web"),
+}
+
+# Web 发布目录：build/web 经过内容指纹、预压缩处理后的副本，可直接部署
+WEB_RELEASE_DIR = Path("build/web_release")
+
 
 def print_header(title):
     print("=" * 50)
@@ -55,49 +152,667 @@ def update_setup_iss_version(project_root, version):
     return True
 
 
-def create_zip_archive(source_dir, output_path):
-    """创建 ZIP 压缩包"""
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                file_path = Path(root) / file
-                arcname = file_path.relative_to(source_dir.parent)
-                zipf.write(file_path, arcname)
+def get_archive_options(args, project_root):
+    """获取压缩包相关设置"""
+    return {
+        "jobs": args.jobs or os.cpu_count() or 1,
+        "compression": args.compression,
+        "linux_format": args.linux_format,
+        "store": release_store.get_store_dir(project_root) if args.store else None,
+        "web_postprocess": args.web_postprocess,
+        "source_date_epoch": get_source_date_epoch(project_root, args.reproducible),
+    }
+
+
+def get_source_date_epoch(project_root, reproducible=False):
+    """获取可复现模式使用的时间戳，不使用可复现模式时返回 None
+
+    设置了 SOURCE_DATE_EPOCH 环境变量时总是使用可复现模式；
+    否则使用 --reproducible 时取最近一次 git 提交的时间。
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if value:
+        try:
+            return max(int(value), DEFAULT_SOURCE_DATE_EPOCH)
+        except ValueError:
+            print(f"[警告] SOURCE_DATE_EPOCH 不是整数: {value}，忽略")
+    if not reproducible:
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "log", "-1", "--format=%ct"],
+            cwd=project_root, capture_output=True, text=True
+        )
+        return max(int(result.stdout.strip()), DEFAULT_SOURCE_DATE_EPOCH)
+    except (OSError, ValueError):
+        return DEFAULT_SOURCE_DATE_EPOCH
+
+
+class HashingWriter:
+    """写入文件的同时计算 SHA-256，避免写完后再次读取整个文件"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def record_digest(path, digest):
+    """记录发行产物的摘要"""
+    with _digests_lock:
+        ARTIFACT_DIGESTS[Path(path).resolve()] = digest
+
+
+def unlink_existing(path):
+    """删除已存在的输出文件
+
+    使用去重存储时，发行目录中的文件可能是指向存储数据块的硬链接，
+    必须先删除再写入，不能直接覆盖写入，否则会改坏存储中的数据。
+    这些硬链接是只读的，Windows 上不能直接删除只读文件，需要先清除只读属性。
+    """
+    if not os.path.lexists(path):
+        return
+    try:
+        os.unlink(path)
+    except PermissionError:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        os.unlink(path)
+
+
+def copy_with_digest(source, target):
+    """复制文件，并在复制过程中计算 SHA-256"""
+    unlink_existing(target)
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        writer = HashingWriter(dst)
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            writer.write(chunk)
+    shutil.copystat(source, target)
+    record_digest(target, writer.hexdigest())
+
+
+def normalize_mode(mode):
+    """可复现模式下的权限位：目录和可执行文件为 755，其余文件为 644，保留文件类型位"""
+    executable = stat.S_ISDIR(mode) or mode & 0o111
+    return stat.S_IFMT(mode) | (0o755 if executable else 0o644)
+
+
+def get_previous_digest(output_path):
+    """从发行目录现有的 manifest.json 中读取产物上次打包时的 SHA-256，大小不一致时返回 None"""
+    try:
+        manifest = json.loads((output_path.parent / MANIFEST_FILE).read_text(encoding="utf-8"))
+        size = output_path.stat().st_size
+    except (OSError, ValueError):
+        return None
+    for artifact in manifest.get("artifacts", []):
+        if artifact.get("file") == output_path.name and artifact.get("size") == size:
+            return artifact.get("sha256")
+    return None
+
+
+def get_output_target(output_path, source_date_epoch=None):
+    """压缩包的写入路径：可复现模式下先写入临时文件，由 finish_output 决定是否替换原文件"""
+    if source_date_epoch is None:
+        unlink_existing(output_path)
+        return output_path
+    target = output_path.with_name(f".{output_path.name}.tmp")
+    unlink_existing(target)
+    return target
+
+
+def finish_output(target, output_path, digest):
+    """可复现模式下，新压缩包与上次打包的产物完全相同时保留原文件，返回产物是否有变化
+
+    原文件的修改时间、硬链接（去重存储）都保持不变，后续的上传、同步和缓存检查可以直接跳过该文件；
+    摘要取自上次的 manifest.json，不需要重新读取原文件计算。
+    """
+    changed = True
+    if target != output_path:
+        if get_previous_digest(output_path) == digest:
+            unlink_existing(target)
+            changed = False
+        else:
+            unlink_existing(output_path)
+            os.replace(target, output_path)
+    record_digest(output_path, digest)
+    return changed
+
+
+def hash_file(path):
+    """计算文件的 SHA-256（hashlib 处理大块数据时会释放 GIL，可在线程池中并行）"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def list_release_artifacts(version_dir):
+    """列出发行目录中的发行产物"""
+    return sorted(
+        f for f in version_dir.iterdir()
+        if f.is_file() and f.name not in RELEASE_METADATA_FILES and not f.name.startswith(".")
+    )
+
+
+def guess_artifact_platform(name):
+    """根据文件名判断发行产物所属平台"""
+    match = re.search(r"_(windows|android|macos|linux|web)", name)
+    return match.group(1) if match else None
+
+
+def guess_artifact_abi(name):
+    """根据文件名判断 Android 产物的 ABI：按 ABI 拆分的 APK 返回 ABI，包含所有 ABI 的 APK 返回 universal"""
+    match = re.search(r"_android(?:_([^.]+))?\.apk$", name)
+    if not match:
+        return None
+    return match.group(1) or "universal"
+
+
+def write_release_manifest(version_dir, version, jobs=None):
+    """生成 manifest.json 和 SHA256SUMS
+
+    打包时已经计算过摘要的文件直接使用记录的摘要，
+    其余文件（如 create-dmg 生成的 DMG、之前打包的文件）在线程池中并行计算。
+    """
+    artifacts = list_release_artifacts(version_dir)
+    with _digests_lock:
+        digests = {f: ARTIFACT_DIGESTS.get(f.resolve()) for f in artifacts}
+    missing = [f for f, digest in digests.items() if digest is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+            for file, digest in zip(missing, executor.map(hash_file, missing)):
+                digests[file] = digest
+
+    manifest = {
+        "version": version,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "artifacts": [
+            {
+                "file": f.name,
+                "size": f.stat().st_size,
+                "sha256": digests[f],
+                "platform": guess_artifact_platform(f.name),
+                "abi": guess_artifact_abi(f.name),
+            }
+            for f in artifacts
+        ],
+    }
+    (version_dir / MANIFEST_FILE).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    (version_dir / CHECKSUMS_FILE).write_text(
+        "".join(f"{digests[f]}  {f.name}\n" for f in artifacts), encoding="utf-8"
+    )
+    return manifest
+
+
+def summarize_release(version_dir, version, jobs=None):
+    """生成校验文件，列出发行产物并记录各产物大小"""
+    with timed("manifest"):
+        manifest = write_release_manifest(version_dir, version, jobs)
+    print("生成的文件:")
+    for artifact in manifest["artifacts"]:
+        release_timing.record(artifact["file"], size=artifact["size"])
+        print(f"  {artifact['file']} ({artifact['size'] / (1024 * 1024):.1f} MB)")
+        print(f"    SHA-256: {artifact['sha256']}")
+    print()
+    print(f"校验文件: {MANIFEST_FILE}, {CHECKSUMS_FILE}")
+    print()
+    return manifest
+
+
+def report_sizes(project_root, version, check_budgets=False):
+    """打印各产物的体积组成，check_budgets 为真时检查体积预算，返回超出预算的说明列表"""
+    import size_report
+
+    print_section("产物体积组成")
+    budgets = None
+    if check_budgets:
+        budgets = size_report.load_budgets()
+        if budgets is None:
+            print(f"[警告] 无法读取体积预算配置 {size_report.BUDGETS_FILE.name}，跳过预算检查")
+    with timed("size report"):
+        violations = size_report.report_release(project_root, version, budgets=budgets)
+    if budgets is not None:
+        size_report.print_violations(violations)
+    return violations
+
+
+def _dos_datetime(timestamp, utc=False):
+    """将时间戳转换为 ZIP 使用的 DOS 日期和时间（utc 为假时按本地时区）"""
+    t = time.gmtime(timestamp) if utc else time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return (1 << 5) | 1, 0
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_date, dos_time
+
+
+def _lzma_compress(data, preset):
+    """按 ZIP 的 LZMA 格式（APPNOTE 5.8.8）压缩数据"""
+    filters = [{
+        "id": lzma.FILTER_LZMA1, "preset": preset,
+        "dict_size": 1 << 23, "lc": 3, "lp": 0, "pb": 2,
+    }]
+    properties = struct.pack("<BI", (2 * 5 + 0) * 9 + 3, 1 << 23)
+    header = struct.pack("<BBH", 9, 4, len(properties)) + properties
+    return header + lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters)
+
+
+def compress_data(data, compress_type, level):
+    """使用指定的 ZIP 压缩方法压缩数据"""
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    if compress_type == zipfile.ZIP_BZIP2:
+        return bz2.compress(data, level)
+    if compress_type == zipfile.ZIP_LZMA:
+        return _lzma_compress(data, level)
+    return data
+
+
+def choose_compression(file_path, profile):
+    """根据文件类型选择压缩方法和级别"""
+    if "".join(file_path.suffixes[-1:]).lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED, None
+    return COMPRESSION_PROFILES[profile]
+
+
+def _compress_member(file_path, profile, store_dir=None):
+    """读取并压缩单个文件，返回 (crc, 原始大小, 压缩数据, 压缩方法, 数据块摘要)
+
+    zlib、bz2、lzma 在压缩和计算 CRC 时都会释放 GIL，因此可以直接在线程池中并行执行。
+    已压缩的文件类型直接存储；压缩收益太小的文件也回退为存储。
+    指定 store_dir 时，先按内容在去重存储中查找压缩结果，找到则跳过压缩，
+    否则将压缩结果存入存储；数据块摘要用于记录产物配方。
+    """
+    data = file_path.read_bytes()
+    compress_type, level = choose_compression(file_path, profile)
+
+    key = None
+    if store_dir is not None:
+        key = release_store.member_key(hashlib.sha256(data).hexdigest(), compress_type, level)
+        member = release_store.get_member(store_dir, key)
+        if member is not None:
+            blob = release_store.read_object(store_dir, member["blob"])
+            return member["crc"], member["file_size"], blob, member["compress_type"], member["blob"]
+
+    blob = compress_data(data, compress_type, level)
+    if compress_type != zipfile.ZIP_STORED and len(blob) >= len(data) * STORE_RATIO:
+        compress_type, blob = zipfile.ZIP_STORED, data
+    crc = zlib.crc32(data)
+    if key is None:
+        return crc, len(data), blob, compress_type, None
+    member = release_store.put_member(store_dir, key, blob, crc, len(data), compress_type)
+    return crc, len(data), blob, compress_type, member["blob"]
+
+
+class ParallelZipWriter:
+    """按顺序写入预先压缩好的成员数据的 ZIP 写入器
+
+    成员的压缩在线程池中完成，写入器只负责依次写出本地文件头、压缩数据，
+    最后写出中央目录。生成的文件是标准 ZIP（必要时使用 ZIP64 扩展），
+    可以被 zipfile、unzip、资源管理器等工具正常读取。
+    reproducible 为真时，修改时间按 UTC 记录，创建系统固定为 Unix，输出与运行的系统和时区无关。
+    """
+
+    def __init__(self, fp, reproducible=False):
+        self.fp = fp
+        self.offset = 0
+        self.entries = []
+        self.reproducible = reproducible
+        self.create_system = ZIP_CREATE_SYSTEM_UNIX if reproducible else ZIP_CREATE_SYSTEM
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    def add(self, arcname, mtime, mode, crc, file_size, blob, compress_type=zipfile.ZIP_DEFLATED):
+        """写入一个成员（mtime、mode 为源文件的修改时间和权限位）"""
+        name = arcname.encode("utf-8")
+        flags = 0 if arcname.isascii() else ZIP_FLAG_UTF8
+        version = ZIP_VERSION_DEFLATE
+        if compress_type == zipfile.ZIP_BZIP2:
+            version = ZIP_VERSION_BZIP2
+        elif compress_type == zipfile.ZIP_LZMA:
+            version = ZIP_VERSION_LZMA
+            flags |= ZIP_FLAG_LZMA_EOS
+        dos_date, dos_time = _dos_datetime(mtime, self.reproducible)
+        compress_size = len(blob)
+        header_offset = self.offset
+
+        zip64 = file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT
+        extra = b""
+        if zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, file_size, compress_size)
+            version = max(version, ZIP_VERSION_ZIP64)
+
+        self._write(struct.pack(
+            "<4sHHHHHIIIHH", b"PK\x03\x04", version, flags, compress_type,
+            dos_time, dos_date, crc,
+            ZIP64_LIMIT if zip64 else compress_size,
+            ZIP64_LIMIT if zip64 else file_size,
+            len(name), len(extra)
+        ))
+        self._write(name)
+        self._write(extra)
+        self._write(blob)
+
+        self.entries.append({
+            "name": name,
+            "version": version,
+            "flags": flags,
+            "compress_type": compress_type,
+            "dos_date": dos_date,
+            "dos_time": dos_time,
+            "crc": crc,
+            "file_size": file_size,
+            "compress_size": compress_size,
+            "header_offset": header_offset,
+            "external_attr": (mode & 0xFFFF) << 16,
+        })
+
+    def close(self):
+        """写出中央目录和目录结束记录"""
+        central_offset = self.offset
+        for entry in self.entries:
+            zip64_fields = []
+            file_size = entry["file_size"]
+            compress_size = entry["compress_size"]
+            header_offset = entry["header_offset"]
+            if file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT:
+                zip64_fields += [file_size, compress_size]
+                file_size = compress_size = ZIP64_LIMIT
+            if header_offset >= ZIP64_LIMIT:
+                zip64_fields.append(header_offset)
+                header_offset = ZIP64_LIMIT
+            extra = b""
+            if zip64_fields:
+                extra = struct.pack(
+                    f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields
+                )
+            version = entry["version"]
+            if zip64_fields:
+                version = max(version, ZIP_VERSION_ZIP64)
+            self._write(struct.pack(
+                "<4sBBHHHHHIIIHHHHHII", b"PK\x01\x02",
+                version, self.create_system, version, entry["flags"], entry["compress_type"],
+                entry["dos_time"], entry["dos_date"], entry["crc"],
+                compress_size, file_size,
+                len(entry["name"]), len(extra), 0, 0, 0,
+                entry["external_attr"], header_offset
+            ))
+            self._write(entry["name"])
+            self._write(extra)
+
+        central_size = self.offset - central_offset
+        count = len(self.entries)
+        if (count > ZIP_FILECOUNT_LIMIT or central_offset >= ZIP64_LIMIT
+                or central_size >= ZIP64_LIMIT):
+            zip64_end_offset = self.offset
+            self._write(struct.pack(
+                "<4sQHHIIQQQQ", b"PK\x06\x06", 44, ZIP_VERSION_ZIP64, ZIP_VERSION_ZIP64,
+                0, 0, count, count, central_size, central_offset
+            ))
+            self._write(struct.pack("<4sIQI", b"PK\x06\x07", 0, zip64_end_offset, 1))
+            count = min(count, ZIP_FILECOUNT_LIMIT)
+            central_size = min(central_size, ZIP64_LIMIT)
+            central_offset = min(central_offset, ZIP64_LIMIT)
+
+        self._write(struct.pack(
+            "<4sHHHHIIH", b"PK\x05\x06", 0, 0, count, count,
+            central_size, central_offset, 0
+        ))
+
+
+def create_zip_archive(source_dir, output_path, archive_options=None, arc_root=None):
+    """创建 ZIP 压缩包
+
+    压缩包内的路径为 arc_root（默认为 source_dir 的目录名）加上文件的相对路径，
+    因此可以直接从构建目录打包，无需先复制到临时目录改名。
+    各成员在线程池中并行压缩，压缩结果按压缩包内路径排序后依次写入，
+    因此成员顺序与单线程写入时一致，也不受文件系统遍历顺序影响。
+    使用去重存储时，同时将压缩包的配方写入存储，之后可由 release_store.py 重新生成。
+    设置了 source_date_epoch（可复现模式）时，所有成员使用该时间戳和规范化的权限位，
+    相同的构建产物总是生成逐字节相同的压缩包。
+    """
+    archive_options = archive_options or {}
+    jobs = archive_options.get("jobs") or 1
+    profile = archive_options.get("compression") or "default"
+    store_dir = archive_options.get("store")
+    source_date_epoch = archive_options.get("source_date_epoch")
+    recipe_members = []
+    arc_root = Path(arc_root or source_dir.name)
+
+    members = []
+    for root, dirs, files in os.walk(source_dir):
+        for file in files:
+            file_path = Path(root) / file
+            arcname = (arc_root / file_path.relative_to(source_dir)).as_posix()
+            members.append((file_path, arcname))
+    members.sort(key=lambda member: member[1])
+
+    target = get_output_target(output_path, source_date_epoch)
+    with open(target, "wb") as raw, ThreadPoolExecutor(max_workers=jobs) as executor:
+        fp = HashingWriter(raw)
+        writer = ParallelZipWriter(fp, reproducible=source_date_epoch is not None)
+        pending = deque()
+        members = iter(members)
+
+        def submit_next():
+            member = next(members, None)
+            if member is not None:
+                file_path, arcname = member
+                pending.append((
+                    file_path, arcname, executor.submit(_compress_member, file_path, profile, store_dir)
+                ))
+
+        # 限制同时在内存中的压缩结果数量，避免大文件占满内存
+        for _ in range(jobs * 2):
+            submit_next()
+
+        while pending:
+            file_path, arcname, future = pending.popleft()
+            crc, file_size, blob, compress_type, blob_digest = future.result()
+            file_stat = file_path.stat()
+            mtime, mode = file_stat.st_mtime, file_stat.st_mode
+            if source_date_epoch is not None:
+                mtime, mode = source_date_epoch, normalize_mode(mode)
+            writer.add(arcname, mtime, mode, crc, file_size, blob, compress_type)
+            if store_dir is not None:
+                recipe_members.append({
+                    "name": arcname, "mtime": mtime, "mode": mode, "crc": crc,
+                    "file_size": file_size, "compress_type": compress_type, "blob": blob_digest,
+                })
+            submit_next()
+
+        writer.close()
+
+    if store_dir is not None:
+        release_store.write_recipe(store_dir, output_path.parent.name[1:], output_path.name, {
+            "type": "zip", "size": writer.offset, "sha256": fp.hexdigest(), "members": recipe_members,
+            "reproducible": writer.reproducible,
+        })
+    if not finish_output(target, output_path, fp.hexdigest()):
+        print(f"      内容与上次打包相同，保留原文件: {output_path.name}")
+    return fp.hexdigest()
+
+
+def _tar_filter(source_date_epoch):
+    """可复现模式下规范化 tar 成员的时间戳、属主和权限位"""
+    if source_date_epoch is None:
+        return None
+
+    def normalize(tarinfo):
+        tarinfo.mtime = source_date_epoch
+        tarinfo.uid = tarinfo.gid = 0
+        tarinfo.uname = tarinfo.gname = ""
+        tarinfo.mode = normalize_mode(tarinfo.mode) & 0o7777
+        return tarinfo
+
+    return normalize
+
+
+def create_tar_archive(source_dir, output_path, archive_format, arc_root=None, source_date_epoch=None):
+    """创建 .tar.xz 或 .tar.zst 压缩包
+
+    tar.zst 优先使用 zstandard 模块，未安装时调用系统的 zstd 命令。
+    tarfile 按文件名排序添加目录中的文件；设置了 source_date_epoch（可复现模式）时，
+    同时规范化各成员的时间戳、属主和权限位，并固定使用 PAX 格式。
+    """
+    arc_root = arc_root or source_dir.name
+    tar_filter = _tar_filter(source_date_epoch)
+    target = get_output_target(output_path, source_date_epoch)
+    if archive_format == "tar.xz":
+        with open(target, "wb") as raw:
+            fp = HashingWriter(raw)
+            with lzma.LZMAFile(fp, "w", preset=9) as xz:
+                with tarfile.open(fileobj=xz, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    tar.add(source_dir, arcname=arc_root, filter=tar_filter)
+        if not finish_output(target, output_path, fp.hexdigest()):
+            print(f"      内容与上次打包相同，保留原文件: {output_path.name}")
+        return True
+
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=19, threads=-1)
+        with open(target, "wb") as raw:
+            fp = HashingWriter(raw)
+            with compressor.stream_writer(fp, closefd=False) as writer:
+                with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    tar.add(source_dir, arcname=arc_root, filter=tar_filter)
+        if not finish_output(target, output_path, fp.hexdigest()):
+            print(f"      内容与上次打包相同，保留原文件: {output_path.name}")
+        return True
+
+    if shutil.which("zstd") is None:
+        print("[错误] 创建 tar.zst 需要安装 zstandard 模块 (pip install zstandard) 或 zstd 命令")
+        return False
+    process = subprocess.Popen(
+        ["zstd", "-q", "-f", "-19", "-T0", "-o", str(target)],
+        stdin=subprocess.PIPE
+    )
+    with tarfile.open(fileobj=process.stdin, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        tar.add(source_dir, arcname=arc_root, filter=tar_filter)
+    process.stdin.close()
+    if process.wait() != 0:
+        return False
+    if target != output_path and not finish_output(target, output_path, hash_file(target)):
+        print(f"      内容与上次打包相同，保留原文件: {output_path.name}")
+    return True
+
+
+def benchmark_compression(project_root, platforms, archive_options):
+    """对当前构建产物测试各压缩配置的耗时和压缩率"""
+    print_section("压缩配置对比")
+    for platform in platforms:
+        if platform not in BUNDLE_SOURCES:
+            continue
+        source_dir = project_root / BUNDLE_SOURCES[platform]
+        if not source_dir.exists():
+            print(f"[跳过] 未找到 {platform} 构建文件: {source_dir}")
+            continue
+
+        original_size = sum(f.stat().st_size for f in source_dir.rglob("*") if f.is_file())
+        print(f"{platform} (原始大小 {original_size / (1024 * 1024):.1f} MB)")
+        print(f"  {'配置':<16}{'耗时':>10}{'大小':>12}{'压缩率':>10}")
+
+        candidates = [(profile, "zip") for profile in COMPRESSION_PROFILES]
+        if platform == "linux":
+            candidates += [(None, "tar.zst"), (None, "tar.xz")]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for profile, archive_format in candidates:
+                output_path = Path(temp_dir) / f"benchmark.{archive_format}"
+                start = time.perf_counter()
+                if archive_format == "zip":
+                    options = dict(archive_options, compression=profile, store=None, source_date_epoch=None)
+                    create_zip_archive(source_dir, output_path, options)
+                elif not create_tar_archive(source_dir, output_path, archive_format):
+                    continue
+                elapsed = time.perf_counter() - start
+                size = output_path.stat().st_size
+                name = f"zip/{profile}" if profile else archive_format
+                ratio = size / original_size * 100 if original_size else 0.0
+                print(f"  {name:<16}{elapsed:>9.2f}s{size / (1024 * 1024):>9.1f} MB{ratio:>9.1f}%")
+                output_path.unlink()
+        print()
+
+
+def store_release_artifacts(store_dir, version_dir, version):
+    """将没有配方的发行产物（APK、安装程序、DMG、tar 包、增量包等）整体存入去重存储
+
+    压缩包在创建时已经写好配方；其余文件移入存储后以硬链接放回版本目录，
+    与之前版本完全相同的文件只保留一份。返回存入的文件数。
+    """
+    recipes = release_store.load_recipes(store_dir, version)
+    count = 0
+    for artifact in list_release_artifacts(version_dir):
+        with _digests_lock:
+            digest = ARTIFACT_DIGESTS.get(artifact.resolve())
+        recipe = recipes.get(artifact.name)
+        if recipe is not None and digest is None:
+            # 本次没有重新打包的产物：与已有配方一致时保留配方（压缩包的配方按成员去重，不能改为整体存储）
+            digest = hash_file(artifact)
+            record_digest(artifact, digest)
+        if recipe is not None and recipe["sha256"] == digest:
+            continue
+        digest = release_store.ingest_file(store_dir, artifact, version, digest)
+        record_digest(artifact, digest)
+        count += 1
+    return count
+
+
+def _link_or_copy(src, dst):
+    """优先创建硬链接，文件系统不支持（或跨设备）时回退为复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def link_tree(source_dir, target_dir):
+    """以硬链接方式构建目录树，保留其中的符号链接"""
+    shutil.copytree(source_dir, target_dir, symlinks=True, copy_function=_link_or_copy)
 
 
-def package_windows(project_root, version_dir, version):
+def package_windows(project_root, version_dir, version, archive_options):
     """打包 Windows 便携版"""
     print_section("打包 Windows 便携版")
 
-    win_source = project_root / "build" / "windows" / "x64" / "runner" / "Release"
+    win_source = project_root / BUNDLE_SOURCES["windows"]
     package_name = f"StepUp_v{version}_windows_portable"
-    package_dir = version_dir / package_name
 
     if not (win_source / "stepup_app.exe").exists():
         print("[错误] 未找到 Windows 构建文件！")
         print(f"       请先运行: python build.py {version}")
         return False
 
-    # 复制文件
-    print("[1/2] 复制文件...")
-    if package_dir.exists():
-        shutil.rmtree(package_dir)
-    shutil.copytree(win_source, package_dir)
-    print("      文件复制完成")
-
-    # 创建压缩包
-    print("[2/2] 创建压缩包...")
+    # 直接从构建目录创建压缩包
+    print("[1/1] 创建压缩包...")
     zip_path = version_dir / f"{package_name}.zip"
-    create_zip_archive(package_dir, zip_path)
+    with timed("compress windows", "windows"):
+        create_zip_archive(win_source, zip_path, archive_options, package_name)
     print(f"      压缩包创建完成: {package_name}.zip")
-
-    # 清理临时目录
-    shutil.rmtree(package_dir)
     print()
     return True
 
 
-def package_macos(project_root, version_dir, version):
+def package_macos(project_root, version_dir, version, archive_options):
     """打包 macOS 版本"""
     print_section("打包 macOS 版本")
 
@@ -106,23 +821,45 @@ def package_macos(project_root, version_dir, version):
         print("[跳过] macOS 打包需要在 macOS 系统上运行")
         return True
 
-    macos_source = project_root / "build" / "macos" / "Build" / "Products" / "Release"
-    app_name = "StepUp.app"
+    app_source = project_root / BUNDLE_SOURCES["macos"]
+    app_name = app_source.name
     package_name = f"StepUp_v{version}_macos"
     package_dir = version_dir / package_name
 
-    if not (macos_source / app_name).exists():
+    if not app_source.exists():
         print("[错误] 未找到 macOS 构建文件！")
         print(f"       请先运行: python build.py {version}")
         return False
 
-    # 复制文件
-    print("[1/3] 复制文件...")
+    dmg_path = version_dir / f"{package_name}.dmg"
+    zip_path = version_dir / f"{package_name}.zip"
+    app_arc_root = f"{package_name}/{app_name}"
+
+    # 检查是否有 create-dmg 工具
+    result = subprocess.run(
+        ["which", "create-dmg"],
+        capture_output=True,
+        text=True
+    )
+
+    if result.returncode != 0:
+        # 没有 create-dmg 时直接从构建目录创建 ZIP 压缩包
+        print("[1/1] 创建 ZIP 压缩包...")
+        with timed("compress macos", "macos"):
+            create_zip_archive(app_source, zip_path, archive_options, app_arc_root)
+        print(f"      ZIP 创建完成: {package_name}.zip")
+        print()
+        return True
+
+    # create-dmg 需要一个包含应用和 Applications 快捷方式的目录，
+    # 这里用硬链接搭建，不复制文件内容
+    print("[1/3] 准备 DMG 目录...")
     if package_dir.exists():
         shutil.rmtree(package_dir)
     package_dir.mkdir(parents=True, exist_ok=True)
-    shutil.copytree(macos_source / app_name, package_dir / app_name)
-    print("      文件复制完成")
+    with timed("stage macos", "macos"):
+        link_tree(app_source, package_dir / app_name)
+    print("      目录准备完成")
 
     # 创建 Applications 快捷方式（符号链接）
     print("[2/3] 创建 Applications 快捷方式...")
@@ -132,23 +869,10 @@ def package_macos(project_root, version_dir, version):
     except OSError:
         print("      [警告] 无法创建 Applications 快捷方式")
 
-    # 创建 DMG 或 ZIP 压缩包
-    print("[3/3] 创建压缩包...")
-    
-    # 尝试创建 DMG（如果可用）
-    dmg_path = version_dir / f"{package_name}.dmg"
-    zip_path = version_dir / f"{package_name}.zip"
-    
-    # 检查是否有 create-dmg 工具
-    result = subprocess.run(
-        ["which", "create-dmg"],
-        capture_output=True,
-        text=True
-    )
-    
-    if result.returncode == 0:
-        # 使用 create-dmg 创建 DMG
-        print("      使用 create-dmg 创建 DMG...")
+    # 使用 create-dmg 创建 DMG
+    print("[3/3] 使用 create-dmg 创建 DMG...")
+    unlink_existing(dmg_path)
+    with timed("compress macos", "macos"):
         dmg_result = subprocess.run(
             [
                 "create-dmg",
@@ -168,21 +892,16 @@ def package_macos(project_root, version_dir, version):
             print(f"      DMG 创建完成: {package_name}.dmg")
         else:
             print(f"      DMG 创建失败，回退到 ZIP: {dmg_result.stderr}")
-            create_zip_archive(package_dir, zip_path)
+            create_zip_archive(app_source, zip_path, archive_options, app_arc_root)
             print(f"      ZIP 创建完成: {package_name}.zip")
-    else:
-        # 创建 ZIP 压缩包
-        print("      创建 ZIP 压缩包...")
-        create_zip_archive(package_dir, zip_path)
-        print(f"      ZIP 创建完成: {package_name}.zip")
 
-    # 清理临时目录
+    # 清理临时目录（只删除硬链接，不影响构建目录）
     shutil.rmtree(package_dir)
     print()
     return True
 
 
-def package_linux(project_root, version_dir, version):
+def package_linux(project_root, version_dir, version, archive_options):
     """打包 Linux 版本"""
     print_section("打包 Linux 版本")
 
@@ -191,39 +910,34 @@ def package_linux(project_root, version_dir, version):
         print("[跳过] Linux 打包需要在 Linux 系统上运行")
         return True
 
-    linux_source = project_root / "build" / "linux" / "x64" / "release" / "bundle"
+    linux_source = project_root / BUNDLE_SOURCES["linux"]
     package_name = f"StepUp_v{version}_linux"
-    package_dir = version_dir / package_name
 
     if not (linux_source / "stepup_app").exists():
         print("[错误] 未找到 Linux 构建文件！")
         print(f"       请先运行: python build.py {version}")
         return False
 
-    # 复制文件
-    print("[1/2] 复制文件...")
-    if package_dir.exists():
-        shutil.rmtree(package_dir)
-    shutil.copytree(linux_source, package_dir)
-    print("      文件复制完成")
-
-    # 创建压缩包
-    print("[2/2] 创建压缩包...")
-    zip_path = version_dir / f"{package_name}.zip"
-    create_zip_archive(package_dir, zip_path)
-    print(f"      压缩包创建完成: {package_name}.zip")
-
-    # 清理临时目录
-    shutil.rmtree(package_dir)
+    # 直接从构建目录创建压缩包
+    print("[1/1] 创建压缩包...")
+    archive_format = archive_options.get("linux_format") or "zip"
+    archive_path = version_dir / f"{package_name}.{archive_format}"
+    with timed("compress linux", "linux"):
+        if archive_format == "zip":
+            create_zip_archive(linux_source, archive_path, archive_options, package_name)
+        elif not create_tar_archive(
+                linux_source, archive_path, archive_format, package_name, archive_options.get("source_date_epoch")):
+            return False
+    print(f"      压缩包创建完成: {archive_path.name}")
     print()
     return True
 
 
-def package_web(project_root, version_dir, version):
+def package_web(project_root, version_dir, version, archive_options):
     """打包 Web 版本"""
     print_section("打包 Web 版本")
 
-    web_source = project_root / "build" / "web"
+    web_source = project_root / BUNDLE_SOURCES["web"]
     package_name = f"StepUp_v{version}_web"
 
     if not web_source.exists():
@@ -231,30 +945,72 @@ def package_web(project_root, version_dir, version):
         print(f"       请先运行: python build.py {version}")
         return False
 
+    if archive_options.get("web_postprocess"):
+        # 在硬链接搭建的副本上处理，构建目录和构建缓存保持不变
+        print("[1/2] 内容指纹和预压缩...")
+        web_release = project_root / WEB_RELEASE_DIR
+        if web_release.exists():
+            shutil.rmtree(web_release)
+        with timed("web postprocess", "web"):
+            link_tree(web_source, web_release)
+            result = web_assets.process_web_release(web_release, archive_options["jobs"])
+        for name, new_name in result["renamed"].items():
+            print(f"      {name} -> {new_name}")
+        if result["service_worker_updated"]:
+            print(f"      已更新 {web_assets.SERVICE_WORKER_FILE} 中 {result['service_worker_updated']} 个文件的哈希")
+        print(
+            f"      预压缩 {result['precompressed']} 个文件"
+            f"（{'gzip、brotli' if web_assets.brotli is not None else 'gzip'}，"
+            f"共 {result['precompressed_size'] / (1024 * 1024):.1f} MB）"
+        )
+        print(f"      发布目录: {WEB_RELEASE_DIR}（含 {web_assets.HEADERS_FILE}、{web_assets.EDGEONE_FILE}）")
+        web_source = web_release
+        step, total = 2, 2
+    else:
+        step, total = 1, 1
+
     # 创建压缩包
-    print("[1/1] 创建压缩包...")
+    print(f"[{step}/{total}] 创建压缩包...")
     zip_path = version_dir / f"{package_name}.zip"
-    create_zip_archive(web_source, zip_path)
+    with timed("compress web", "web"):
+        create_zip_archive(web_source, zip_path, archive_options, BUNDLE_SOURCES["web"].name)
     print(f"      压缩包创建完成: {package_name}.zip")
     print()
     return True
 
 
+def find_android_outputs(project_root, version):
+    """查找 Android 构建产物，返回 [(源文件, 发行文件名)]"""
+    outputs_dir = project_root / "build" / "app" / "outputs"
+    found = []
+    universal = outputs_dir / "flutter-apk" / "app-release.apk"
+    if universal.exists():
+        found.append((universal, f"StepUp_v{version}_android.apk"))
+    # --split-per-abi 生成的 app-<ABI>-release.apk
+    for apk in sorted((outputs_dir / "flutter-apk").glob("app-*-release.apk")):
+        abi = apk.name[len("app-"):-len("-release.apk")]
+        found.append((apk, f"StepUp_v{version}_android_{abi}.apk"))
+    bundle = outputs_dir / "bundle" / "release" / "app-release.aab"
+    if bundle.exists():
+        found.append((bundle, f"StepUp_v{version}_android.aab"))
+    return found
+
+
 def package_android(project_root, version_dir, version):
-    """打包 Android 版本"""
+    """打包 Android 版本（包含所有 ABI 的 APK、按 ABI 拆分的 APK、App Bundle 中已构建的部分）"""
     print_section("打包 Android 版本")
 
-    apk_source = project_root / "build" / "app" / "outputs" / "flutter-apk" / "app-release.apk"
-    apk_name = f"StepUp_v{version}_android.apk"
-
-    if not apk_source.exists():
+    outputs = find_android_outputs(project_root, version)
+    if not outputs:
         print("[错误] 未找到 Android APK 文件！")
         print(f"       请先运行: python build.py {version}")
         return False
 
-    print("[1/1] 复制 APK 文件...")
-    shutil.copy2(apk_source, version_dir / apk_name)
-    print(f"      APK 复制完成: {apk_name}")
+    print(f"[1/1] 复制 {len(outputs)} 个 Android 文件...")
+    with timed("copy android", "android"):
+        for source, name in outputs:
+            copy_with_digest(source, version_dir / name)
+            print(f"      复制完成: {name} ({source.stat().st_size / (1024 * 1024):.1f} MB)")
     print()
     return True
 
@@ -278,14 +1034,15 @@ def package_installer(project_root, version_dir, version):
     # 编译安装程序
     print("[2/2] 编译安装程序...")
     installer_dir = project_root / "installer"
-    result = subprocess.run(
-        [str(iscc_path), "setup.iss"],
-        cwd=installer_dir,
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='ignore'
-    )
+    with timed("installer compile", "windows"):
+        result = subprocess.run(
+            [str(iscc_path), "setup.iss"],
+            cwd=installer_dir,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='ignore'
+        )
     if result.returncode != 0:
         print("[错误] 安装程序编译失败！")
         return False
@@ -296,12 +1053,44 @@ def package_installer(project_root, version_dir, version):
     installer_name = f"StepUp_v{version}_windows_installer.exe"
 
     if installer_source.exists():
-        shutil.copy2(installer_source, version_dir / installer_name)
+        copy_with_digest(installer_source, version_dir / installer_name)
         print(f"      安装程序已复制: {installer_name}")
     print()
     return True
 
 
+def package_deltas(project_root, version_dir, version, platforms):
+    """生成相对上一个发行版本的增量包"""
+    print_section("生成增量包")
+
+    previous = delta.find_previous_release(project_root / "releases", version)
+    if previous is None:
+        print("[跳过] 未找到更早的发行版本")
+        print()
+        return True
+
+    print(f"[信息] 基准版本: {previous}")
+    for platform, suffix in DELTA_ARCHIVES.items():
+        if platform not in platforms:
+            continue
+        old_archive = project_root / "releases" / f"v{previous}" / f"StepUp_v{previous}_{suffix}.zip"
+        new_archive = version_dir / f"StepUp_v{version}_{suffix}.zip"
+        if not old_archive.exists() or not new_archive.exists():
+            print(f"      [跳过] {platform}: 缺少 {old_archive.name if not old_archive.exists() else new_archive.name}")
+            continue
+
+        delta_path = version_dir / f"StepUp_v{previous}_to_v{version}_{suffix}_delta.zip"
+        unlink_existing(delta_path)
+        with timed(f"delta {platform}", platform):
+            manifest = delta.create_delta(old_archive, new_archive, delta_path)
+        size = delta_path.stat().st_size / (1024 * 1024)
+        full_size = new_archive.stat().st_size / (1024 * 1024)
+        print(f"      {delta_path.name} ({size:.1f} MB，完整包 {full_size:.1f} MB)")
+        print(f"      {delta.summarize(manifest)}")
+    print()
+    return True
+
+
 def get_platforms_to_package():
     """根据当前系统确定默认打包平台"""
     system = sys_platform.system()
@@ -326,6 +1115,15 @@ def parse_arguments():
   python package.py 1.2.5 --platforms=macos
   python package.py 1.2.5 --platforms=windows,android,macos
   python package.py 1.2.5 --all-platforms
+  python package.py 1.2.5 --jobs=4
+  python package.py 1.2.5 --compression=max --linux-format=tar.zst
+  python package.py 1.2.5 --benchmark-compression
+  python package.py 1.2.5 --delta
+  python package.py 1.2.5 --store
+  python package.py 1.2.5 --check-budgets
+  python package.py 1.2.5 --platforms=web --web-postprocess
+  python package.py 1.2.5 --reproducible
+  SOURCE_DATE_EPOCH=1700000000 python package.py 1.2.5
         """
     )
     parser.add_argument("version", help="版本号 (格式: x.x.x)")
@@ -339,21 +1137,71 @@ def parse_arguments():
         help="打包所有支持的平台",
         action="store_true"
     )
+    parser.add_argument(
+        "--jobs",
+        help="并行压缩使用的线程数 (默认: CPU 核心数)",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--compression",
+        help="ZIP 压缩配置 (store,fast,default,max,lzma,bzip2，默认: default)",
+        choices=list(COMPRESSION_PROFILES),
+        default="default"
+    )
+    parser.add_argument(
+        "--linux-format",
+        help="Linux 版本压缩包格式 (zip,tar.zst,tar.xz，默认: zip)",
+        choices=LINUX_ARCHIVE_FORMATS,
+        default="zip"
+    )
+    parser.add_argument(
+        "--delta",
+        help="生成相对上一个发行版本的增量包 (Windows 便携版、Linux)",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--store",
+        help="将发行产物写入 releases/.store/ 去重存储，相同内容只保存一份",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--web-postprocess",
+        help="Web 版本打包前做内容指纹、预压缩和缓存头处理（默认直接打包构建目录）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--reproducible",
+        help="可复现模式：固定成员顺序、时间戳（SOURCE_DATE_EPOCH 或最近一次 git 提交时间）和权限位，"
+             "相同的构建产物生成相同的压缩包（设置 SOURCE_DATE_EPOCH 时自动启用）",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--check-budgets",
+        help="按 scripts/size_budgets.json 检查产物体积预算，超出时打包失败",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--benchmark-compression",
+        help="对当前构建产物测试各压缩配置的耗时和大小，不生成发行文件",
+        action="store_true"
+    )
+    batch.add_arguments(parser)
     return parser.parse_args()
 
 
 def main():
-    print_header("StepUp 打包脚本")
-
     # 解析参数
     args = parse_arguments()
     version = args.version
+    batch.configure(args, "package", version)
+
+    print_header("StepUp 打包脚本")
 
     # 验证版本号
     if not validate_version(version):
         print("[错误] 版本号格式不正确，请使用 x.x.x 格式，例如: 1.2.5")
-        input("\n按回车键退出...")
-        sys.exit(1)
+        batch.fail(batch.EXIT_USAGE)
 
     # 确定要打包的平台
     if args.all_platforms:
@@ -370,65 +1218,83 @@ def main():
 
     version_dir = project_root / "releases" / f"v{version}"
     version_dir.mkdir(parents=True, exist_ok=True)
+    archive_options = get_archive_options(args, project_root)
 
     print(f"[信息] 版本号: {version}")
     print(f"[信息] 输出目录: {version_dir}")
     print(f"[信息] 打包平台: {', '.join(platforms)}")
+    print(f"[信息] 压缩线程: {archive_options['jobs']}")
+    print(f"[信息] 压缩配置: {archive_options['compression']}")
+    if archive_options["source_date_epoch"] is not None:
+        print(f"[信息] 可复现模式: SOURCE_DATE_EPOCH={archive_options['source_date_epoch']}")
     print(f"[信息] 当前系统: {sys_platform.system()}")
     print()
 
+    if args.benchmark_compression:
+        benchmark_compression(project_root, platforms, archive_options)
+        batch.finish()
+
     # 打包各平台
     package_results = {}
 
     if "windows" in platforms:
-        package_results["windows"] = package_windows(project_root, version_dir, version)
+        package_results["windows"] = package_windows(project_root, version_dir, version, archive_options)
         if not package_results["windows"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
 
     if "android" in platforms:
         package_results["android"] = package_android(project_root, version_dir, version)
         if not package_results["android"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
 
     if "macos" in platforms:
-        package_results["macos"] = package_macos(project_root, version_dir, version)
+        package_results["macos"] = package_macos(project_root, version_dir, version, archive_options)
         if not package_results["macos"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
 
     if "linux" in platforms:
-        package_results["linux"] = package_linux(project_root, version_dir, version)
+        package_results["linux"] = package_linux(project_root, version_dir, version, archive_options)
         if not package_results["linux"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
 
     if "web" in platforms:
-        package_results["web"] = package_web(project_root, version_dir, version)
+        package_results["web"] = package_web(project_root, version_dir, version, archive_options)
         if not package_results["web"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
 
     if "installer" in platforms:
         package_results["installer"] = package_installer(project_root, version_dir, version)
         if not package_results["installer"]:
-            input("\n按回车键退出...")
-            sys.exit(1)
+            batch.fail(batch.EXIT_PACKAGE)
+
+    if args.delta:
+        package_deltas(project_root, version_dir, version, platforms)
+
+    if archive_options["store"] is not None:
+        with timed("store"):
+            stored = store_release_artifacts(archive_options["store"], version_dir, version)
+        count, total = release_store.store_size(archive_options["store"])
+        print(f"[信息] 去重存储: 新存入 {stored} 个文件，存储共 {total / (1024 * 1024):.1f} MB")
+        print()
 
     # 完成
     print_header("打包完成！")
     print(f"版本号: {version}")
     print(f"输出目录: {version_dir}")
     print()
-    print("生成的文件:")
-    for file in version_dir.iterdir():
-        if file.is_file():
-            size = file.stat().st_size / (1024 * 1024)
-            print(f"  {file.name} ({size:.1f} MB)")
-    print()
-
-    input("按回车键退出...")
+    manifest = summarize_release(version_dir, version, archive_options["jobs"])
+    violations = report_sizes(project_root, version, args.check_budgets)
+    release_timing.print_summary()
+    release_timing.save_history(project_root, version, "package")
+
+    batch.SUMMARY["results"] = package_results
+    batch.SUMMARY["artifacts"] = [
+        dict(artifact, path=str(version_dir / artifact["file"])) for artifact in manifest["artifacts"]
+    ]
+    if violations:
+        batch.SUMMARY["budget_violations"] = violations
+        batch.fail(batch.EXIT_BUDGET)
+    batch.finish(prompt="按回车键退出...")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 构建流水线调度
+
+流水线由若干任务组成，每个任务声明它依赖的任务和独占使用的资源。
+调度器在线程池中执行任务：依赖全部成功后任务即可开始，
+占用相同资源（如 Gradle、CMake）的任务不会同时运行（资源被占用的任务不会占用线程等待）；
+多个任务可以开始时优先执行依赖链更深的下游任务（如已构建平台的打包），再开始新的上游任务（如下一个平台的构建）；
+依赖失败或被跳过的任务不会执行。
+
+提供检查点时，每个任务完成后将其输入指纹写入检查点文件；
+恢复运行时，已完成且指纹未变化的任务直接跳过。
+"""
+
+import sys
+import os
+import json
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ThreadOutput:
+    """线程安全的按行输出
+
+    并行执行时多个线程同时打印日志，每个线程的输出先在各自的缓冲区中
+    拼成完整的行，再整行写出，避免不同任务的日志在一行内交错。
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        ident = threading.get_ident()
+        buffered = self.buffers.get(ident, "") + text
+        lines, newline, rest = buffered.rpartition("\n")
+        self.buffers[ident] = rest
+        if newline:
+            with self.lock:
+                self.stream.write(lines + newline)
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Task:
+    """流水线中的一个任务
+
+    fingerprint 为返回任务输入（及产物）指纹的函数，返回 None 表示无法判断、
+    不能跳过；未提供时该任务在恢复运行时总会重新执行。
+    """
+
+    def __init__(self, name, func, deps=(), resources=(), fingerprint=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.resources = set(resources)
+        self.fingerprint = fingerprint
+
+
+class Checkpoint:
+    """流水线检查点
+
+    记录每个任务的完成状态和完成时的指纹，每次更新后立即写入文件，
+    进程中途退出也不会丢失已完成任务的记录。
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {"tasks": {}}
+        if resume:
+            try:
+                self.state = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                pass
+
+    def is_complete(self, name, fingerprint):
+        """任务是否已完成且指纹未变化"""
+        entry = self.state["tasks"].get(name)
+        return (
+            fingerprint is not None and entry is not None
+            and entry.get("status") == "done" and entry.get("fingerprint") == fingerprint
+        )
+
+    def record(self, name, success, fingerprint=None):
+        """记录任务结果"""
+        with self.lock:
+            self.state["tasks"][name] = {
+                "status": "done" if success else "failed",
+                "fingerprint": fingerprint,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            temp_path.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(temp_path, self.path)
+
+
+def check_tasks(tasks):
+    """检查依赖是否都存在、是否有循环依赖"""
+    names = {task.name for task in tasks}
+    for task in tasks:
+        missing = [dep for dep in task.deps if dep not in names]
+        if missing:
+            raise ValueError(f"任务 {task.name} 依赖的任务不存在: {', '.join(missing)}")
+
+    done = set()
+    remaining = list(tasks)
+    while remaining:
+        ready = [task for task in remaining if all(dep in done for dep in task.deps)]
+        if not ready:
+            raise ValueError(f"任务存在循环依赖: {', '.join(task.name for task in remaining)}")
+        for task in ready:
+            done.add(task.name)
+            remaining.remove(task)
+
+
+def get_depths(tasks):
+    """各任务在依赖图中的深度：没有依赖的任务为 0，其余为依赖的最大深度加 1"""
+    depths = {}
+    remaining = list(tasks)
+    while remaining:
+        for task in list(remaining):
+            if all(dep in depths for dep in task.deps):
+                depths[task.name] = max((depths[dep] + 1 for dep in task.deps), default=0)
+                remaining.remove(task)
+    return depths
+
+
+def _run_task(task, checkpoint=None):
+    try:
+        if checkpoint is not None and task.fingerprint is not None:
+            if checkpoint.is_complete(task.name, task.fingerprint()):
+                print(f"[恢复] {task.name} 已完成且输入未变化，跳过")
+                return True
+        result = bool(task.func())
+    except Exception as e:
+        print(f"[错误] {task.name} 出现异常: {e}")
+        result = False
+
+    if checkpoint is not None:
+        fingerprint = None
+        if result and task.fingerprint is not None:
+            try:
+                fingerprint = task.fingerprint()
+            except Exception:
+                pass
+        checkpoint.record(task.name, result, fingerprint)
+    return result
+
+
+def run_pipeline(tasks, jobs, checkpoint=None):
+    """按依赖关系调度执行任务
+
+    最多同时运行 jobs 个任务，jobs 不大于 1 时依次执行。
+    可以开始的任务中优先选择依赖图中更深的任务，深度相同时按声明顺序。
+    返回 {任务名: 结果}，结果为 True（成功）、False（失败）或 None（因依赖未成功而跳过）。
+    """
+    check_tasks(tasks)
+    results = {}
+    depths = get_depths(tasks)
+    pending = sorted(tasks, key=lambda task: -depths[task.name])
+
+    def take_ready(busy):
+        """取出可以开始的任务；依赖未成功的任务标记为跳过"""
+        for task in list(pending):
+            failed = [dep for dep in task.deps if dep in results and not results[dep]]
+            if failed:
+                pending.remove(task)
+                results[task.name] = None
+                print(f"[跳过] {task.name}: 依赖的 {', '.join(failed)} 未成功")
+                continue
+            if all(dep in results for dep in task.deps) and not task.resources & busy:
+                pending.remove(task)
+                return task
+        return None
+
+    if jobs <= 1:
+        while pending:
+            task = take_ready(set())
+            if task is not None:
+                results[task.name] = _run_task(task, checkpoint)
+                print()
+        return results
+
+    output = ThreadOutput(sys.stdout)
+    sys.stdout = output
+
+    running = {}
+    busy = set()
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while pending or running:
+                while len(running) < jobs:
+                    task = take_ready(busy)
+                    if task is None:
+                        break
+                    busy |= task.resources
+                    print(f"[调度] 开始 {task.name}")
+                    running[executor.submit(_run_task, task, checkpoint)] = task
+
+                if not running:
+                    # 剩余任务都已被跳过
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    busy -= task.resources
+                    results[task.name] = future.result()
+                    print(f"[调度] {task.name} {'完成' if results[task.name] else '失败'}")
+    finally:
+        sys.stdout = output.stream
+    print()
+    return results
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 发行产物去重存储
+用法: python release_store.py status
+       python release_store.py materialize [版本号] [--output=目录]
+       python release_store.py evict [版本号]
+       python release_store.py gc [--keep=N]
+
+package.py 使用 --store 时，发行产物会写入 releases/.store/ 中按内容寻址的存储：
+  objects/<sha256 前两位>/<sha256>   数据块：压缩包成员压缩后的数据，或整个文件
+  members/<键前两位>/<键>.json        成员索引：原始内容摘要 + 压缩方法 -> 数据块，相同内容不再重复压缩
+  recipes/v{版本号}/<产物名>.json     产物配方：由哪些数据块按什么顺序组成
+
+引擎 DLL、ICU 数据、字体等在各版本之间完全相同的文件只保存一份。
+压缩包可以随时从配方重新生成（materialize），因此旧版本的压缩包可以删除（evict）；
+APK、安装程序等整体保存的文件以硬链接的形式放在版本目录中，不占用额外空间。
+gc 删除不再保留的版本的配方，以及没有任何配方引用的数据块。
+"""
+
+import sys
+import os
+import re
+import json
+import hashlib
+import tempfile
+import argparse
+from pathlib import Path
+
+
+STORE_DIR_NAME = ".store"
+
+
+def get_store_dir(project_root):
+    """获取存储目录"""
+    return project_root / "releases" / STORE_DIR_NAME
+
+
+def _atomic_write(path, data):
+    """先写入临时文件再重命名，保证并发写入时不会读到不完整的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def object_path(store_dir, digest):
+    """数据块的存储路径"""
+    return store_dir / "objects" / digest[:2] / digest
+
+
+def put_object(store_dir, data):
+    """保存数据块，已存在时不再写入，返回其 SHA-256"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(store_dir, digest)
+    if not path.exists():
+        _atomic_write(path, data)
+    return digest
+
+
+def read_object(store_dir, digest):
+    """读取数据块"""
+    return object_path(store_dir, digest).read_bytes()
+
+
+def member_key(content_digest, compress_type, level):
+    """压缩包成员的索引键：原始内容摘要加上压缩方法和级别"""
+    return f"{content_digest}-{compress_type}-{level}"
+
+
+def get_member(store_dir, key):
+    """查找已压缩过的成员，返回索引信息，不存在时返回 None"""
+    path = store_dir / "members" / key[:2] / f"{key}.json"
+    try:
+        member = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return member if object_path(store_dir, member["blob"]).exists() else None
+
+
+def put_member(store_dir, key, blob, crc, file_size, compress_type):
+    """保存压缩后的成员数据，返回索引信息"""
+    member = {
+        "blob": put_object(store_dir, blob),
+        "crc": crc,
+        "file_size": file_size,
+        "compress_type": compress_type,
+    }
+    path = store_dir / "members" / key[:2] / f"{key}.json"
+    _atomic_write(path, json.dumps(member).encode("utf-8"))
+    return member
+
+
+def recipe_dir(store_dir, version):
+    return store_dir / "recipes" / f"v{version}"
+
+
+def write_recipe(store_dir, version, artifact_name, recipe):
+    """保存产物配方"""
+    path = recipe_dir(store_dir, version) / f"{artifact_name}.json"
+    _atomic_write(path, json.dumps(recipe, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def load_recipes(store_dir, version):
+    """读取某个版本的全部配方，返回 {产物名: 配方}"""
+    recipes = {}
+    for path in sorted(recipe_dir(store_dir, version).glob("*.json")):
+        recipes[path.name[:-len(".json")]] = json.loads(path.read_text(encoding="utf-8"))
+    return recipes
+
+
+def _link_or_copy(source, target):
+    """创建硬链接，文件系统不支持时回退为复制"""
+    try:
+        os.link(source, target)
+    except OSError:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                dst.write(chunk)
+
+
+def ingest_file(store_dir, path, version, digest=None):
+    """将发行目录中的文件整体存入存储，并以硬链接替换原文件
+
+    文件移动（重命名）到存储中，不复制数据；相同内容已存在时直接删除原文件。
+    """
+    path = Path(path)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+    target = object_path(store_dir, digest)
+    size = path.stat().st_size
+    if target.exists():
+        path.unlink()
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError:
+            _link_or_copy(path, target)
+            path.unlink()
+        os.chmod(target, 0o444)
+    _link_or_copy(target, path)
+
+    write_recipe(store_dir, version, path.name, {"type": "file", "size": size, "sha256": digest})
+    return digest
+
+
+def materialize_artifact(store_dir, recipe, output_path):
+    """根据配方重新生成产物，并校验 SHA-256"""
+    if recipe["type"] == "file":
+        _link_or_copy(object_path(store_dir, recipe["sha256"]), output_path)
+        return True
+
+    # 压缩包使用与 package.py 相同的写入器，按配方中的顺序写入已压缩的成员数据
+    from package import ParallelZipWriter, HashingWriter
+
+    with open(output_path, "wb") as raw:
+        fp = HashingWriter(raw)
+        writer = ParallelZipWriter(fp, reproducible=recipe.get("reproducible", False))
+        for member in recipe["members"]:
+            writer.add(
+                member["name"], member["mtime"], member["mode"], member["crc"],
+                member["file_size"], read_object(store_dir, member["blob"]), member["compress_type"]
+            )
+        writer.close()
+    if fp.hexdigest() != recipe["sha256"]:
+        output_path.unlink()
+        return False
+    return True
+
+
+def referenced_objects(store_dir):
+    """收集所有配方引用的数据块"""
+    referenced = set()
+    for path in (store_dir / "recipes").glob("v*/*.json"):
+        recipe = json.loads(path.read_text(encoding="utf-8"))
+        if recipe["type"] == "file":
+            referenced.add(recipe["sha256"])
+        else:
+            referenced.update(member["blob"] for member in recipe["members"])
+    return referenced
+
+
+def version_key(version):
+    return tuple(int(part) for part in version.split("."))
+
+
+def list_store_versions(store_dir):
+    """列出存储中有配方的版本"""
+    versions = [
+        path.name[1:] for path in (store_dir / "recipes").glob("v*")
+        if re.match(r"^v\d+\.\d+\.\d+$", path.name)
+    ]
+    return sorted(versions, key=version_key)
+
+
+def collect_garbage(store_dir, releases_dir, keep=None):
+    """删除不再保留的版本的配方，以及未被引用的数据块和成员索引
+
+    保留的版本：releases/ 下仍存在版本目录的版本；指定 keep 时只保留其中最新的 keep 个。
+    返回 (删除的版本, 删除的数据块数, 释放的字节数)。
+    """
+    versions = list_store_versions(store_dir)
+    retained = [v for v in versions if (releases_dir / f"v{v}").is_dir()]
+    if keep is not None:
+        retained = retained[-keep:] if keep > 0 else []
+
+    dropped = [v for v in versions if v not in retained]
+    for version in dropped:
+        directory = recipe_dir(store_dir, version)
+        for path in directory.glob("*.json"):
+            path.unlink()
+        directory.rmdir()
+
+    referenced = referenced_objects(store_dir)
+    removed = 0
+    freed = 0
+    for path in (store_dir / "objects").glob("*/*"):
+        if path.name not in referenced and not path.name.startswith(".tmp-"):
+            freed += path.stat().st_size
+            os.chmod(path, 0o644)
+            path.unlink()
+            removed += 1
+    for path in (store_dir / "members").glob("*/*.json"):
+        try:
+            member = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            member = {}
+        if member.get("blob") not in referenced:
+            path.unlink()
+    return dropped, removed, freed
+
+
+def store_size(store_dir):
+    """统计存储中的数据块数量和总大小"""
+    count = 0
+    total = 0
+    for path in (store_dir / "objects").glob("*/*"):
+        count += 1
+        total += path.stat().st_size
+    return count, total
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 发行产物去重存储",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python release_store.py status
+  python release_store.py materialize 1.2.5
+  python release_store.py evict 1.2.4
+  python release_store.py gc --keep=5
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="查看存储占用情况")
+
+    materialize_parser = subparsers.add_parser("materialize", help="从存储重新生成某个版本的发行产物")
+    materialize_parser.add_argument("version", help="版本号 (格式: x.x.x)")
+    materialize_parser.add_argument("--output", help="输出目录 (默认: releases/v{版本号})", default=None)
+
+    evict_parser = subparsers.add_parser("evict", help="删除某个版本中可从存储重新生成的压缩包")
+    evict_parser.add_argument("version", help="版本号 (格式: x.x.x)")
+
+    gc_parser = subparsers.add_parser("gc", help="清理不再保留的版本和未引用的数据块")
+    gc_parser.add_argument("--keep", help="只保留最新的 N 个版本", type=int, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    project_root = Path(__file__).parent.resolve().parent
+    releases_dir = project_root / "releases"
+    store_dir = get_store_dir(project_root)
+    sys.path.insert(0, str(Path(__file__).parent.resolve()))
+
+    if args.command == "status":
+        count, total = store_size(store_dir)
+        versions = list_store_versions(store_dir)
+        print(f"存储目录: {store_dir}")
+        print(f"版本: {', '.join(versions) if versions else '无'}")
+        print(f"数据块: {count} 个，共 {total / (1024 * 1024):.1f} MB")
+
+    elif args.command == "materialize":
+        recipes = load_recipes(store_dir, args.version)
+        if not recipes:
+            print(f"[错误] 存储中没有 v{args.version} 的配方")
+            sys.exit(1)
+        output_dir = Path(args.output) if args.output else releases_dir / f"v{args.version}"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for name, recipe in recipes.items():
+            output_path = output_dir / name
+            if output_path.exists():
+                print(f"  [已存在] {name}")
+                continue
+            if not materialize_artifact(store_dir, recipe, output_path):
+                print(f"[错误] {name} 校验失败")
+                sys.exit(1)
+            print(f"  [已生成] {name}")
+
+    elif args.command == "evict":
+        recipes = load_recipes(store_dir, args.version)
+        version_dir = releases_dir / f"v{args.version}"
+        freed = 0
+        for name, recipe in recipes.items():
+            path = version_dir / name
+            if recipe["type"] == "zip" and path.exists():
+                freed += path.stat().st_size
+                path.unlink()
+                print(f"  [已删除] {name}")
+        print(f"释放 {freed / (1024 * 1024):.1f} MB，可使用 materialize 重新生成")
+
+    else:
+        dropped, removed, freed = collect_garbage(store_dir, releases_dir, args.keep)
+        print(f"删除的版本: {', '.join(dropped) if dropped else '无'}")
+        print(f"删除的数据块: {removed} 个，释放 {freed / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 构建打包耗时记录与趋势报告
+用法: python release_timing.py [版本号] [--last=N] [--threshold=百分比]
+示例: python release_timing.py 1.2.5
+       python release_timing.py 1.2.5 --last=3 --threshold=30
+
+build.py、package.py 和 build_and_package.py 在运行过程中通过 record()/timed()
+记录各阶段耗时和产物大小，结束时调用 save_history() 写入：
+  releases/v{版本号}/timings.json   本版本最近一次运行的记录（按来源脚本分别覆盖）
+  releases/timing_history.jsonl     所有运行的追加记录，用于长期趋势分析
+"""
+
+import sys
+import re
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+TIMINGS_FILE = "timings.json"
+HISTORY_FILE = "timing_history.jsonl"
+
+# 本次运行的记录
+TIMINGS = []
+_lock = threading.Lock()
+
+
+def record(phase, wall=None, cpu=None, platform=None, size=None):
+    """记录一个阶段的耗时或一个产物的大小"""
+    entry = {"phase": phase, "platform": platform}
+    if wall is not None:
+        entry["wall"] = round(wall, 3)
+        entry["cpu"] = round(cpu, 3) if cpu is not None else None
+    if size is not None:
+        entry["size"] = size
+    with _lock:
+        TIMINGS.append(entry)
+    return entry
+
+
+@contextmanager
+def timed(phase, platform=None):
+    """记录 with 代码块耗时的上下文管理器"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start, platform=platform)
+
+
+def format_timing(wall, cpu=None):
+    """格式化耗时信息"""
+    text = f"耗时 {wall:.1f}s"
+    if cpu is not None:
+        text += f" (CPU {cpu:.1f}s)"
+    return text
+
+
+def print_summary():
+    """打印本次运行的耗时汇总"""
+    entries = [e for e in TIMINGS if "wall" in e]
+    if not entries:
+        return
+    print("各步骤耗时:")
+    for entry in entries:
+        print(f"  {entry['phase']}: {format_timing(entry['wall'], entry['cpu'])}")
+    print()
+
+
+def version_key(version):
+    """将版本号转换为可比较的元组"""
+    return tuple(int(part) for part in version.split("."))
+
+
+def save_history(project_root, version, source):
+    """保存本次运行的记录到 releases/ 目录"""
+    releases_dir = project_root / "releases"
+    version_dir = releases_dir / f"v{version}"
+    version_dir.mkdir(parents=True, exist_ok=True)
+    recorded_at = datetime.now().isoformat(timespec="seconds")
+
+    with _lock:
+        entries = [dict(e, source=source) for e in TIMINGS]
+
+    timings_path = version_dir / TIMINGS_FILE
+    data = {"version": version, "records": []}
+    if timings_path.exists():
+        try:
+            data = json.loads(timings_path.read_text(encoding="utf-8"))
+        except ValueError:
+            pass
+    data["records"] = [r for r in data.get("records", []) if r.get("source") != source] + entries
+    data[f"{source}_recorded_at"] = recorded_at
+    timings_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    with open(releases_dir / HISTORY_FILE, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(dict(entry, version=version, recorded_at=recorded_at), ensure_ascii=False))
+            f.write("\n")
+
+
+def load_release_records(releases_dir, version):
+    """读取某个版本的记录，返回 {指标名: 值}
+
+    耗时指标以阶段名为键，大小指标以去掉版本号后的产物名为键，
+    这样不同版本之间可以直接比较。
+    """
+    timings_path = releases_dir / f"v{version}" / TIMINGS_FILE
+    if not timings_path.exists():
+        return {}
+    try:
+        data = json.loads(timings_path.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+    metrics = {}
+    for entry in data.get("records", []):
+        if "size" in entry:
+            name = entry["phase"].replace(f"v{version}", "v{version}")
+            metrics[("size", name)] = entry["size"]
+        elif "wall" in entry:
+            key = ("time", entry["phase"])
+            metrics[key] = metrics.get(key, 0) + entry["wall"]
+    return metrics
+
+
+def find_previous_versions(releases_dir, version, last):
+    """查找早于指定版本、且有耗时记录的最近 last 个版本"""
+    versions = []
+    for path in releases_dir.glob("v*"):
+        if re.match(r"^v\d+\.\d+\.\d+$", path.name) and (path / TIMINGS_FILE).exists():
+            candidate = path.name[1:]
+            if version_key(candidate) < version_key(version):
+                versions.append(candidate)
+    versions.sort(key=version_key)
+    return versions[-last:]
+
+
+def format_metric(kind, value):
+    if kind == "size":
+        return f"{value / (1024 * 1024):.1f} MB"
+    return f"{value:.1f}s"
+
+
+def compare_releases(project_root, version, last=5, threshold=20.0):
+    """对比指定版本与之前 last 个版本的平均值，返回超过阈值的指标列表"""
+    releases_dir = project_root / "releases"
+    current = load_release_records(releases_dir, version)
+    if not current:
+        print(f"[错误] 未找到 v{version} 的耗时记录")
+        return None
+
+    previous_versions = find_previous_versions(releases_dir, version, last)
+    previous = [load_release_records(releases_dir, v) for v in previous_versions]
+    print(f"[信息] 对比版本: {', '.join(previous_versions) if previous_versions else '无'}")
+    print()
+
+    regressions = []
+    print(f"  {'指标':<44}{'本版本':>12}{'历史平均':>12}{'变化':>10}")
+    for key in sorted(current):
+        kind, name = key
+        value = current[key]
+        history = [p[key] for p in previous if key in p]
+        if not history:
+            print(f"  {name:<44}{format_metric(kind, value):>12}{'-':>12}{'-':>10}")
+            continue
+        average = sum(history) / len(history)
+        change = (value - average) / average * 100 if average else 0.0
+        marker = ""
+        # 忽略不足 1 秒的阶段，避免噪声
+        if change > threshold and (kind == "size" or value >= 1.0):
+            marker = " !"
+            regressions.append((name, change))
+        print(
+            f"  {name:<44}{format_metric(kind, value):>12}"
+            f"{format_metric(kind, average):>12}{change:>+9.0f}%{marker}"
+        )
+    print()
+    return regressions
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 构建打包耗时报告",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python release_timing.py 1.2.5
+  python release_timing.py 1.2.5 --last=3 --threshold=30
+        """
+    )
+    parser.add_argument("version", help="版本号 (格式: x.x.x)")
+    parser.add_argument(
+        "--last",
+        help="与之前多少个版本对比 (默认: 5)",
+        type=int,
+        default=5
+    )
+    parser.add_argument(
+        "--threshold",
+        help="变化超过多少百分比视为退化 (默认: 20)",
+        type=float,
+        default=20.0
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    project_root = Path(__file__).parent.resolve().parent
+
+    regressions = compare_releases(project_root, args.version, args.last, args.threshold)
+    if regressions is None:
+        sys.exit(1)
+    if regressions:
+        print("[警告] 以下指标明显退化:")
+        for name, change in regressions:
+            print(f"  {name}: {change:+.0f}%")
+        sys.exit(2)
+    print("[信息] 未发现明显退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp 发行产物体积分析
+用法: python size_report.py [版本号] [--compare=版本号] [--top=N] [--check-budgets]
+示例: python size_report.py 1.2.5
+       python size_report.py 1.2.5 --compare=1.2.3 --top=15
+       python size_report.py 1.2.5 --check-budgets
+
+按成员类别统计每个发行产物（APK/AAB、ZIP、tar.xz / tar.zst 包）的压缩后大小和原始大小：
+APK 中的 lib/<ABI>/libapp.so、libflutter.so、dex、flutter_assets，
+便携版中的 flutter_assets、DLL、ICU 数据等，并与上一个发行版本对比。
+结果写入 releases/v{版本号}/size_report.json。
+
+--check-budgets 按 scripts/size_budgets.json 检查体积预算，超出时以退出码 7 结束。
+增量包和安装程序不参与预算和增长检查（见 BUDGET_EXEMPT_PATTERNS）。
+"""
+
+import sys
+import re
+import json
+import shutil
+import fnmatch
+import tarfile
+import subprocess
+import zipfile
+import argparse
+from pathlib import Path
+
+import batch
+import delta
+import package
+
+
+# 预算配置文件（与本脚本位于同一目录）
+BUDGETS_FILE = Path(__file__).parent / "size_budgets.json"
+
+# 不参与体积预算和增长检查的产物：增量包的大小取决于两个版本之间的差异，
+# 安装程序与便携版共用 windows 平台名，但压缩方式不同，不适用便携版的预算
+BUDGET_EXEMPT_PATTERNS = [
+    "*_delta.zip",
+    package.PLATFORM_ARTIFACT_PATTERNS["installer"].format(version="*"),
+]
+
+# 成员类别规则：(正则, 类别名)，按顺序匹配成员路径，第一个匹配的生效
+SIZE_CATEGORIES = [
+    (r"^lib/([^/]+)/libapp\.so$", r"lib/\1/libapp.so"),
+    (r"^lib/([^/]+)/libflutter\.so$", r"lib/\1/libflutter.so"),
+    (r"^lib/([^/]+)/[^/]+\.so$", r"lib/\1/其他原生库"),
+    (r"^classes\d*\.dex$", "dex"),
+    (r"^resources\.arsc$", "resources.arsc"),
+    (r"^res/", "res"),
+    (r"^META-INF/", "META-INF"),
+    (r"(^|/)flutter_assets/fonts/", "flutter_assets/fonts"),
+    (r"(^|/)flutter_assets/(packages/)?[^/]*/?assets/images/", "flutter_assets/images"),
+    (r"(^|/)flutter_assets/", "flutter_assets"),
+    (r"(^|/)icudtl\.dat$", "icudtl.dat"),
+    (r"(^|/)(lib)?app\.so$", "libapp.so"),
+    (r"(^|/)(flutter_windows\.dll|libflutter_linux_gtk\.so)$", "Flutter 引擎"),
+    (r"(^|/)FlutterMacOS\.framework/", "Flutter 引擎"),
+    (r"(^|/)App\.framework/", "libapp.so"),
+    (r"\.(dll|so|dylib)$", "插件原生库"),
+    (r"\.exe$", "可执行文件"),
+    (r"\.(gz|br)$", "预压缩副本"),
+    (r"(^|/)canvaskit/", "canvaskit"),
+    (r"(^|/)main\.dart(\.[0-9a-f]+)?\.js$", "main.dart.js"),
+    (r"(^|/)assets/", "assets"),
+]
+
+
+def format_mb(size):
+    return f"{size / (1024 * 1024):.2f} MB"
+
+
+def format_change(size, previous):
+    if previous is None:
+        return "-"
+    change = size - previous
+    return f"{'+' if change >= 0 else '-'}{abs(change) / (1024 * 1024):.2f} MB"
+
+
+def categorize(name):
+    """确定成员所属类别"""
+    for pattern, category in SIZE_CATEGORIES:
+        match = re.search(pattern, name)
+        if match:
+            return match.expand(category)
+    return "其他"
+
+
+def read_tar_members(fileobj):
+    """顺序读取 tar 流中的文件成员，返回 [(路径, 原始大小)]"""
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        return [(m.name, m.size) for m in archive if m.isfile()]
+
+
+def read_zst_tar_members(path):
+    """读取 .tar.zst 的成员：优先使用 zstandard 模块，未安装时调用系统的 zstd 命令，都没有时返回 None"""
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    if zstandard is not None:
+        with open(path, "rb") as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                return read_tar_members(reader)
+
+    if shutil.which("zstd") is None:
+        print(f"[警告] 统计 {path.name} 需要安装 zstandard 模块 (pip install zstandard) 或 zstd 命令")
+        return None
+    process = subprocess.Popen(["zstd", "-q", "-d", "-c", str(path)], stdout=subprocess.PIPE)
+    try:
+        members = read_tar_members(process.stdout)
+    finally:
+        process.stdout.close()
+    if process.wait() != 0:
+        print(f"[警告] 无法解压 {path.name} (zstd 退出码 {process.returncode})")
+        return None
+    return members
+
+
+def read_members(path):
+    """读取压缩包成员，返回 [(路径, 压缩后大小, 原始大小)]，不是压缩包或无法读取时返回 None
+
+    tar 包没有单独的成员压缩大小，压缩后大小按整体压缩率估算。
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return [
+                (info.filename, info.compress_size, info.file_size)
+                for info in archive.infolist() if not info.is_dir()
+            ]
+    if path.name.endswith(".tar.xz"):
+        with open(path, "rb") as raw:
+            members = read_tar_members(raw)
+    elif path.name.endswith(".tar.zst"):
+        members = read_zst_tar_members(path)
+        if members is None:
+            return None
+    else:
+        return None
+    total = sum(size for _, size in members) or 1
+    ratio = path.stat().st_size / total
+    return [(name, int(size * ratio), size) for name, size in members]
+
+
+def analyze_artifact(path):
+    """统计单个产物各类别的大小"""
+    result = {"size": path.stat().st_size, "categories": {}}
+    members = read_members(path)
+    if members is None:
+        return result
+    for name, compressed, original in members:
+        entry = result["categories"].setdefault(categorize(name), {"compressed": 0, "original": 0, "count": 0})
+        entry["compressed"] += compressed
+        entry["original"] += original
+        entry["count"] += 1
+    return result
+
+
+def find_previous(name, version, previous_version, previous):
+    """查找上一版本中对应产物的统计结果"""
+    if not previous_version:
+        return None
+    return previous.get(name.replace(f"v{version}", f"v{previous_version}"))
+
+
+def analyze_release(version_dir):
+    """统计发行目录中所有产物，返回 {产物名: 统计结果}"""
+    return {artifact.name: analyze_artifact(artifact) for artifact in package.list_release_artifacts(version_dir)}
+
+
+def load_release_report(releases_dir, version):
+    """读取某个版本的体积报告，不存在时根据该版本的产物重新统计"""
+    version_dir = releases_dir / f"v{version}"
+    report_path = version_dir / package.SIZE_REPORT_FILE
+    if report_path.exists():
+        try:
+            return json.loads(report_path.read_text(encoding="utf-8"))["artifacts"]
+        except (ValueError, KeyError):
+            pass
+    return analyze_release(version_dir) if version_dir.is_dir() else {}
+
+
+def write_release_report(version_dir, version, artifacts, previous_version=None):
+    """保存体积报告"""
+    report = {"version": version, "previous_version": previous_version, "artifacts": artifacts}
+    (version_dir / package.SIZE_REPORT_FILE).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+
+def print_report(version, artifacts, previous_version=None, previous=None, top=8):
+    """打印各产物的组成和相对上一版本的变化"""
+    previous = previous or {}
+    for name, result in artifacts.items():
+        old = find_previous(name, version, previous_version, previous)
+        line = f"{name}  {format_mb(result['size'])}"
+        if old is not None:
+            line += f"（v{previous_version}: {format_mb(old['size'])}，{format_change(result['size'], old['size'])}）"
+        print(line)
+
+        categories = sorted(result["categories"].items(), key=lambda item: item[1]["compressed"], reverse=True)
+        for category, entry in categories[:top]:
+            line = f"  {category}: {format_mb(entry['compressed'])}（原始 {format_mb(entry['original'])}"
+            if old is not None:
+                old_entry = old["categories"].get(category)
+                line += f"，{format_change(entry['compressed'], old_entry['compressed']) if old_entry else '新增'}"
+            print(line + "）")
+        if len(categories) > top:
+            rest = sum(entry["compressed"] for _, entry in categories[top:])
+            print(f"  其余 {len(categories) - top} 类: {format_mb(rest)}")
+        print()
+
+
+def load_budgets(path=BUDGETS_FILE):
+    """读取体积预算配置"""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def is_budget_exempt(name):
+    """产物是否不参与体积预算和增长检查"""
+    return any(fnmatch.fnmatch(name, pattern) for pattern in BUDGET_EXEMPT_PATTERNS)
+
+
+def check_budgets(version, artifacts, budgets, previous_version=None, previous=None):
+    """检查体积预算，返回超出预算的说明列表
+
+    预算按平台配置（MB）：max_mb 为单个产物的总大小上限，categories 为各类别压缩后大小的上限；
+    max_growth_percent 为相对上一版本同名产物的最大增长比例。增量包和安装程序不检查。
+    """
+    previous = previous or {}
+    violations = []
+    growth_limit = budgets.get("max_growth_percent")
+    for name, result in artifacts.items():
+        if is_budget_exempt(name):
+            continue
+        platform = package.guess_artifact_platform(name)
+        budget = budgets.get("platforms", {}).get(platform, {})
+        size_mb = result["size"] / (1024 * 1024)
+
+        if "max_mb" in budget and size_mb > budget["max_mb"]:
+            violations.append(f"{name}: {size_mb:.2f} MB，超出 {platform} 预算 {budget['max_mb']} MB")
+        for category, limit in budget.get("categories", {}).items():
+            entry = result["categories"].get(category)
+            if entry and entry["compressed"] / (1024 * 1024) > limit:
+                violations.append(
+                    f"{name}: {category} {format_mb(entry['compressed'])}，超出预算 {limit} MB"
+                )
+
+        old = find_previous(name, version, previous_version, previous)
+        if growth_limit is not None and old and old["size"]:
+            growth = (result["size"] - old["size"]) / old["size"] * 100
+            if growth > growth_limit:
+                violations.append(
+                    f"{name}: 相比 v{previous_version} 增长 {growth:.1f}%，超出允许的 {growth_limit}%"
+                )
+    return violations
+
+
+def report_release(project_root, version, compare=None, top=8, budgets=None):
+    """统计并打印发行体积报告，指定 budgets 时检查预算，返回超出预算的说明列表"""
+    releases_dir = project_root / "releases"
+    version_dir = releases_dir / f"v{version}"
+    artifacts = analyze_release(version_dir)
+    previous_version = compare or delta.find_previous_release(releases_dir, version)
+    previous = load_release_report(releases_dir, previous_version) if previous_version else {}
+    write_release_report(version_dir, version, artifacts, previous_version)
+    print_report(version, artifacts, previous_version, previous, top)
+    if budgets is None:
+        return []
+    return check_budgets(version, artifacts, budgets, previous_version, previous)
+
+
+def print_violations(violations):
+    """打印超出预算的项目"""
+    if violations:
+        print("[错误] 以下产物超出体积预算:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("[信息] 所有产物均在体积预算内")
+    print()
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="StepUp 发行产物体积分析",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python size_report.py 1.2.5
+  python size_report.py 1.2.5 --compare=1.2.3 --top=15
+  python size_report.py 1.2.5 --check-budgets
+        """
+    )
+    parser.add_argument("version", help="版本号 (格式: x.x.x)")
+    parser.add_argument("--compare", help="对比的版本号 (默认: 上一个发行版本)", default=None)
+    parser.add_argument("--top", help="每个产物显示的类别数 (默认: 8)", type=int, default=8)
+    parser.add_argument(
+        "--check-budgets",
+        help="按 size_budgets.json 检查体积预算，超出时退出码为 7",
+        action="store_true"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    project_root = Path(__file__).parent.resolve().parent
+    version_dir = project_root / "releases" / f"v{args.version}"
+    if not version_dir.is_dir():
+        print(f"[错误] 发行目录不存在: {version_dir}")
+        sys.exit(1)
+
+    budgets = None
+    if args.check_budgets:
+        budgets = load_budgets()
+        if budgets is None:
+            print(f"[错误] 无法读取体积预算配置: {BUDGETS_FILE}")
+            sys.exit(1)
+
+    violations = report_release(project_root, args.version, args.compare, args.top, budgets)
+    if budgets is not None:
+        print_violations(violations)
+        if violations:
+            sys.exit(batch.EXIT_BUDGET)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试配置：构建脚本以同目录模块的方式互相导入"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
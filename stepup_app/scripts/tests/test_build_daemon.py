@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""常驻构建服务测试"""
+
+import sys
+import threading
+
+import pytest
+
+import build_daemon
+
+
+@pytest.fixture
+def daemon_server(tmp_path):
+    project = tmp_path / "project"
+    (project / "scripts").mkdir(parents=True)
+    (project / "scripts" / "build.py").write_text("", encoding="utf-8")
+    daemon = build_daemon.BuildDaemon(None, {project.resolve()})
+    handler = type("Handler", (build_daemon.DaemonHandler,), {"daemon": daemon})
+    server = build_daemon.DaemonServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1], project, daemon
+    server.shutdown()
+    server.server_close()
+
+
+def test_daemon_rejects_watch(daemon_server, capsys):
+    port, project, daemon = daemon_server
+    assert build_daemon.submit_build(port, project, ["1.2.3", "--platforms=web", "--watch"]) == 1
+    assert "--watch is not supported" in capsys.readouterr().out
+    assert daemon.status() == {"running": None, "queued": []}
+
+
+def test_submit_rejects_watch(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["build_daemon.py", "submit", "1.2.3", "--watch"])
+    with pytest.raises(SystemExit) as error:
+        build_daemon.parse_arguments()
+    assert error.value.code == 2
+
+    monkeypatch.setattr(sys, "argv", ["build_daemon.py", "submit", "1.2.3", "--watch-debounce=2"])
+    _, build_args = build_daemon.parse_arguments()
+    assert build_args == ["1.2.3", "--watch-debounce=2"]
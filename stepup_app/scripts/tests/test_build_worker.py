@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""构建节点测试：启动两个 build_worker.py 进程，项目目录中的 build.py / package.py 为模拟脚本"""
+
+import hashlib
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+from pathlib import Path
+
+import pytest
+
+import build_worker
+
+
+WORKER_SCRIPT = Path(build_worker.__file__).resolve()
+
+STUB_BUILD = '''
+import sys
+print("stub build " + " ".join(sys.argv[1:]))
+'''
+
+# 为每个平台生成一个产物，并按 batch.py 的格式写出结果摘要
+STUB_PACKAGE = '''
+import argparse, hashlib, json
+from pathlib import Path
+parser = argparse.ArgumentParser()
+parser.add_argument("version")
+parser.add_argument("--platforms")
+parser.add_argument("--yes", action="store_true")
+parser.add_argument("--summary-json")
+args = parser.parse_args()
+names = {"windows": "windows_portable.zip", "linux": "linux.tar.gz", "web": "web.zip"}
+version_dir = Path("releases") / f"v{args.version}"
+version_dir.mkdir(parents=True, exist_ok=True)
+artifacts = []
+for platform in args.platforms.split(","):
+    path = version_dir / f"StepUp_v{args.version}_{names[platform]}"
+    data = f"{platform} from {Path.cwd().name}".encode()
+    path.write_bytes(data)
+    artifacts.append({"file": path.name, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()})
+    print(f"stub package {path.name}")
+Path(args.summary_json).write_text(json.dumps({"artifacts": artifacts}), encoding="utf-8")
+'''
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_worker(tmp_path, name, platforms):
+    """在独立的项目目录中启动构建节点，返回 (进程, 地址)"""
+    project = tmp_path / name
+    (project / "scripts").mkdir(parents=True)
+    (project / "scripts" / "build.py").write_text(STUB_BUILD, encoding="utf-8")
+    (project / "scripts" / "package.py").write_text(STUB_PACKAGE, encoding="utf-8")
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(WORKER_SCRIPT), f"--port={port}", f"--platforms={platforms}", f"--project={project}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while build_worker.get_worker_info(url) is None:
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            pytest.fail(f"构建节点 {name} 未能启动")
+        time.sleep(0.1)
+    return process, url
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_worker, "POLL_INTERVAL", 0.1)
+    processes = []
+    urls = []
+    for name, platforms in (("node_a", "windows,installer,web"), ("node_b", "linux,web")):
+        process, url = start_worker(tmp_path, name, platforms)
+        processes.append(process)
+        urls.append(url)
+    yield urls
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def wait_for_job(url, job_id):
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        state = build_worker.request_json(f"{url}/jobs/{job_id}")
+        if state["status"] in ("success", "failed"):
+            return state
+        time.sleep(0.1)
+    pytest.fail(f"任务 {job_id} 超时")
+
+
+def test_two_workers_build_and_download(tmp_path, workers, capsys):
+    url_a, url_b = workers
+    infos = {url: build_worker.get_worker_info(url) for url in workers}
+    assignments, unassigned = build_worker.assign_platforms(["windows", "web", "linux", "installer"], infos)
+    assert assignments == {url_a: ["windows", "installer"], url_b: ["web", "linux"]}
+    assert unassigned == []
+    assert build_worker.assign_platforms(["macos"], infos) == ({}, ["macos"])
+
+    version_dir = tmp_path / "releases" / "v1.2.3"
+    version_dir.mkdir(parents=True)
+    assert build_worker.run_remote_job(url_a, "1.2.3", ["windows"], version_dir)
+    assert build_worker.run_remote_job(url_b, "1.2.3", ["linux", "web"], version_dir)
+
+    assert (version_dir / "StepUp_v1.2.3_windows_portable.zip").read_bytes() == b"windows from node_a"
+    assert (version_dir / "StepUp_v1.2.3_linux.tar.gz").read_bytes() == b"linux from node_b"
+    assert (version_dir / "StepUp_v1.2.3_web.zip").read_bytes() == b"web from node_b"
+
+    # 节点上的日志带节点地址前缀转发到调度端
+    output = capsys.readouterr().out
+    label_a = url_a.split("//")[1]
+    label_b = url_b.split("//")[1]
+    assert f"[{label_a}] stub build 1.2.3 --platforms=windows" in output
+    assert f"[{label_b}] stub package StepUp_v1.2.3_web.zip" in output
+
+
+def test_download_rejects_sha256_mismatch(tmp_path, workers):
+    url = workers[1]
+    job_id = build_worker.request_json(f"{url}/jobs", {"version": "1.2.3", "platforms": ["linux"]})["id"]
+    state = wait_for_job(url, job_id)
+    assert state["status"] == "success"
+
+    version_dir = tmp_path / "downloads"
+    version_dir.mkdir()
+    artifact = dict(state["artifacts"][0], sha256=hashlib.sha256(b"something else").hexdigest())
+    assert not build_worker.download_artifact(url, job_id, artifact, version_dir)
+    assert list(version_dir.iterdir()) == []
+
+    assert build_worker.download_artifact(url, job_id, state["artifacts"][0], version_dir)
+    assert (version_dir / "StepUp_v1.2.3_linux.tar.gz").read_bytes() == b"linux from node_b"
+
+
+def test_worker_rejects_unsupported_platform(workers):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        build_worker.request_json(f"{workers[1]}/jobs", {"version": "1.2.3", "platforms": ["windows"]})
+    assert error.value.code == 400
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""增量更新包测试"""
+
+import json
+import os
+import random
+import zipfile
+
+import pytest
+
+import delta
+
+
+def make_archive(path, files):
+    """生成带一个顶层目录的发行压缩包"""
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(f"StepUp/{name}", data)
+    return path
+
+
+def make_evil_delta(path, member):
+    """生成一个把文件写到 member 的增量包"""
+    data = b"evil"
+    entry = {"path": member, "action": "add", "size": len(data), "sha256": delta.sha256(data)}
+    manifest = {"format": delta.DELTA_FORMAT, "files": [entry], "removed": []}
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(delta.DELTA_MANIFEST, json.dumps(manifest))
+        archive.writestr(f"add/{member}", data)
+    return path
+
+
+@pytest.mark.parametrize("member", [
+    "../outside.txt",
+    "lib/../../outside.txt",
+    "/tmp/outside.txt",
+    "C:/outside.txt",
+    "..\\outside.txt",
+])
+def test_apply_rejects_unsafe_paths(tmp_path, member):
+    old_dir = tmp_path / "old"
+    old_dir.mkdir()
+    output_dir = tmp_path / "work" / "new"
+    with pytest.raises(ValueError):
+        delta.apply_delta(old_dir, make_evil_delta(tmp_path / "evil.zip", member), output_dir)
+    assert not (tmp_path / "work" / "outside.txt").exists()
+    assert not output_dir.exists()
+
+
+def test_apply_rejects_symlink_escape(tmp_path):
+    old_dir = tmp_path / "old"
+    old_dir.mkdir()
+    output_dir = tmp_path / "new"
+    output_dir.mkdir()
+    (output_dir / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        delta.apply_delta(old_dir, make_evil_delta(tmp_path / "evil.zip", "link/outside.txt"), output_dir)
+    assert not (tmp_path / "outside.txt").exists()
+
+
+def test_create_and_apply_round_trip(tmp_path):
+    random.seed(1)
+    library = bytes(random.randrange(256) for _ in range(300000))
+    changed = bytearray(library)
+    changed[1000:1004] = b"\xff\xfe\xfd\xfc"
+    changed[150000:150000] = os.urandom(300)
+    old_archive = make_archive(tmp_path / "old.zip", {"lib/app.so": library, "data.txt": b"1"})
+    new_archive = make_archive(tmp_path / "new.zip", {"lib/app.so": bytes(changed), "data.txt": b"2"})
+
+    manifest = delta.create_delta(old_archive, new_archive, tmp_path / "delta.zip")
+    actions = {entry["path"]: entry["action"] for entry in manifest["files"]}
+    assert actions == {"data.txt": "add", "lib/app.so": "patch"}
+
+    output_dir = tmp_path / "new"
+    delta.apply_delta(old_archive, tmp_path / "delta.zip", output_dir)
+    assert (output_dir / "lib" / "app.so").read_bytes() == bytes(changed)
+    assert (output_dir / "data.txt").read_bytes() == b"2"
+
+
+def test_block_diff_small_patch_for_scattered_edits():
+    random.seed(2)
+    old = os.urandom(2 * 1024 * 1024)
+    new = bytearray(old)
+    for _ in range(200):
+        position = random.randrange(len(new))
+        new[position:position + 4] = os.urandom(4)
+    for _ in range(20):
+        position = random.randrange(len(new))
+        new[position:position] = os.urandom(100)
+    new = bytes(new)
+
+    patch = delta.block_diff(old, new)
+    assert patch is not None and len(patch) < 64 * 1024
+    assert delta.block_patch(old, patch) == new
+
+
+def test_block_diff_gives_up_on_unrelated_data():
+    assert delta.block_diff(os.urandom(1024 * 1024), os.urandom(1024 * 1024)) is None
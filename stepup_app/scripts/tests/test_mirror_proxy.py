@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""镜像缓存代理测试（使用本地的模拟上游）"""
+
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import mirror_proxy
+
+
+class FakeUpstream:
+    """模拟镜像：按路径返回 bodies 中的内容，记录每个路径的请求次数"""
+
+    def __init__(self):
+        self.bodies = {}
+        self.status = 200
+        self.delay = 0
+        self.hits = {}
+        self.lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream.lock:
+                    upstream.hits[self.path] = upstream.hits.get(self.path, 0) + 1
+                time.sleep(upstream.delay)
+                body = upstream.bodies.get(self.path)
+                status = upstream.status if body is not None else 404
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def upstream():
+    server = FakeUpstream()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def start_proxy(tmp_path, upstream, max_size=1024 ** 3):
+    cache = mirror_proxy.MirrorCache(tmp_path / "mirror", max_size)
+    proxy = mirror_proxy.MirrorProxy(cache, {"pub": upstream.url, "storage": upstream.url})
+    handler = type("Handler", (mirror_proxy.MirrorHandler,), {"proxy": proxy})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return proxy, server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+@pytest.fixture
+def make_proxy(tmp_path, upstream):
+    servers = []
+
+    def make(**kwargs):
+        proxy, server, url = start_proxy(tmp_path, upstream, **kwargs)
+        servers.append(server)
+        return proxy, url
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read()
+
+
+def test_concurrent_requests_fetch_once(upstream, make_proxy):
+    upstream.bodies["/flutter_infra_release/engine.zip"] = b"engine" * 10000
+    upstream.delay = 0.3
+    proxy, url = make_proxy()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(get(url + "/storage/flutter_infra_release/engine.zip")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"engine" * 10000] * 5
+    assert upstream.hits["/flutter_infra_release/engine.zip"] == 1
+    assert proxy.stats["misses"] == 1 and proxy.stats["hits"] == 4
+    assert proxy.key_locks == {}
+
+
+def test_stale_metadata_served_when_upstream_fails(upstream, make_proxy, monkeypatch):
+    upstream.bodies["/api/packages/foo"] = b"v1"
+    proxy, url = make_proxy()
+    assert get(url + "/pub/api/packages/foo") == b"v1"
+
+    monkeypatch.setattr(mirror_proxy, "METADATA_TTL", 0)
+    upstream.status = 503
+    assert get(url + "/pub/api/packages/foo") == b"v1"
+    assert proxy.stats["stale"] == 1
+    assert upstream.hits["/api/packages/foo"] == 2
+
+    # 4xx 是上游的明确答复，照常返回
+    with pytest.raises(urllib.error.HTTPError) as error:
+        get(url + "/pub/api/packages/missing")
+    assert error.value.code == 404
+
+
+def test_least_recently_used_objects_evicted(upstream, make_proxy):
+    for name in ("a", "b", "c"):
+        upstream.bodies[f"/{name}.zip"] = name.encode() * 100
+    proxy, url = make_proxy(max_size=250)
+
+    for name in ("a", "b", "a", "c"):
+        assert get(url + f"/storage/{name}.zip") == name.encode() * 100
+        time.sleep(0.05)
+
+    # b 最久未使用，被淘汰后重新获取；a 仍在缓存中
+    assert get(url + "/storage/a.zip") == b"a" * 100
+    assert get(url + "/storage/b.zip") == b"b" * 100
+    assert upstream.hits == {"/a.zip": 1, "/b.zip": 2, "/c.zip": 1}
+    assert proxy.cache.size <= 250
+
+
+def test_evicted_object_fetched_again(upstream, make_proxy):
+    upstream.bodies["/engine.zip"] = b"engine"
+    proxy, url = make_proxy()
+    assert get(url + "/storage/engine.zip") == b"engine"
+
+    # 索引仍指向内容，但内容已被删除（例如在查找之后被淘汰）
+    for path in proxy.cache.objects_dir.rglob("*"):
+        if path.is_file():
+            path.unlink()
+    assert get(url + "/storage/engine.zip") == b"engine"
+    assert upstream.hits["/engine.zip"] == 2
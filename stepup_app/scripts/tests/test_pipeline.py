@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""pipeline.py 调度测试"""
+
+import time
+import threading
+
+from pipeline import Task, run_pipeline
+
+
+def make_platform_tasks(platforms, events, build_time=0.2):
+    """模拟一键构建打包：各平台构建共用 flutter 资源，打包依赖该平台的构建"""
+    lock = threading.Lock()
+
+    def step(name, duration):
+        def run():
+            with lock:
+                events.append(("start", name, time.monotonic()))
+            time.sleep(duration)
+            with lock:
+                events.append(("end", name, time.monotonic()))
+            return True
+        return run
+
+    tasks = [Task("prepare", step("prepare", 0))]
+    for platform in platforms:
+        tasks.append(Task(f"build {platform}", step(f"build {platform}", build_time),
+                          deps=["prepare"], resources={"flutter"}))
+    for platform in platforms:
+        tasks.append(Task(f"package {platform}", step(f"package {platform}", build_time),
+                          deps=[f"build {platform}"]))
+    return tasks
+
+
+def event_time(events, kind, name):
+    return next(t for k, n, t in events if k == kind and n == name)
+
+
+def test_blocked_build_does_not_delay_packaging():
+    events = []
+    results = run_pipeline(make_platform_tasks(["windows", "android", "web"], events), jobs=2)
+    assert all(results.values())
+    # android 的构建等待 flutter 资源时不占用线程，windows 构建完成后其打包立即开始，
+    # 与 android 的构建同时进行
+    assert event_time(events, "start", "package windows") < event_time(events, "end", "build android")
+    assert event_time(events, "start", "package android") < event_time(events, "end", "build web")
+
+
+def test_builds_sharing_a_resource_never_overlap():
+    events = []
+    run_pipeline(make_platform_tasks(["windows", "android", "web"], events, build_time=0.05), jobs=3)
+    builds = sorted(
+        (event_time(events, "start", f"build {p}"), event_time(events, "end", f"build {p}"))
+        for p in ["windows", "android", "web"]
+    )
+    for (_, previous_end), (next_start, _) in zip(builds, builds[1:]):
+        assert next_start >= previous_end
+
+
+def test_downstream_tasks_run_first():
+    events = []
+    run_pipeline(make_platform_tasks(["windows", "android"], events, build_time=0), jobs=1)
+    order = [name for kind, name, _ in events if kind == "start"]
+    assert order == ["prepare", "build windows", "package windows", "build android", "package android"]
+
+
+def test_failed_dependency_skips_downstream():
+    tasks = [
+        Task("build web", lambda: False, resources={"flutter"}),
+        Task("package web", lambda: True, deps=["build web"]),
+    ]
+    results = run_pipeline(tasks, jobs=2)
+    assert results == {"build web": False, "package web": None}
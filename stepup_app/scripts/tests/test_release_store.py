@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""去重存储测试"""
+
+import os
+
+import package
+import release_store
+
+
+def make_release(tmp_path, version):
+    """用 --store 方式打包一个带两个大文件的压缩包，并放入一个整体存储的 APK"""
+    source = tmp_path / "bundle" / "StepUp"
+    source.mkdir(parents=True, exist_ok=True)
+    (source / "app.bin").write_bytes(os.urandom(100000))
+    (source / "data.bin").write_bytes(b"\0" * 100001)
+    version_dir = tmp_path / "releases" / f"v{version}"
+    version_dir.mkdir(parents=True)
+    store_dir = release_store.get_store_dir(tmp_path)
+    options = {"jobs": 2, "compression": "default", "store": store_dir}
+    package.create_zip_archive(source, version_dir / f"StepUp_v{version}_windows.zip", options)
+    (version_dir / f"StepUp_v{version}_android.apk").write_bytes(os.urandom(5000))
+    return store_dir, version_dir
+
+
+def test_store_pass_twice_keeps_member_recipes(tmp_path):
+    store_dir, version_dir = make_release(tmp_path, "1.0.0")
+    assert package.store_release_artifacts(store_dir, version_dir, "1.0.0") == 1
+
+    # 第二次运行：压缩包没有重新打包，进程中没有记录摘要
+    package.ARTIFACT_DIGESTS.clear()
+    assert package.store_release_artifacts(store_dir, version_dir, "1.0.0") == 0
+
+    recipes = release_store.load_recipes(store_dir, "1.0.0")
+    assert recipes["StepUp_v1.0.0_windows.zip"]["type"] == "zip"
+    assert recipes["StepUp_v1.0.0_android.apk"]["type"] == "file"
+
+    _, removed, _ = release_store.collect_garbage(store_dir, tmp_path / "releases")
+    assert removed == 0
+    zip_recipe = recipes["StepUp_v1.0.0_windows.zip"]
+    output = tmp_path / "restored.zip"
+    release_store.materialize_artifact(store_dir, zip_recipe, output)
+    assert output.read_bytes() == (version_dir / "StepUp_v1.0.0_windows.zip").read_bytes()
+
+
+def test_changed_artifact_is_ingested_again(tmp_path):
+    store_dir, version_dir = make_release(tmp_path, "1.0.0")
+    package.store_release_artifacts(store_dir, version_dir, "1.0.0")
+    package.ARTIFACT_DIGESTS.clear()
+
+    apk = version_dir / "StepUp_v1.0.0_android.apk"
+    package.unlink_existing(apk)
+    apk.write_bytes(b"rebuilt")
+    assert package.store_release_artifacts(store_dir, version_dir, "1.0.0") == 1
+    recipe = release_store.load_recipes(store_dir, "1.0.0")["StepUp_v1.0.0_android.apk"]
+    assert recipe["size"] == len(b"rebuilt")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""产物体积分析测试"""
+
+import os
+import shutil
+
+import pytest
+
+import build_and_package
+import package
+import size_report
+
+
+def make_bundle(tmp_path):
+    source = tmp_path / "bundle" / "StepUp"
+    (source / "data" / "flutter_assets").mkdir(parents=True)
+    (source / "stepup_app").write_bytes(os.urandom(20000))
+    (source / "data" / "flutter_assets" / "AssetManifest.json").write_bytes(b"{}" * 5000)
+    return source
+
+
+@pytest.mark.parametrize("archive_format", ["tar.xz", "tar.zst"])
+def test_read_tar_members(tmp_path, archive_format):
+    if archive_format == "tar.zst" and shutil.which("zstd") is None:
+        pytest.importorskip("zstandard")
+    output = tmp_path / f"StepUp_v1.0.0_linux.{archive_format}"
+    assert package.create_tar_archive(make_bundle(tmp_path), output, archive_format)
+
+    members = {name: original for name, _, original in size_report.read_members(output)}
+    assert members == {
+        "StepUp/stepup_app": 20000,
+        "StepUp/data/flutter_assets/AssetManifest.json": 10000,
+    }
+    categories = size_report.analyze_artifact(output)["categories"]
+    assert categories["flutter_assets"]["original"] == 10000
+
+
+def test_delta_and_installer_exempt_from_budgets():
+    big = {"size": 50 * 1024 * 1024, "categories": {}}
+    artifacts = {
+        "StepUp_v1.0.1_windows_portable.zip": big,
+        "StepUp_v1.0.0_to_v1.0.1_windows_portable_delta.zip": big,
+        "StepUp_v1.0.1_windows_installer.exe": big,
+    }
+    previous = {
+        "StepUp_v1.0.0_windows_portable.zip": {"size": 1, "categories": {}},
+        "StepUp_v1.0.0_windows_installer.exe": {"size": 1, "categories": {}},
+    }
+    budgets = {"max_growth_percent": 10, "platforms": {"windows": {"max_mb": 30}}}
+    violations = size_report.check_budgets("1.0.1", artifacts, budgets, "1.0.0", previous)
+    assert len(violations) == 2
+    assert all(v.startswith("StepUp_v1.0.1_windows_portable.zip") for v in violations)
+
+
+def test_pipeline_budget_check_can_be_disabled(tmp_path, monkeypatch):
+    version_dir = tmp_path / "releases" / "v1.0.0"
+    version_dir.mkdir(parents=True)
+    (version_dir / "StepUp_v1.0.0_web.zip").write_bytes(os.urandom(4096))
+    monkeypatch.setattr(size_report, "load_budgets", lambda: {"platforms": {"web": {"max_mb": 0.001}}})
+
+    assert not build_and_package.check_size_budgets(tmp_path, "1.0.0")
+    assert build_and_package.check_size_budgets(tmp_path, "1.0.0", check_budgets=False)
+    assert (version_dir / package.SIZE_REPORT_FILE).exists()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StepUp Web 构建产物发布前处理
+
+在 package.py 以硬链接搭建的 build/web 副本（build/web_release）上执行，不修改构建目录:
+1. 内容指纹：main.dart.js、flutter_bootstrap.js 按内容哈希重命名（如 main.dart.3f2a9c1b0d.js），
+   并改写 index.html、flutter_bootstrap.js、flutter_service_worker.js 中的引用；
+   没有找到引用的文件保持原名，避免改名后页面无法加载；
+   改写后重新计算 flutter_service_worker.js 资源清单（RESOURCES）中这些文件的 MD5
+2. 预压缩：为 JS、WASM、JSON、字体等文本类文件并行生成最高压缩级别的 .gz 副本，
+   安装了 brotli 模块（pip install brotli）时同时生成 .br 副本
+3. 缓存头：按网站 _headers 和 _edgeone.json 的格式生成缓存策略，
+   带内容指纹的文件长期缓存（immutable），入口文件每次校验，assets/、canvaskit/ 等目录缓存一天
+"""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 按内容哈希重命名的文件，按顺序处理（flutter_bootstrap.js 引用 main.dart.js，需在其之后计算哈希）
+FINGERPRINT_FILES = ["main.dart.js", "flutter_bootstrap.js"]
+
+# 可能引用上述文件的文本文件
+REFERENCE_FILES = ["index.html", "flutter_bootstrap.js", "flutter_service_worker.js"]
+
+# Flutter 生成的 Service Worker，RESOURCES 中记录各文件内容的 MD5（"/" 对应 index.html）
+SERVICE_WORKER_FILE = "flutter_service_worker.js"
+SERVICE_WORKER_RESOURCES = re.compile(r"const RESOURCES = \{(.*?)\};", re.S)
+SERVICE_WORKER_ENTRY = re.compile(r'"([^"]+)"(\s*:\s*)"([0-9a-f]{32})"')
+
+# 需要预压缩的文件类型
+PRECOMPRESS_EXTENSIONS = {
+    ".js", ".mjs", ".wasm", ".json", ".html", ".css", ".svg",
+    ".ttf", ".otf", ".txt", ".symbols", ".frag",
+}
+
+# 小于该大小的文件不预压缩
+PRECOMPRESS_MIN_SIZE = 1024
+
+# 缓存策略
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+CACHE_DEFAULT = "public, max-age=86400"
+
+# 入口文件：文件名不变、内容随版本变化，每次请求都需要校验
+ENTRY_FILES = ["index.html", "flutter_bootstrap.js", "flutter_service_worker.js", "version.json", "manifest.json"]
+
+# 发布目录中生成的缓存头文件
+HEADERS_FILE = "_headers"
+EDGEONE_FILE = "_edgeone.json"
+
+
+def _replace_file(path, data):
+    """写入新文件后替换原文件（发布目录以硬链接搭建，不能直接改写原文件内容）"""
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+def fingerprint_files(web_dir):
+    """按内容哈希重命名入口脚本并改写引用，返回 {原文件名: 新文件名}"""
+    renamed = {}
+    for name in FINGERPRINT_FILES:
+        path = web_dir / name
+        if not path.is_file():
+            continue
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()[:10]
+        stem, suffix = name.rsplit(".", 1)
+        new_name = f"{stem}.{digest}.{suffix}"
+        # 只替换出现在引号或路径中的完整文件名
+        pattern = re.compile(r"(?<=[\"'/])" + re.escape(name) + r"(?=[\"'?#])")
+
+        referenced = False
+        for reference in REFERENCE_FILES:
+            ref_path = web_dir / reference
+            if reference == name or not ref_path.is_file():
+                continue
+            text = ref_path.read_text(encoding="utf-8")
+            new_text, count = pattern.subn(new_name, text)
+            if count:
+                _replace_file(ref_path, new_text.encode("utf-8"))
+                referenced = True
+        if not referenced:
+            continue
+        path.rename(web_dir / new_name)
+        renamed[name] = new_name
+    return renamed
+
+
+def update_service_worker_hashes(web_dir, renamed):
+    """重新计算 Service Worker 资源清单中被改写、重命名的文件的 MD5，返回更新的条目数
+
+    清单中的哈希与文件内容不一致时，已安装的 Service Worker 会继续使用旧的缓存内容。
+    """
+    path = web_dir / SERVICE_WORKER_FILE
+    if not path.is_file():
+        return 0
+    text = path.read_text(encoding="utf-8")
+    match = SERVICE_WORKER_RESOURCES.search(text)
+    if match is None:
+        return 0
+
+    changed = set(REFERENCE_FILES) | set(renamed.values())
+    updated = 0
+
+    def replace(entry):
+        nonlocal updated
+        name = "index.html" if entry.group(1) == "/" else entry.group(1)
+        file = web_dir / name
+        if name not in changed or not file.is_file():
+            return entry.group(0)
+        digest = hashlib.md5(file.read_bytes()).hexdigest()
+        if digest == entry.group(3):
+            return entry.group(0)
+        updated += 1
+        return f'"{entry.group(1)}"{entry.group(2)}"{digest}"'
+
+    resources = SERVICE_WORKER_ENTRY.sub(replace, match.group(1))
+    if updated:
+        _replace_file(path, (text[:match.start(1)] + resources + text[match.end(1):]).encode("utf-8"))
+    return updated
+
+
+def _precompress(path):
+    """生成 .gz（及 .br）副本，返回新增的字节数"""
+    data = path.read_bytes()
+    written = 0
+    gz_path = path.with_name(path.name + ".gz")
+    gz_path.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    written += gz_path.stat().st_size
+    if brotli is not None:
+        br_path = path.with_name(path.name + ".br")
+        br_path.write_bytes(brotli.compress(data, quality=11))
+        written += br_path.stat().st_size
+    return written
+
+
+def precompress_files(web_dir, jobs=None):
+    """在线程池中并行预压缩文件，返回 (文件数, 新增字节数)"""
+    files = [
+        f for f in web_dir.rglob("*")
+        if f.is_file() and f.suffix in PRECOMPRESS_EXTENSIONS and f.stat().st_size >= PRECOMPRESS_MIN_SIZE
+    ]
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        written = sum(executor.map(_precompress, files))
+    return len(files), written
+
+
+def get_cache_rules(web_dir, renamed):
+    """生成缓存规则列表 [(路径, Cache-Control)]
+
+    部分托管平台会合并同一文件匹配到的所有规则，因此各规则匹配的文件互不重叠：
+    不使用 /* 之类的通配规则，未列出的文件使用托管平台的默认策略。
+    """
+    rules = [("/", CACHE_REVALIDATE)]
+    for name in ENTRY_FILES:
+        if name not in renamed and (web_dir / name).is_file():
+            rules.append((f"/{name}", CACHE_REVALIDATE))
+    for new_name in renamed.values():
+        for suffix in ["", ".gz", ".br"]:
+            if (web_dir / (new_name + suffix)).is_file():
+                rules.append((f"/{new_name}{suffix}", CACHE_IMMUTABLE))
+    for directory in ["assets", "canvaskit", "icons"]:
+        if (web_dir / directory).is_dir():
+            rules.append((f"/{directory}/*", CACHE_DEFAULT))
+    return rules
+
+
+def write_cache_headers(web_dir, renamed):
+    """按网站的格式生成 _headers 和 _edgeone.json"""
+    rules = get_cache_rules(web_dir, renamed)
+    (web_dir / HEADERS_FILE).write_text(
+        "\n".join(f"{path}\n  Cache-Control: {value}\n" for path, value in rules),
+        encoding="utf-8"
+    )
+    (web_dir / EDGEONE_FILE).write_text(
+        json.dumps(
+            {"headers": {path: {"Cache-Control": value} for path, value in rules}},
+            ensure_ascii=False, indent=2
+        ) + "\n",
+        encoding="utf-8"
+    )
+
+
+def process_web_release(web_dir, jobs=None):
+    """对 Web 发布目录执行全部处理，返回处理结果"""
+    renamed = fingerprint_files(web_dir)
+    service_worker_updated = update_service_worker_hashes(web_dir, renamed)
+    count, written = precompress_files(web_dir, jobs)
+    write_cache_headers(web_dir, renamed)
+    return {
+        "renamed": renamed,
+        "service_worker_updated": service_worker_updated,
+        "precompressed": count,
+        "precompressed_size": written,
+    }
@@ -1,10 +1,44 @@
 #!/usr/bin/env python3
 """
-自动从 pubspec.yaml 同步版本号到网页
+自动从 pubspec.yaml 同步版本号和发行文件信息到网页
 用法: python update_version.py
+
+1. 更新 script.js 中的 APP_VERSION
+2. 读取 ../stepup_app/releases/v{版本号}/manifest.json，生成 releases.json，
+   并将下载按钮（文件链接、大小、SHA-256）预先写入 index.html 中 <!-- release:平台 --> 标记之间；
+   Android 提供按 ABI 拆分的 APK 时，主按钮链接 arm64-v8a 版本，其余版本列在下方
+3. 按 script.js、styles.css 的内容更新 index.html 中的 ?v= 参数，避免浏览器缓存旧文件
 """
 
 import re
+import json
+import html
+import hashlib
+
+
+# 发行文件的下载地址，{version} 为版本号，{file} 为文件名
+DOWNLOAD_URL = 'https://gitee.com/LeoAndJellyfish/StepUp/releases/download/v{version}/{file}'
+
+# Android 各 ABI 的说明，按推荐顺序排列
+ANDROID_ABI_LABELS = {
+    'arm64-v8a': '64 位设备',
+    'armeabi-v7a': '32 位设备',
+    'x86_64': 'x86_64 设备',
+    'universal': '通用版',
+}
+
+# 其他平台的名称
+PLATFORM_LABELS = {
+    'linux': 'Linux',
+    'macos': 'macOS',
+    'web': 'Web',
+}
+
+DOWNLOAD_ICON = '''<svg class="btn-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5">
+    <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"/>
+    <polyline points="7 10 12 15 17 10"/>
+    <line x1="12" y1="15" x2="12" y2="3"/>
+</svg>'''
 
 
 def get_version_from_pubspec(pubspec_path='../stepup_app/pubspec.yaml'):
@@ -51,21 +85,204 @@ def update_script_js(version, script_path='script.js'):
         return False
 
 
+def load_release_manifest(version, releases_dir='../stepup_app/releases'):
+    """读取发行目录中的 manifest.json，不存在时返回 None"""
+    manifest_path = f'{releases_dir}/v{version}/manifest.json'
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"[警告] 找不到 {manifest_path}，只同步版本号")
+        return None
+    except Exception as e:
+        print(f"错误: 读取 {manifest_path} 时出错: {e}")
+        return None
+
+
+def get_release_files(manifest):
+    """整理网页需要的发行文件信息"""
+    version = manifest['version']
+    files = []
+    for artifact in manifest['artifacts']:
+        files.append({
+            'platform': artifact.get('platform'),
+            'abi': artifact.get('abi'),
+            'file': artifact['file'],
+            'size': artifact['size'],
+            'sha256': artifact['sha256'],
+            'url': DOWNLOAD_URL.format(version=version, file=artifact['file']),
+        })
+    return files
+
+
+def write_releases_json(version, files, output_path='releases.json'):
+    """生成紧凑的 releases.json"""
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'files': files}, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        print(f"[OK] 已生成 {output_path}: {len(files)} 个文件")
+        return True
+    except Exception as e:
+        print(f"错误: 生成 {output_path} 时出错: {e}")
+        return False
+
+
+def format_size(size):
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+def render_link(item, text):
+    """生成文件链接，SHA-256 显示在提示中"""
+    return (
+        f'<a href="{html.escape(item["url"])}" target="_blank" '
+        f'title="SHA-256: {item["sha256"]}">{html.escape(text)}</a>'
+    )
+
+
+def render_button(item, text):
+    """生成下载按钮"""
+    return '\n'.join([
+        f'<a href="{html.escape(item["url"])}" target="_blank" class="btn btn-download" '
+        f'title="SHA-256: {item["sha256"]}">',
+        *('    ' + line for line in DOWNLOAD_ICON.splitlines()),
+        f'    {html.escape(text)}（{format_size(item["size"])}）',
+        '</a>',
+    ])
+
+
+def render_android(files):
+    """Android：主按钮链接推荐的 APK，其余 APK 列在下方"""
+    apks = [f for f in files if f['platform'] == 'android' and f['abi']]
+    if not apks:
+        return None
+    order = list(ANDROID_ABI_LABELS)
+    apks.sort(key=lambda f: order.index(f['abi']) if f['abi'] in order else len(order))
+    primary, others = apks[0], apks[1:]
+    label = '下载 APK' if primary['abi'] == 'universal' else f'下载 APK {primary["abi"]}'
+    lines = [render_button(primary, label)]
+    if others:
+        links = ' · '.join(
+            render_link(f, f'{ANDROID_ABI_LABELS.get(f["abi"], f["abi"])} {format_size(f["size"])}')
+            for f in others
+        )
+        lines.append(f'<p class="download-note">其他版本: {links}</p>')
+    return '\n'.join(lines)
+
+
+def render_windows(files):
+    """Windows：有安装程序时主按钮链接安装程序，便携版列在下方"""
+    windows = [f for f in files if f['platform'] == 'windows']
+    installer = next((f for f in windows if f['file'].endswith('.exe')), None)
+    portable = next((f for f in windows if f['file'].endswith('_portable.zip')), None)
+    if installer is None and portable is None:
+        return None
+    if installer is None:
+        return render_button(portable, '下载便携版')
+    lines = [render_button(installer, '下载安装包')]
+    if portable is not None:
+        link = render_link(portable, f'便携版 {format_size(portable["size"])}')
+        lines.append(f'<p class="download-note">{link}</p>')
+    return '\n'.join(lines)
+
+
+def render_others(files):
+    """其他平台（Linux、macOS、Web）的下载链接"""
+    links = [
+        render_link(f, f'{PLATFORM_LABELS[f["platform"]]} {format_size(f["size"])}')
+        for f in files if f['platform'] in PLATFORM_LABELS and not f['file'].endswith('_delta.zip')
+    ]
+    if not links:
+        return ''
+    return f'<p class="download-note download-others">其他平台: {" · ".join(links)}</p>'
+
+
+def replace_marker(content, name, markup):
+    """替换 <!-- release:名称 --> 和 <!-- /release:名称 --> 之间的内容，保持标记的缩进"""
+    pattern = re.compile(
+        r'^([ \t]*)<!-- release:' + re.escape(name) + r' -->\n.*?^[ \t]*<!-- /release:' + re.escape(name) + r' -->\n',
+        re.MULTILINE | re.DOTALL
+    )
+    match = pattern.search(content)
+    if match is None:
+        print(f"[警告] index.html 中没有 release:{name} 标记，跳过")
+        return content
+    indent = match.group(1)
+    body = ''.join(f'{indent}{line}\n' for line in markup.splitlines()) if markup else ''
+    block = f'{indent}<!-- release:{name} -->\n{body}{indent}<!-- /release:{name} -->\n'
+    return content[:match.start()] + block + content[match.end():]
+
+
+def get_file_hash(path):
+    """文件内容的短哈希，用作 ?v= 参数"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def update_index_html(version, files=None, index_path='index.html'):
+    """更新 index.html：版本号、预渲染的下载按钮、静态资源的 ?v= 参数"""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        content = re.sub(r'(id="version-display">)v[\d.]+', rf'\g<1>v{version}', content)
+        content = re.sub(r'(class="download-version app-version">)版本 [\d.]+', rf'\g<1>版本 {version}', content)
+
+        if files is not None:
+            for name, render in [('android', render_android), ('windows', render_windows)]:
+                markup = render(files)
+                if markup is None:
+                    print(f"[警告] 发行文件中没有 {name} 版本，保留原下载链接")
+                    continue
+                content = replace_marker(content, name, markup)
+            content = replace_marker(content, 'others', render_others(files))
+
+        for asset in ['styles.css', 'script.js']:
+            content = re.sub(
+                r'((?:href|src)=")' + re.escape(asset) + r'(\?v=[^"]*)?"',
+                rf'\g<1>{asset}?v={get_file_hash(asset)}"',
+                content
+            )
+
+        with open(index_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        print(f"[OK] 已更新 {index_path}")
+        return True
+    except Exception as e:
+        print(f"错误: 更新 {index_path} 时出错: {e}")
+        return False
+
+
 def main():
     """主函数"""
     print("=" * 50)
     print("StepUp 版本号同步工具")
     print("=" * 50)
-    
+
     # 获取 pubspec.yaml 中的版本号
     version = get_version_from_pubspec()
     if not version:
         return 1
-    
+
     print(f"\n从 pubspec.yaml 读取到版本号: {version}\n")
-    
+
     # 更新 script.js
-    if update_script_js(version):
+    if not update_script_js(version):
+        print("\n[FAIL] 版本号同步失败!")
+        return 1
+
+    # 读取发行文件信息，生成 releases.json
+    files = None
+    manifest = load_release_manifest(version)
+    if manifest is not None:
+        files = get_release_files(manifest)
+        if not write_releases_json(version, files):
+            print("\n[FAIL] 版本号同步失败!")
+            return 1
+
+    # 更新 index.html（需在 script.js 更新之后，?v= 参数按其最新内容计算）
+    if update_index_html(version, files):
         print("\n[OK] 版本号同步完成!")
         print("  请记得将更改提交到版本控制。")
         return 0